@@ -1,219 +1,563 @@
-
-import networkx as nx
-from matplotlib import pyplot as plt
-import numpy as np
-
-class Algos:
-    
-    @staticmethod
-    #Shortest path 
-    def calculate_shortest(G, source, target):
-        """
-        Computes the shortest path between two edges
-        Params:
-            G: graph object
-            source: str
-            target: str
-        Returns
-            path: dict """
-        
-        #Nx gives us a shortest path function
-        try:
-            path = nx.shortest_path(G, source=source, target=target)
-            print("Shortest path:", ' -> '.join(str(path)))
-            return path
-        
-        #Just in case the two nodes are not connected
-
-        except nx.NetworkXNoPath:
-            print("No path exists between", source, "and", target)
-            return None
-
-    @staticmethod
-    #Partition
-    def partition(G, num_components):
-        """
-        Removes edges with the highest betweenness until the number of connected components is num_components
-        Params:
-            G: a graph object
-            num_components: desired number of connected components"""
-        while nx.number_connected_components(G) < num_components:
-            # Calculate edge betweenness centrality
-            edge_betweenness = nx.edge_betweenness_centrality(G)
-            # Find the edge with highest
-            max_edge = sorted(edge_betweenness.items(), key=lambda x: x[1], reverse=True)[0][0]
-            # Remove the edge
-            G.remove_edge(*max_edge)
-
-   
-    #Nash equilibrium and Social optima
-    def travel_time(self,G, x, edge):
-        """
-        Calulates travel time for an edge based on a given flow in the form ax+b
-        Param:
-            G: graph Object
-            x: velocity of a node
-            edge: edge being looked at
-        
-        Returns:
-            travel time in form a*x+b
-        """
-        weight = G.edges[edge].get('weight')
-
-        if not isinstance(weight, (list, tuple)) or len(weight) != 2:
-            raise ValueError(f'Edge weight format is incorrect for edge {edge}: {weight}')
-        
-        a,b= weight
-        return a*x +b
-    
-    
-    def adjust_nash_flows(self, G, path_flows,n):
-        """
-        Adjusts path flows towards a Nash equlibrium
-        Param: 
-            G: graph Object
-            path_flows: tuple of nodes
-        Returns:
-            path_flows: new tuple of nodes for the flow of traffic
-        """
-        max_path, min_path = None,None
-        #Setting up really low numbers for comparison
-        max_time, min_time = float('-inf'), float('inf')
-
-        for path,flow in path_flows.items():
-            #Calculate total time for edges
-            edges = zip(path, path[1:])
-            time = sum(self.travel_time(G,flow,edge) for edge in edges)
-            #Find the max and min times and paths associated 
-            if time > max_time:
-                max_time, max_path = time,path
-            if time< min_time:
-                min_time, min_path = time, path
-        
-        #Shifts 10% of drivers from max to min path
-        if max_path and min_path and max_path != min_path:
-            adjustment = min(path_flows[max_path] * 0.1, n)
-            path_flows[max_path] -= adjustment
-            path_flows[min_path] += adjustment
-
-        return path_flows
-
-    def nash_social(self,n,source,destination,G):
-        """
-        """
-        #Create a list of simple paths from G
-        paths = list(nx.all_simple_paths(G, source, destination))
-        #Partition the list for the nash equilibrium and social optima calculations
-        path_flows_nash = {tuple(path): n / len(paths) for path in paths}
-        path_flows_social = path_flows_nash.copy()
-
-        #Iterate through the paths to try to get an equilibrium
-        for _ in range(100):
-            prev_flows = path_flows_nash.copy()
-            path_flows_nash = self.adjust_nash_flows(G,path_flows_nash,n)
-            #If there isnt much change end the iterations
-            if all(prev_flows[path] == flow for path, flow in path_flows_nash.items()):
-                break
-
-        #Calculate the total time for plotting
-        nash_total_time = sum(sum(self.travel_time(G, path_flows_nash[path], (u, v)) for u, v in zip(path, path[1:])) * path_flows_nash[path] for path in path_flows_nash)
-
-        #Social optima calculation
-        #Calculate the sum of the paths
-        path_times ={tuple(path): sum(self.travel_time(G, 1, (u, v)) for u, v in zip(path, path[1:])) for path in paths}
-        #Get the sum of the inverse of time from paths
-        total_inverse_time = sum(1 / time for time in path_times.values())
-        path_flows_social = {tuple(path): (1 / path_times[tuple(path)]) / total_inverse_time * n for path in paths}
-
-        #Calculate the total time for plotting
-        social_total_time = sum(sum(self.travel_time(G, path_flows_social[path], (u, v)) for u, v in zip(path, path[1:])) * path_flows_social[path] for path in path_flows_social)
-
-        #Plot
-        labels = ['Nash Equilibrium', 'Social Optimum']
-        values = [nash_total_time, social_total_time]
-        
-        plt.figure(figsize=(10, 6))
-        plt.bar(labels, values, color=['blue', 'red'])
-        plt.ylabel('Total Travel Time')
-        plt.title(f'Total Travel Time Comparison for {n} Drivers')
-        plt.show()
-
-    @staticmethod
-    #Perfect matching
-    def perfect_matching(n, prices, valuations):
-        """
-        Creates a perfect match of buyers and sellers based on payoffs
-        Params:
-            n: number of buyer/sellers
-            prices: list of seller prices, initialized to 0
-            valuations: 2-D list of buyer valuations for each house
-        Returns:
-            assignment: Combination of correct buyer to seller
-            payoffs: list of final buyer payoffs
-            prices: list of final prices
-        """
-        #Initialize assignments and payoffs
-        assignment = [-1] * n
-        payoffs = [0] * n
-        #Flag
-        resolved = False
-
-        while not resolved:
-            #Assume this iteration will resolve all conflicts unless found otherwise
-            resolved = True
-            new_assignment = [-1] * n
-            new_payoffs = [0] * n
-
-            #Calculate payoffs and tentative assignments for each buyer
-            for i in range(n):
-                best_payoff = -float('inf')
-                for j in range(n):
-                    payoff = valuations[i][j] - prices[j]
-                    if payoff > best_payoff:
-                        best_payoff = payoff
-                        new_assignment[i] = j
-                        new_payoffs[i] = payoff
-
-            #Detect and resolve conflicts by adjusting prices
-            for i in range(n):
-                for j in range(i + 1, n):
-                    if new_assignment[i] == new_assignment[j] and new_assignment[i] != -1:
-                        # Conflict detected, increment price to resolve
-                        prices[new_assignment[i]] += 1
-                        resolved = False  #Need another iteration to re-evaluate assignments
-
-            # Update the assignments and payoffs after each iteration
-            assignment = new_assignment.copy()
-            payoffs = new_payoffs.copy()
-        
-
-        return assignment, payoffs, prices
-
-    @staticmethod
-    #Prefered seller
-    def preferred_seller_graph(n, assignment, payoffs, prices):
-        """
-        Generates the prefered seller graph given the perfect match
-        Params:
-            n: number of buyer/sellers
-            assignment: Combination of correct buyer to seller
-            payoffs:  list of final buyer payoffs
-            prices: list of final prices
-        Returns:
-            G: prefered seller graph
-        """
-        G = nx.DiGraph()
-
-        #Buyers
-        G.add_nodes_from(range(n), bipartite=0)
-        # Add seller nodes with price attributes
-        for i, price in enumerate(prices):
-            G.add_node(n + i, bipartite=1, price=price)
-
-        # Add edges based on assignments and payoffs
-        for i, seller in enumerate(assignment):
-            payoff_text = f"Payoff: {payoffs[i]}"
-            G.add_edge(i, n+seller, weight=payoff_text)
-        
-        return G
-
+
+import contextlib
+import heapq
+import itertools
+import time
+from collections import defaultdict
+import networkx as nx
+import numpy as np
+from scipy import sparse
+from csr_graph import CSRGraph, as_networkx
+import instrumentation
+from instrumentation import instrumented
+from betweenness import EdgeBetweenness
+from path_cache import PATH_CACHE, graph_digest, shortest_path_tree, tree_path
+from point_to_point import Landmarks, alt_path, bidirectional_bfs
+from market import clear_market, constricted_set, equilibrium_matching, preferred_sellers
+from traffic import PathSet, TrafficNetwork, price_of_anarchy, sweep
+
+class Algos:
+    
+    @staticmethod
+    #Shortest path 
+    @instrumented
+    def calculate_shortest(G, source, target, method=None, weight='weight', landmarks=None):
+        """
+        Computes the shortest path between two edges
+        Params:
+            G: graph object
+            source: str
+            target: str
+            method: None for nx.shortest_path, 'bidirectional' for a bidirectional BFS on hop counts,
+                    'alt' for A* with landmark bounds on weighted graphs
+            weight: edge attribute name or function (u, v, data) -> cost, used by 'alt', (a, b) weights cost a+b
+            landmarks: Landmarks for 'alt', built on the spot when missing or built on another graph
+                       (see GraphManager.read_landmarks)
+        Returns
+            path: dict """
+        if method is not None:
+            if method == 'bidirectional':
+                path, _ = bidirectional_bfs(G, source, target)
+            elif method == 'alt':
+                if landmarks is None or not landmarks.matches(G, weight):
+                    landmarks = Landmarks.build(G, weight=weight)
+                path, _ = alt_path(G, source, target, landmarks, weight)
+            else:
+                raise ValueError(f"Unknown shortest path method: {method}")
+            if path is None:
+                print("No path exists between", source, "and", target)
+            else:
+                print("Shortest path:", ' -> '.join(map(str, path)))
+            return path
+
+        #CSR graphs are searched directly on their arrays
+        if isinstance(G, CSRGraph):
+            path = G.shortest_path(source, target)
+            if path is None:
+                print("No path exists between", source, "and", target)
+            else:
+                print("Shortest path:", ' -> '.join(map(str, path)))
+            return path
+        
+        #Nx gives us a shortest path function
+        try:
+            path = nx.shortest_path(G, source=source, target=target)
+            print("Shortest path:", ' -> '.join(map(str, path)))
+            return path
+        
+        #Just in case the two nodes are not connected
+
+        except nx.NetworkXNoPath:
+            print("No path exists between", source, "and", target)
+            return None
+
+    @staticmethod
+    @instrumented
+    def batch_shortest(G, pairs, weight=None, cache=PATH_CACHE):
+        """
+        Answers many shortest path queries with one BFS/Dijkstra per distinct source.
+        Trees are kept in an LRU cache so later batches on the same graph skip the search.
+        Params:
+            G: graph object or CSRGraph
+            pairs: list of (source, target)
+            weight: None for hop counts, or an edge attribute name for Dijkstra
+            cache: PathTreeCache, None to disable caching
+        Returns:
+            results: list of dicts, one per pair in order, with
+                path: list of nodes or None if there is no path
+                seconds: time spent reading the path out of the tree
+                tree_seconds: time spent getting the source's tree (shared by its queries)
+                cached: True if the tree came from the cache"""
+        by_source = defaultdict(list)
+        for position, (source, target) in enumerate(pairs):
+            by_source[source].append((position, target))
+
+        results = [None] * len(pairs)
+        #One pass over the graph tells whether it changed since the trees were cached
+        digest = graph_digest(G, weight) if cache is not None else None
+        for source, queries in by_source.items():
+            start = time.perf_counter()
+            tree = cache.get(G, source, weight, digest) if cache is not None else None
+            cached = tree is not None
+            instrumentation.count('cached_trees' if cached else 'built_trees')
+            if not cached:
+                tree = shortest_path_tree(G, source, weight)
+                if cache is not None:
+                    cache.put(G, source, weight, tree, digest)
+            tree_seconds = time.perf_counter() - start
+
+            for position, target in queries:
+                start = time.perf_counter()
+                path = tree_path(G, tree, source, target)
+                results[position] = {'source': source, 'target': target, 'path': path,
+                                     'seconds': time.perf_counter() - start,
+                                     'tree_seconds': tree_seconds, 'cached': cached}
+        return results
+
+    @staticmethod
+    #Partition
+    @instrumented
+    def partition(G, num_components, dendrogram=None, workers=None, k=None, seed=None):
+        """
+        Removes edges with the highest betweenness until the number of connected components is num_components
+        Params:
+            G: a graph object or CSRGraph, edited in place
+            num_components: desired number of connected components
+            dendrogram: optional removal order from a previous run or girvan_newman, reused instead of recomputing
+            workers: number of processes computing betweenness, None runs in this process
+            k: number of sampled sources for approximate betweenness, None uses every node
+            seed: seed for the source sampling
+        Returns:
+            dendrogram: list of (edge, number of components after removing it)"""
+        if dendrogram is not None:
+            return Algos.cut_dendrogram(G, dendrogram, num_components)
+        graph = as_networkx(G)
+        #Removing edges changes shortest paths
+        PATH_CACHE.invalidate(G)
+        PATH_CACHE.invalidate(graph)
+        try:
+            return Algos._remove_by_betweenness(graph, num_components, workers, k, seed)
+        finally:
+            #The edges came off the networkx view of a CSR graph, its arrays follow
+            if isinstance(G, CSRGraph):
+                G.refresh()
+
+    @staticmethod
+    @instrumented
+    def girvan_newman(G, num_components=None, workers=None, k=None, seed=None):
+        """
+        Computes the Girvan-Newman removal order without modifying G
+        Params:
+            G: a graph object
+            num_components: stop once this many components exist, None removes every edge
+            workers, k, seed: betweenness backend options, see partition
+        Returns:
+            dendrogram: list of (edge, number of components after removing it)"""
+        return Algos._remove_by_betweenness(as_networkx(G).copy(), num_components, workers, k, seed)
+
+    @staticmethod
+    @instrumented
+    def cut_dendrogram(G, dendrogram, num_components):
+        """
+        Removes edges from G in dendrogram order until it has num_components components
+        Params:
+            G: a graph object or CSRGraph, edited in place
+            dendrogram: list of (edge, number of components after removing it)
+            num_components: desired number of connected components
+        Returns:
+            the part of the dendrogram that was applied"""
+        graph = as_networkx(G)
+        PATH_CACHE.invalidate(G)
+        PATH_CACHE.invalidate(graph)
+        applied = []
+        count = nx.number_connected_components(graph)
+        for edge, components in dendrogram:
+            if count >= num_components:
+                break
+            count = components
+            if graph.has_edge(*edge):
+                graph.remove_edge(*edge)
+            applied.append((edge, components))
+        if isinstance(G, CSRGraph):
+            G.refresh()
+        return applied
+
+    @staticmethod
+    @instrumented
+    def partition_score(G, truth='block'):
+        """
+        Scores the current components of a partitioned graph against planted communities
+        (e.g. the 'block' attribute of GraphGenerator.generate_sbm) with the adjusted Rand index
+        Params:
+            G: a graph object, after partition
+            truth: node attribute holding the true community
+        Returns:
+            ari: 1 for a perfect match, about 0 for a random partition
+        """
+        G = as_networkx(G)
+        nodes = list(G.nodes())
+        index = {node: i for i, node in enumerate(nodes)}
+        found = np.empty(len(nodes), dtype=np.int64)
+        for label, component in enumerate(nx.connected_components(G)):
+            found[[index[node] for node in component]] = label
+        planted = np.unique([G.nodes[node][truth] for node in nodes], return_inverse=True)[1]
+        return Algos.adjusted_rand_index(planted, found)
+
+    @staticmethod
+    def adjusted_rand_index(truth, labels):
+        """
+        Adjusted Rand index between two labelings from their contingency table
+        Params:
+            truth, labels: integer label arrays aligned by node
+        Returns:
+            ari: agreement corrected for chance, 1.0 when both labelings are identical
+        """
+        truth, labels = np.asarray(truth), np.asarray(labels)
+        _, cells = np.unique(np.stack([truth, labels]), axis=1, return_counts=True)
+        pairs = lambda counts: float((counts * (counts - 1) // 2).sum())
+        together = pairs(cells)
+        rows = pairs(np.unique(truth, return_counts=True)[1])
+        columns = pairs(np.unique(labels, return_counts=True)[1])
+        expected = rows * columns / pairs(np.array([len(truth)])) if len(truth) > 1 else 0.0
+        best = (rows + columns) / 2
+        return 1.0 if best == expected else (together - expected) / (best - expected)
+
+    @staticmethod
+    def _remove_by_betweenness(G, num_components, workers=None, k=None, seed=None):
+        """
+        Girvan-Newman engine. Betweenness is only recomputed inside the component that lost an edge,
+        the best edge comes off a heap and the component count is updated as components split.
+        Params:
+            G: a graph object, edges are removed from it
+            num_components: target number of components, None to remove every edge
+            workers, k, seed: when any is set betweenness comes from the EdgeBetweenness backend
+        Returns:
+            dendrogram: list of (edge, number of components after removing it)"""
+        dendrogram = []
+        count = nx.number_connected_components(G)
+        heap = []
+        #Component id -> its nodes, each component has one heap entry with its best edge
+        components = {}
+        order = itertools.count()
+
+        if workers is None and k is None:
+            backend = contextlib.nullcontext(lambda H: nx.edge_betweenness_centrality(H, normalized=False))
+        else:
+            backend = EdgeBetweenness(workers, k, seed)
+
+        with backend as betweenness:
+            def score(nodes):
+                #Raw betweenness so scores from different components compare, normalizing would not change the order within one
+                component = next(order)
+                components[component] = nodes
+                instrumentation.count('betweenness_runs')
+                #Only the best edge of a component is ever removed before it is scored again
+                scores = betweenness(G.subgraph(nodes).copy())
+                if scores:
+                    edge = max(scores, key=scores.get)
+                    heapq.heappush(heap, (-scores[edge], next(order), edge, component))
+
+            for nodes in nx.connected_components(G):
+                if len(nodes) > 1:
+                    score(nodes)
+
+            while heap and (num_components is None or count < num_components):
+                _, _, edge, component = heapq.heappop(heap)
+                nodes = components.pop(component)
+                G.remove_edge(*edge)
+
+                #Only the old component can split, and removing one edge splits it in at most two
+                parts = list(nx.connected_components(G.subgraph(nodes).copy()))
+                count += len(parts) - 1
+                dendrogram.append((edge, count))
+                instrumentation.count('edges_removed')
+                for part in parts:
+                    if len(part) > 1:
+                        score(part)
+
+        return dendrogram
+
+   
+    #Nash equilibrium and Social optima
+    @staticmethod
+    def travel_time(G, x, edge):
+        """
+        Calulates travel time for an edge based on a given flow in the form ax+b
+        Param:
+            G: graph Object
+            x: velocity of a node
+            edge: edge being looked at
+        
+        Returns:
+            travel time in form a*x+b
+        """
+        weight = G.edges[edge].get('weight')
+
+        if not isinstance(weight, (list, tuple)) or len(weight) != 2:
+            raise ValueError(f'Edge weight format is incorrect for edge {edge}: {weight}')
+        
+        a,b= weight
+        return a*x +b
+    
+    
+    @staticmethod
+    def adjust_nash_flows(G, path_flows,n, path_set=None):
+        """
+        Adjusts path flows towards a Nash equlibrium
+        Param: 
+            G: graph Object
+            path_flows: dict of path (tuple of nodes) -> flow, updated in place
+            n: number of drivers
+            path_set: PathSet compiled from the paths of path_flows, compiled here when missing
+        Returns:
+            path_flows: new tuple of nodes for the flow of traffic
+        """
+        if path_set is None:
+            path_set = PathSet(TrafficNetwork(G), list(path_flows))
+        flows = np.fromiter((path_flows[path] for path in path_set.paths), dtype=np.float64, count=len(path_set))
+        Algos._shift_to_fastest(path_set, flows, n)
+        path_flows.update(zip(path_set.paths, flows.tolist()))
+        return path_flows
+
+    @staticmethod
+    def _shift_to_fastest(path_set, flows, n):
+        """
+        One step of the path flow heuristic on every column of flows at once
+        Params:
+            path_set: PathSet of the paths
+            flows: path flow vector or (paths x k) matrix, updated in place
+            n: number of drivers, or array of k driver counts
+        Returns:
+            True if any column changed
+        """
+        columns = flows.reshape(len(path_set), -1)
+        #Each path is timed with its own flow on every edge, a*x+b summed along the path
+        times = path_set.a[:, None] * columns + path_set.b[:, None]
+        slowest, fastest = times.argmax(axis=0), times.argmin(axis=0)
+        k = np.arange(columns.shape[1])
+        #Shifts 10% of drivers from max to min path
+        adjustment = np.where(slowest != fastest, np.minimum(columns[slowest, k] * 0.1, n), 0.0)
+        columns[slowest, k] -= adjustment
+        columns[fastest, k] += adjustment
+        return bool(np.any(adjustment != 0))
+
+    @staticmethod
+    @instrumented
+    def nash_social(n,source,destination,G,method='gradient_projection',tol=1e-4,max_iter=1000,plot=True):
+        """
+        Compares the total travel time at the Nash equilibrium and at the social optimum
+        Params:
+            n: number of drivers
+            source: start node
+            destination: end node
+            G: digraph with (a, b) weights for travel times a*x+b
+            method: 'gradient_projection' (path flows) or 'frank_wolfe' (edge flows) run TrafficNetwork.solve,
+                    'paths' runs the path flow heuristic over every simple path
+            tol: relative gap tolerance of the solver
+            max_iter: iteration cap of the solver
+            plot: show a bar chart of the two totals
+        Returns:
+            nash_total_time, social_total_time
+        """
+        G = as_networkx(G)
+        if method in ('gradient_projection', 'frank_wolfe'):
+            network = TrafficNetwork(G)
+            nash = network.solve(n, source, destination, 'nash', tol, max_iter, method)
+            social = network.solve(n, source, destination, 'social', tol, max_iter, method)
+            for name, result in (('Nash equilibrium', nash), ('Social optimum', social)):
+                label = name.split()[0].lower()
+                instrumentation.count(f'{label}_iterations', result.iterations)
+                instrumentation.count(f'{label}_converged', int(result.converged))
+                status = 'converged' if result.converged else 'NOT converged, iteration cap reached'
+                print(f"{name}: total time {result.total_time:.4f}, {status} after {result.iterations} iterations "
+                      f"(relative gap {result.relative_gap:.2e}, tolerance {tol:.0e})")
+            nash_total_time, social_total_time = nash.total_time, social.total_time
+        elif method == 'paths':
+            nash_total_time, social_total_time = Algos._nash_social_paths(n, source, destination, G)
+        else:
+            raise ValueError(f"Unknown method: {method}")
+
+        if not plot:
+            return nash_total_time, social_total_time
+
+        #Plot, pyplot is only imported once something is drawn
+        from matplotlib import pyplot as plt
+        labels = ['Nash Equilibrium', 'Social Optimum']
+        values = [nash_total_time, social_total_time]
+        
+        plt.figure(figsize=(10, 6))
+        plt.bar(labels, values, color=['blue', 'red'])
+        plt.ylabel('Total Travel Time')
+        plt.title(f'Total Travel Time Comparison for {n} Drivers')
+        plt.show()
+        return nash_total_time, social_total_time
+
+    @staticmethod
+    @instrumented
+    def nash_social_sweep(ns,source,destination,G,method='gradient_projection',tol=1e-4,max_iter=1000,workers=None):
+        """
+        Price of anarchy over a range of driver counts, without plotting (see Plot.plot_price_of_anarchy).
+        The network (or the enumerated paths for 'paths') is built once and the solver methods
+        warm start each count from the previous one.
+        Params:
+            ns: driver counts
+            source: start node
+            destination: end node
+            G: digraph with (a, b) weights for travel times a*x+b
+            method: 'gradient_projection', 'frank_wolfe' or 'paths', as in nash_social
+            tol: relative gap tolerance of the solver
+            max_iter: iteration cap of the solver
+            workers: number of worker processes for the solver methods, None or 1 runs in the calling process
+        Returns:
+            rows: list of dicts in increasing n, see traffic.sweep (iterations, converged and gap are None for 'paths')
+        """
+        G = as_networkx(G)
+        if method in ('gradient_projection', 'frank_wolfe'):
+            return sweep(TrafficNetwork(G), ns, source, destination, method, tol, max_iter, workers)
+        if method != 'paths':
+            raise ValueError(f"Unknown method: {method}")
+
+        #Every count runs together as one column of the path flow matrix
+        ns = sorted(ns)
+        start = time.perf_counter()
+        nash, social = Algos._nash_social_paths(np.array(ns, dtype=np.float64), source, destination, G)
+        seconds = (time.perf_counter() - start) / max(len(ns), 1)
+        return [{'n': n, 'nash': nash_total, 'social': social_total,
+                 'ratio': price_of_anarchy(nash_total, social_total), 'iterations': None, 'converged': None,
+                 'gap': None, 'seconds': seconds} for n, nash_total, social_total in zip(ns, nash.tolist(), social.tolist())]
+
+    @staticmethod
+    def _nash_social_paths(n,source,destination,G,path_set=None):
+        """
+        Path flow heuristic: shifts drivers between enumerated simple paths.
+        The paths are compiled once into a PathSet, and n may be an array of driver counts
+        that are all run together, one flow column each.
+        Params:
+            path_set: PathSet of the simple paths from source to destination, enumerated when missing
+        Returns:
+            nash_total_time, social_total_time (arrays when n is an array)
+        """
+        if path_set is None:
+            path_set = TrafficNetwork(G).path_set(source, destination)
+        demands = np.asarray(n, dtype=np.float64)
+        #Partition the drivers evenly for the nash equilibrium calculation
+        flows = np.ones((len(path_set), 1)) * (demands.reshape(1, -1) / len(path_set))
+
+        #Iterate through the paths to try to get an equilibrium, stop once no column changes
+        for _ in range(100):
+            instrumentation.count('shift_rounds')
+            if not Algos._shift_to_fastest(path_set, flows, demands.reshape(-1)):
+                break
+        else:
+            instrumentation.count('iteration_cap_reached')
+        nash_total_time = Algos._own_flow_total(path_set, flows)
+
+        #Social optima calculation
+        #Split the drivers in proportion to the inverse of each path's time for a single driver
+        inverse_time = 1 / (path_set.a + path_set.b)
+        flows = (inverse_time / inverse_time.sum())[:, None] * demands.reshape(1, -1)
+        social_total_time = Algos._own_flow_total(path_set, flows)
+
+        if demands.ndim == 0:
+            return float(nash_total_time[0]), float(social_total_time[0])
+        return nash_total_time, social_total_time
+
+    @staticmethod
+    def _own_flow_total(path_set, flows):
+        #Total time with each path timed on its own flow, as the path flow heuristic does
+        return ((path_set.a[:, None] * flows + path_set.b[:, None]) * flows).sum(axis=0)
+
+    @staticmethod
+    #Perfect matching
+    @instrumented
+    def perfect_matching(n, prices, valuations, method='hungarian'):
+        """
+        Creates a perfect match of buyers and sellers based on payoffs.
+        The default method returns the minimal Walrasian prices: the lowest market clearing prices
+        at or above the reserves, with the matching and payoffs they support. These are not the
+        prices of the original procedure, which raises the prices of a constricted set by 1 per round
+        and can stop at higher prices; method='rounds' still returns those.
+        Params:
+            n: number of buyer/sellers
+            prices: list of seller prices, initialized to 0 (the reserve prices)
+            valuations: 2-D list of buyer valuations for each house, or a scipy sparse matrix
+                        (see GraphGenerator.generate_sparse_market) where buyers may stay unmatched
+            method: 'hungarian' or 'auction' (see market.clear_market), both return the minimal
+                    Walrasian prices; 'rounds' raises the prices of a constricted set by 1 per round
+        Returns:
+            assignment: Combination of correct buyer to seller, -1 for unmatched buyers
+            payoffs: list of final buyer payoffs
+            prices: list of final prices
+        """
+        if method == 'rounds':
+            return Algos._perfect_matching_rounds(n, prices, valuations)
+        valuations = valuations[:n] if sparse.issparse(valuations) else np.asarray(valuations)[:n]
+        assignment, payoffs, prices = clear_market(valuations, np.asarray(prices), method)
+        return assignment.tolist(), payoffs.tolist(), prices.tolist()
+
+    @staticmethod
+    def _perfect_matching_rounds(n, prices, valuations):
+        """
+        Price rounds on the preferred seller graph: while it has no perfect matching, every house
+        preferred by a constricted set of buyers costs 1 more. For dense markets prices are lowered
+        together whenever every house is above its reserve, which does not change any preference
+        """
+        is_sparse = sparse.issparse(valuations)
+        valuations = sparse.csr_matrix(valuations[:n]) if is_sparse else np.asarray(valuations)[:n]
+        reserve = np.asarray(prices, dtype=np.float64)
+        prices = reserve.copy()
+        while True:
+            preferred, outside = preferred_sellers(valuations, prices)
+            _, buyers, houses = constricted_set(preferred, outside)
+            if len(buyers) == 0:
+                break
+            instrumentation.count('price_rounds')
+            prices[houses] += 1
+            if not is_sparse:
+                prices -= max((prices - reserve).min(), 0)
+
+        matching = equilibrium_matching(preferred, outside, prices > reserve)
+        matched = np.flatnonzero(matching >= 0)
+        payoffs = np.zeros(len(matching))
+        if is_sparse:
+            payoffs[matched] = np.asarray(valuations[matched, matching[matched]]).ravel()
+        else:
+            payoffs[matched] = valuations[matched, matching[matched]]
+        payoffs[matched] -= prices[matching[matched]]
+        return matching.tolist(), payoffs.tolist(), prices.tolist()
+
+    @staticmethod
+    #Prefered seller
+    @instrumented
+    def preferred_seller_graph(n, assignment, payoffs, prices, valuations=None):
+        """
+        Generates the prefered seller graph given the perfect match
+        Params:
+            n: number of buyers
+            assignment: Combination of correct buyer to seller, -1 for unmatched buyers
+            payoffs:  list of final buyer payoffs
+            prices: list of final prices, one per seller
+            valuations: buyer valuations; when given every payoff maximizing seller gets an edge,
+                        not just the assigned one, and edges carry matched=True/False
+        Returns:
+            G: prefered seller graph
+        """
+        G = nx.DiGraph()
+
+        #Buyers
+        G.add_nodes_from(range(n), bipartite=0)
+        # Add seller nodes with price attributes
+        G.add_nodes_from((n + i, {'bipartite': 1, 'price': price}) for i, price in enumerate(prices))
+
+        # Add edges based on assignments and payoffs
+        assigned = [(i, seller) for i, seller in enumerate(assignment[:n]) if seller >= 0]
+        if valuations is None:
+            G.add_edges_from((i, n + seller, {'weight': f"Payoff: {payoffs[i]}"}) for i, seller in assigned)
+            return G
+
+        valuations = valuations[:n] if sparse.issparse(valuations) else np.asarray(valuations)[:n]
+        preferred = preferred_sellers(valuations, prices)[0].tocoo()
+        G.add_edges_from((i, n + seller, {'weight': f"Payoff: {payoffs[i]}", 'matched': False})
+                         for i, seller in zip(preferred.row.tolist(), preferred.col.tolist()))
+        G.add_edges_from((i, n + seller, {'weight': f"Payoff: {payoffs[i]}", 'matched': True}) for i, seller in assigned)
+        return G
@@ -0,0 +1,134 @@
+"""
+Neighborhood analytics of a whole graph at once: clustering coefficients of the nodes and common
+neighbor counts and Jaccard overlaps of the edges, read off the sparse product A @ A masked by the
+adjacency A. Entry (u, v) of A @ A counts the common neighbors of u and v, so on the edges it
+counts the triangles through them. The rows are multiplied in chunks so the intermediate product
+stays under a fixed number of entries, whatever the size of the graph.
+"""
+import numpy as np
+import instrumentation
+from instrumentation import instrumented
+from layout import adjacency_matrix
+
+#Upper bound on the entries of the partial product A[rows] @ A held at once
+MAX_WEDGES = 1 << 22
+
+class Neighborhood:
+    """
+    Analytics of one graph, arrays aligned with nodes (per node) or with sources/targets (per edge).
+    Each undirected edge appears once, with sources < targets as node indices.
+    """
+    __slots__ = ('nodes', 'degree', 'triangles', 'clustering', 'sources', 'targets', 'common', 'jaccard')
+
+    def __init__(self, nodes, degree, triangles, sources, targets, common):
+        """
+        Params:
+            nodes: list of nodes, position i is node index i
+            degree: int array of node degrees without self loops
+            triangles: int array of the triangles through each node
+            sources, targets: int arrays of edge endpoints as node indices
+            common: int array of the common neighbors of each edge's endpoints
+        """
+        self.nodes = nodes
+        self.degree = degree
+        self.triangles = triangles
+        self.sources = sources
+        self.targets = targets
+        self.common = common
+        with np.errstate(invalid='ignore', divide='ignore'):
+            self.clustering = np.where(degree > 1, 2.0 * triangles / (degree * (degree - 1.0)), 0.0)
+            union = degree[sources] + degree[targets] - common
+            self.jaccard = np.where(union > 0, common / union, 0.0)
+
+    def node_values(self, values):
+        """
+        Params:
+            values: per node array such as clustering or triangles
+        Returns:
+            dict node -> value
+        """
+        return dict(zip(self.nodes, values.tolist()))
+
+    def edge_values(self, values):
+        """
+        Params:
+            values: per edge array such as common or jaccard
+        Returns:
+            dict (u, v) -> value
+        """
+        nodes = self.nodes
+        return {(nodes[u], nodes[v]): value for u, v, value in
+                zip(self.sources.tolist(), self.targets.tolist(), values.tolist())}
+
+    def __repr__(self):
+        return f"Neighborhood(nodes={len(self.nodes)}, edges={len(self.sources)}, triangles={int(self.triangles.sum()) // 3})"
+
+class Analytics:
+
+    @staticmethod
+    @instrumented
+    def neighborhood(G, max_wedges=MAX_WEDGES):
+        """
+        Clustering coefficients, common neighbor counts and Jaccard overlaps of a whole graph
+        Params:
+            G: graph object or CSRGraph, directed graphs are read as undirected and self loops are ignored
+            max_wedges: entries of the partial product computed at once, bounds the extra memory
+        Returns:
+            Neighborhood
+        """
+        nodes, adjacency = adjacency_matrix(G)
+        adjacency = adjacency.astype(np.int32)
+        adjacency.sort_indices()
+        n = len(nodes)
+        degree = np.diff(adjacency.indptr).astype(np.int64)
+        #Row i of A[rows] @ A has at most sum of the neighbors' degrees entries
+        wedges = np.cumsum(adjacency @ degree)
+        common = np.empty(adjacency.nnz, dtype=np.int64)
+        start = 0
+        while start < n:
+            #At least one row per chunk, however many wedges it has
+            stop = max(int(np.searchsorted(wedges, (wedges[start - 1] if start else 0) + max_wedges, side='right')),
+                       start + 1)
+            block = adjacency[start:stop]
+            #Adding the block keeps every edge in the pattern, even those without common neighbors,
+            #so the counts line up with the block's own sorted entries
+            counts = ((block @ adjacency).multiply(block) + block).tocsr()
+            counts.sort_indices()
+            first, last = adjacency.indptr[start], adjacency.indptr[stop]
+            common[first:last] = counts.data - 1
+            instrumentation.count('chunks')
+            start = stop
+
+        #Each triangle at a node is counted once from each of its two edges there
+        rows = np.repeat(np.arange(n), degree)
+        triangles = np.bincount(rows, weights=common, minlength=n).astype(np.int64) // 2
+        upper = adjacency.indices > rows
+        return Neighborhood(nodes, degree, triangles, rows[upper], adjacency.indices[upper].astype(np.int64),
+                            common[upper])
+
+    @staticmethod
+    @instrumented
+    def clustering(G, max_wedges=MAX_WEDGES):
+        """
+        Params:
+            G: graph object or CSRGraph
+            max_wedges: see neighborhood
+        Returns:
+            dict node -> clustering coefficient, as nx.clustering for unweighted graphs
+        """
+        result = Analytics.neighborhood(G, max_wedges)
+        return result.node_values(result.clustering)
+
+    @staticmethod
+    @instrumented
+    def edge_overlap(G, max_wedges=MAX_WEDGES):
+        """
+        Params:
+            G: graph object or CSRGraph
+            max_wedges: see neighborhood
+        Returns:
+            common: dict (u, v) -> number of common neighbors of u and v
+            jaccard: dict (u, v) -> common neighbors over the union of both neighborhoods
+        """
+        result = Analytics.neighborhood(G, max_wedges)
+        return result.edge_values(result.common), result.edge_values(result.jaccard)
@@ -0,0 +1,189 @@
+import numpy as np
+import networkx as nx
+from scipy import sparse
+from scipy.sparse.csgraph import breadth_first_order, connected_components
+from csr_graph import as_networkx
+
+#Local search restarts from random colorings on top of the greedy coloring
+RESTARTS = 4
+
+class SignedGraph:
+    """
+    Edge arrays of a signed graph, +1 or -1 per edge (edges without the attribute count as +1,
+    self loops are left out)
+    """
+
+    def __init__(self, G, sign='sign'):
+        """
+        Params:
+            G: graph object or CSRGraph with a sign attribute on the edges
+            sign: edge attribute holding the sign
+        """
+        G = as_networkx(G)
+        self.nodes = list(G.nodes())
+        self.index = {node: i for i, node in enumerate(self.nodes)}
+        edges = [(self.index[u], self.index[v], 1 if data.get(sign, 1) >= 0 else -1)
+                 for u, v, data in G.edges(data=True) if u != v]
+        edges = np.array(edges, dtype=np.int64).reshape(-1, 3)
+        self.tails, self.heads, self.signs = edges[:, 0], edges[:, 1], edges[:, 2]
+        n = len(self.nodes)
+        self.matrix = sparse.csr_matrix((np.concatenate([self.signs, self.signs]).astype(np.float64),
+                                         (np.concatenate([self.tails, self.heads]),
+                                          np.concatenate([self.heads, self.tails]))), shape=(n, n))
+
+    def frustrated(self, colors):
+        """
+        Params:
+            colors: array of +1/-1 per node
+        Returns:
+            mask of the edges whose sign disagrees with the coloring
+        """
+        return self.signs * colors[self.tails] * colors[self.heads] < 0
+
+    def _cover(self):
+        return _cover(self.tails, self.heads, self.signs, len(self.nodes))
+
+def _cover(tails, heads, signs, n):
+    #Signed double cover: node v becomes v and v + n, positive edges keep the copy and negative
+    #edges switch it. v and v + n are connected exactly when v lies on an unbalanced component
+    positive = signs > 0
+    cover_heads = np.concatenate([np.where(positive, heads, heads + n), np.where(positive, heads + n, heads)])
+    return sparse.csr_matrix((np.ones(len(cover_heads), dtype=np.int8),
+                              (np.concatenate([tails, tails + n]), cover_heads)), shape=(2 * n, 2 * n))
+
+def check_balance(G, sign='sign'):
+    """
+    Exact structural balance test in linear time: a signed graph is balanced when its nodes split
+    into two sides with positive edges inside the sides and negative edges across, which holds
+    exactly when no cycle has an odd number of negative edges
+    Params:
+        G: graph object, CSRGraph or SignedGraph
+        sign: edge attribute holding the sign (+1/-1)
+    Returns:
+        is_balanced: boolean
+        witness: the two sides (lists of nodes) when balanced, otherwise a frustrated cycle as a
+                 list of nodes, the first node repeated at the end
+    """
+    signed = G if isinstance(G, SignedGraph) else SignedGraph(G, sign)
+    n = len(signed.nodes)
+    cover = signed._cover()
+    _, labels = connected_components(cover, directed=False)
+    unbalanced = np.flatnonzero(labels[:n] == labels[n:])
+    if len(unbalanced) == 0:
+        #In each component the copy with the smaller label picks one side
+        first = labels[:n] < labels[n:]
+        return True, ([signed.nodes[i] for i in np.flatnonzero(first)],
+                      [signed.nodes[i] for i in np.flatnonzero(~first)])
+    return False, _frustrated_cycle(signed, cover, int(unbalanced[0]))
+
+def _frustrated_cycle(signed, cover, start):
+    #Shortest path from start to its other copy in the double cover, a closed walk with an odd number
+    #of negative edges, then peel off closed sub-walks until a simple cycle with odd parity is left
+    n = len(signed.nodes)
+    _, predecessors = breadth_first_order(cover, start, directed=False)
+    walk = [start + n]
+    while walk[-1] != start:
+        walk.append(int(predecessors[walk[-1]]))
+    walk = [node % n for node in reversed(walk)]
+
+    negative = {(u, v) for u, v, s in zip(signed.tails.tolist(), signed.heads.tolist(), signed.signs.tolist()) if s < 0}
+    stack, parity, position = [], [0], {}
+    for node in walk:
+        odd = bool(stack) and ((stack[-1], node) in negative or (node, stack[-1]) in negative)
+        if node in position:
+            #Closed sub-walk back to node
+            begin = position[node]
+            if (parity[-1] + odd - parity[begin]) % 2:
+                return [signed.nodes[i] for i in stack[begin:]] + [signed.nodes[node]]
+            for dropped in stack[begin + 1:]:
+                del position[dropped]
+            del stack[begin + 1:]
+            del parity[begin + 1:]
+            continue
+        if stack:
+            parity.append(parity[-1] + odd)
+        position[node] = len(stack)
+        stack.append(node)
+    #Unreachable: the walk has odd parity, so one of its closed sub-walks does
+    raise RuntimeError("No frustrated cycle found on an unbalanced component")
+
+def frustration(G, sign='sign', method='local_search', restarts=RESTARTS, seed=None):
+    """
+    Minimum number of frustrated edges, the edges that must change sign to balance the graph.
+    The problem is NP-hard; 'local_search' starts from a greedy breadth first coloring (exact on
+    balanced graphs) and random colorings, then flips nodes that lower the count until none does.
+    'annealing' runs D-Wave's SimulatedAnnealingSampler (needs dwave-networkx and dwave-samplers)
+    Params:
+        G: graph object, CSRGraph or SignedGraph
+        sign: edge attribute holding the sign (+1/-1)
+        method: 'local_search' or 'annealing'
+        restarts: random colorings tried by the local search
+        seed: random seed
+    Returns:
+        count: number of frustrated edges found
+        colors: dict node -> +1/-1 coloring with that many frustrated edges
+    """
+    signed = G if isinstance(G, SignedGraph) else SignedGraph(G, sign)
+    if method == 'annealing':
+        return _annealing(signed, seed)
+    if method != 'local_search':
+        raise ValueError(f"Unknown method: {method}")
+
+    rng = np.random.default_rng(seed)
+    n = len(signed.nodes)
+    best = None
+    for colors in [_greedy_coloring(signed)] + [rng.choice([-1, 1], n) for _ in range(restarts)]:
+        colors = _local_search(signed, colors, rng)
+        count = int(signed.frustrated(colors).sum())
+        if best is None or count < best[0]:
+            best = (count, colors)
+    count, colors = best
+    return count, dict(zip(signed.nodes, colors.tolist()))
+
+def _greedy_coloring(signed):
+    #Breadth first from one node per component, each level takes the color most of its already colored
+    #neighbors ask for. Exact on balanced components, and one bad edge cannot flip a whole subtree
+    matrix = signed.matrix
+    n = len(signed.nodes)
+    _, labels = connected_components(matrix, directed=False)
+    _, frontier = np.unique(labels, return_index=True)
+    colors = np.zeros(n)
+    colors[frontier] = 1
+    while len(frontier):
+        reached = np.unique(matrix[frontier].indices)
+        frontier = reached[colors[reached] == 0]
+        colors[frontier] = np.where(matrix[frontier] @ colors < 0, -1, 1)
+    return colors.astype(np.int64)
+
+def _local_search(signed, colors, rng):
+    #Flipping v changes its incident frustrated edges by the sum of s_uv x_u x_v, so nodes where it is
+    #negative gain by flipping. Each sweep flips an independent set of them at once (a node flips when
+    #its random priority beats every improving neighbor's), so the gains add up and the count only drops
+    matrix = signed.matrix
+    indptr, indices = matrix.indptr, matrix.indices
+    owner = np.repeat(np.arange(len(colors)), np.diff(indptr))
+    colors = colors.astype(np.float64)
+    while True:
+        gain = colors * (matrix @ colors)
+        improving = gain < 0
+        if not improving.any():
+            return colors.astype(np.int64)
+        priority = np.where(improving, rng.random(len(colors)), -1.0)
+        rival = np.full(len(colors), -1.0)
+        np.maximum.at(rival, owner, priority[indices])
+        colors[improving & (priority > rival)] *= -1
+
+def _annealing(signed, seed):
+    #Optional backend, imported only when asked for
+    try:
+        import dwave_networkx as dnx
+        from dwave.samplers import SimulatedAnnealingSampler
+    except ImportError as error:
+        raise ImportError("method='annealing' needs dwave-networkx and dwave-samplers") from error
+    #dwave_networkx reads the signs from the 'sign' attribute
+    G = nx.Graph()
+    G.add_nodes_from(signed.nodes)
+    G.add_edges_from((signed.nodes[u], signed.nodes[v], {'sign': s}) for u, v, s in
+                     zip(signed.tails.tolist(), signed.heads.tolist(), signed.signs.tolist()))
+    frustrated, colors = dnx.structural_imbalance(G, SimulatedAnnealingSampler(), seed=seed)
+    return len(frustrated), {node: 1 if colors[node] else -1 for node in signed.nodes}
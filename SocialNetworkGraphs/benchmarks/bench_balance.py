@@ -0,0 +1,69 @@
+"""
+Structural balance benchmark: exact check, local search frustration and the annealer on signed Erdos-Renyi graphs.
+Run from the SocialNetworkGraphs directory:
+    python -m benchmarks.bench_balance --nodes 1000 10000 --noise 0 0.01 0.5
+"""
+import argparse
+import time
+import numpy as np
+import networkx as nx
+from balance import SignedGraph, check_balance, frustration
+
+def signed_erdos(n, c, noise, seed):
+    """
+    Erdos-Renyi graph with average degree c whose signs follow a random two sided split,
+    each sign then flipped with probability noise (0.5 gives independent random signs)
+    Params:
+        n: number of nodes
+        c: average degree
+        noise: probability of flipping each planted sign
+        seed: random seed
+    Returns:
+        G: graph object with a 'sign' attribute on the edges
+        flipped: number of flipped signs, an upper bound on the minimum frustration
+    """
+    rng = np.random.default_rng(seed)
+    G = nx.fast_gnp_random_graph(n, c / max(n - 1, 1), seed=seed)
+    side = rng.choice([-1, 1], n)
+    edges = np.array(list(G.edges()), dtype=np.int64).reshape(-1, 2)
+    flips = rng.random(len(edges)) < noise
+    signs = side[edges[:, 0]] * side[edges[:, 1]] * np.where(flips, -1, 1)
+    nx.set_edge_attributes(G, dict(zip(map(tuple, edges.tolist()), signs.tolist())), 'sign')
+    return G, int(flips.sum())
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--nodes', type=int, nargs='+', default=[1000, 10000])
+    parser.add_argument('--c', type=float, default=5.0)
+    parser.add_argument('--noise', type=float, nargs='+', default=[0.0, 0.01, 0.5])
+    parser.add_argument('--annealing-max-nodes', type=int, default=2000,
+                        help='largest graph handed to the annealer, it needs dwave-networkx and dwave-samplers')
+    parser.add_argument('--seed', type=int, default=427)
+    args = parser.parse_args()
+
+    print(f"{'nodes':>8} {'edges':>8} {'noise':>6} {'method':>13} {'seconds':>8} {'result':>10} {'flipped':>8}")
+    for n in args.nodes:
+        for noise in args.noise:
+            G, flipped = signed_erdos(n, args.c, noise, args.seed)
+            signed = SignedGraph(G)
+            row = f"{n:>8} {G.number_of_edges():>8} {noise:>6}"
+
+            start = time.perf_counter()
+            balanced, _ = check_balance(signed)
+            print(f"{row} {'exact':>13} {time.perf_counter() - start:>8.3f} {'balanced' if balanced else 'unbalanced':>10} {flipped:>8}")
+
+            start = time.perf_counter()
+            count, _ = frustration(signed, seed=args.seed)
+            print(f"{row} {'local_search':>13} {time.perf_counter() - start:>8.3f} {count:>10} {flipped:>8}")
+
+            if n > args.annealing_max_nodes:
+                continue
+            try:
+                start = time.perf_counter()
+                count, _ = frustration(signed, method='annealing', seed=args.seed)
+                print(f"{row} {'annealing':>13} {time.perf_counter() - start:>8.3f} {count:>10} {flipped:>8}")
+            except ImportError as error:
+                print(f"{row} {'annealing':>13} skipped: {error}")
+
+if __name__ == '__main__':
+    main()
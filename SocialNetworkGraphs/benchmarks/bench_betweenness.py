@@ -0,0 +1,41 @@
+"""
+Scaling benchmark for the partition betweenness backend across worker counts.
+Run from the SocialNetworkGraphs directory:
+    python -m benchmarks.bench_betweenness --nodes 2000 --workers 1 2 4 8
+"""
+import argparse
+import time
+from graph_generator import GraphGenerator
+from betweenness import EdgeBetweenness
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--nodes', type=int, nargs='+', default=[1000, 2000])
+    parser.add_argument('--c', type=float, default=1.5)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--k', type=int, nargs='*', default=[64, 256])
+    parser.add_argument('--seed', type=int, default=427)
+    args = parser.parse_args()
+
+    print(f"{'nodes':>8} {'edges':>8} {'workers':>8} {'k':>6} {'seconds':>9} {'speedup':>8} {'max rel err':>12}")
+    for n in args.nodes:
+        G = GraphGenerator.generate_erdos_graph(n, args.c, compact=True, seed=args.seed)
+        exact = None
+        baseline = None
+        for k in [None] + args.k:
+            for workers in args.workers:
+                with EdgeBetweenness(workers=workers, k=k, seed=args.seed) as betweenness:
+                    start = time.perf_counter()
+                    scores = betweenness(G)
+                    seconds = time.perf_counter() - start
+                if exact is None:
+                    exact = scores
+                if baseline is None:
+                    baseline = seconds
+                top = max(exact.values())
+                error = max(abs(scores[edge] - value) for edge, value in exact.items()) / top if top else 0.0
+                print(f"{n:>8} {G.number_of_edges():>8} {workers:>8} {k or 'all':>6} {seconds:>9.2f} "
+                      f"{baseline / seconds:>8.2f} {error:>12.3f}")
+
+if __name__ == '__main__':
+    main()
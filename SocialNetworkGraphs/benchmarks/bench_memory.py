@@ -0,0 +1,66 @@
+"""
+Memory benchmark: networkx dict-of-dict graphs against CSRGraph.
+Run from the SocialNetworkGraphs directory:
+    python -m benchmarks.bench_memory
+"""
+import argparse
+import tracemalloc
+import numpy as np
+import networkx as nx
+from csr_graph import CSRGraph
+
+def random_edges(n, avg_degree, seed):
+    """
+    Random edge arrays with about n*avg_degree/2 edges
+    Params:
+        n: number of nodes
+        avg_degree: average degree
+        seed: random seed
+    Returns:
+        sources, targets: int64 arrays
+    """
+    rng = np.random.default_rng(seed)
+    m = n * avg_degree // 2
+    return rng.integers(0, n, m), rng.integers(0, n, m)
+
+def measure(build):
+    """
+    Peak traced memory of a build function
+    Params:
+        build: callable returning the graph
+    Returns:
+        graph, peak bytes
+    """
+    tracemalloc.start()
+    graph = build()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return graph, peak
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 300000])
+    parser.add_argument('--degree', type=int, default=10)
+    parser.add_argument('--seed', type=int, default=427)
+    args = parser.parse_args()
+
+    #Peak columns include temporaries made while building, the last column is what the CSR graph keeps
+    print(f"{'nodes':>10} {'edges':>10} {'nx peak MB':>11} {'csr peak MB':>12} {'nx B/edge':>10} {'csr B/edge':>11}")
+    for n in args.sizes:
+        sources, targets = random_edges(n, args.degree, args.seed)
+
+        def build_nx():
+            G = nx.Graph()
+            G.add_nodes_from(range(n))
+            G.add_edges_from(zip(sources.tolist(), targets.tolist()))
+            return G
+
+        G, nx_peak = measure(build_nx)
+        C, csr_peak = measure(lambda: CSRGraph.from_edges(n, sources, targets))
+        m = G.number_of_edges()
+        assert m == C.number_of_edges()
+        print(f"{n:>10} {m:>10} {nx_peak / 2**20:>11.1f} {csr_peak / 2**20:>12.1f} "
+              f"{nx_peak / m:>10.0f} {C.nbytes() / m:>11.0f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,36 @@
+"""
+Partition quality and time on stochastic block models, scored against the planted blocks.
+Run from the SocialNetworkGraphs directory:
+    python -m benchmarks.bench_partition --blocks 4 --size 50 100 --k 0 32
+"""
+import argparse
+import time
+from graph_generator import GraphGenerator
+from algos import Algos
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--blocks', type=int, default=4)
+    parser.add_argument('--size', type=int, nargs='+', default=[50, 100])
+    parser.add_argument('--degree-inside', type=float, default=8.0, help='expected neighbors inside the own block')
+    parser.add_argument('--degree-between', type=float, default=0.5, help='expected neighbors in other blocks')
+    parser.add_argument('--k', type=int, nargs='+', default=[0, 32], help='sampled betweenness sources, 0 for exact')
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--seed', type=int, default=427)
+    args = parser.parse_args()
+
+    print(f"{'nodes':>7} {'edges':>7} {'k':>5} {'removed':>8} {'seconds':>8} {'ARI':>7}")
+    for size in args.size:
+        inside = args.degree_inside / (size - 1)
+        between = args.degree_between / (size * (args.blocks - 1))
+        fixture = GraphGenerator.generate_sbm([size] * args.blocks, (inside, between), seed=args.seed)
+        for k in args.k:
+            G = fixture.copy()
+            start = time.perf_counter()
+            dendrogram = Algos.partition(G, args.blocks, workers=args.workers, k=k or None, seed=args.seed)
+            seconds = time.perf_counter() - start
+            print(f"{G.number_of_nodes():>7} {fixture.number_of_edges():>7} {k or 'all':>5} {len(dendrogram):>8} "
+                  f"{seconds:>8.2f} {Algos.partition_score(G):>7.3f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+"""
+Point to point shortest path benchmark: nodes expanded and latency of the bidirectional BFS
+and ALT engines against nx.shortest_path / nx.dijkstra_path.
+Run from the SocialNetworkGraphs directory:
+    python -m benchmarks.bench_point_to_point --nodes 5000 20000
+"""
+import argparse
+import random
+import time
+import networkx as nx
+from graph_generator import GraphGenerator
+from point_to_point import Landmarks, alt_path, astar_path, bfs_path, bidirectional_bfs
+
+def timed(function, queries):
+    """
+    Runs function(source, target) over the queries
+    Returns:
+        mean milliseconds per query, mean nodes expanded (None when function does not report it)
+    """
+    expanded = 0
+    start = time.perf_counter()
+    for source, target in queries:
+        result = function(source, target)
+        if isinstance(result, tuple):
+            expanded += result[1]
+        else:
+            expanded = None
+    seconds = time.perf_counter() - start
+    return 1000 * seconds / len(queries), expanded / len(queries) if expanded is not None else None
+
+def report(name, label, measured):
+    milliseconds, expanded = measured
+    expanded = f"{expanded:>10.0f}" if expanded is not None else f"{'-':>10}"
+    print(f"{name:>14} {label:>24} {milliseconds:>10.3f} {expanded}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--nodes', type=int, nargs='+', default=[5000, 20000])
+    parser.add_argument('--c', type=float, default=1.5)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--landmarks', type=int, default=8)
+    parser.add_argument('--seed', type=int, default=427)
+    args = parser.parse_args()
+
+    inputs = [('karate', GraphGenerator.generate_karate())]
+    inputs += [(f'erdos n={n}', GraphGenerator.generate_erdos_graph(n, args.c, seed=args.seed)) for n in args.nodes]
+
+    print(f"{'graph':>14} {'engine':>24} {'ms/query':>10} {'expanded':>10}")
+    for name, G in inputs:
+        rng = random.Random(args.seed)
+        #Karate club ships with weights, the random graphs get seeded integer weights
+        if name != 'karate':
+            for u, v in G.edges():
+                G[u][v]['weight'] = rng.randint(1, 10)
+        nodes = list(G.nodes())
+        queries = [(rng.choice(nodes), rng.choice(nodes)) for _ in range(args.queries)]
+
+        report(name, 'nx.shortest_path', timed(lambda s, t: nx.shortest_path(G, s, t) if nx.has_path(G, s, t) else None, queries))
+        report(name, 'bfs', timed(lambda s, t: bfs_path(G, s, t), queries))
+        report(name, 'bidirectional bfs', timed(lambda s, t: bidirectional_bfs(G, s, t), queries))
+
+        start = time.perf_counter()
+        landmarks = Landmarks.build(G, args.landmarks, seed=args.seed)
+        build = time.perf_counter() - start
+        report(name, 'nx.dijkstra_path', timed(lambda s, t: nx.dijkstra_path(G, s, t) if nx.has_path(G, s, t) else None, queries))
+        report(name, 'dijkstra', timed(lambda s, t: astar_path(G, s, t), queries))
+        report(name, f'alt k={len(landmarks.landmarks)} ({build:.1f}s build)', timed(lambda s, t: alt_path(G, s, t, landmarks), queries))
+
+if __name__ == '__main__':
+    main()
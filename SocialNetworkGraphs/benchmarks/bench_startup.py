@@ -0,0 +1,70 @@
+"""
+Startup time of the menu: imports main in fresh interpreters under python -X importtime, keeps the
+fastest run, and fails when it is over budget or loads a module the menu should not need yet.
+Run from the SocialNetworkGraphs directory:
+    python -m benchmarks.bench_startup --budget-ms 400 --history startup.jsonl
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+#Modules that must only be imported by the menu option or call that uses them
+DEFERRED = ('matplotlib', 'scipy', 'dwave', 'dwave_networkx', 'algos', 'plot', 'graph_attributes',
+            'graph_generator', 'market', 'layout', 'analytics')
+
+def import_times(module, directory):
+    """
+    Imports a module in a fresh interpreter under -X importtime
+    Params:
+        module: module name
+        directory: working directory of the interpreter
+    Returns:
+        dict module -> (self microseconds, cumulative microseconds)
+    """
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'], cwd=directory,
+                            capture_output=True, text=True, check=True)
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        own, cumulative, name = line[len('import time:'):].split('|')
+        times[name.strip()] = (int(own), int(cumulative))
+    return times
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--module', default='main')
+    parser.add_argument('--runs', type=int, default=5, help='fresh interpreters, the fastest one counts')
+    parser.add_argument('--budget-ms', type=float, default=400.0)
+    parser.add_argument('--top', type=int, default=10, help='slowest modules listed by their own import time')
+    parser.add_argument('--history', default=None, help='JSON lines file every run is appended to')
+    args = parser.parse_args()
+
+    directory = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    runs = [import_times(args.module, directory) for _ in range(args.runs)]
+    times = min(runs, key=lambda run: run[args.module][1])
+    total_ms = times[args.module][1] / 1000
+    deferred = sorted(name for name in times if name.split('.')[0] in DEFERRED)
+
+    print(f"{'module':<40} {'self ms':>8} {'cumulative ms':>14}")
+    for name, (own, cumulative) in sorted(times.items(), key=lambda item: -item[1][0])[:args.top]:
+        print(f"{name:<40} {own / 1000:>8.1f} {cumulative / 1000:>14.1f}")
+    print(f"\nimport {args.module}: {total_ms:.1f} ms (budget {args.budget_ms:.0f} ms, fastest of {args.runs})")
+    if deferred:
+        print(f"Imported too early: {', '.join(deferred[:10])}{' ...' if len(deferred) > 10 else ''}")
+
+    if args.history:
+        with open(args.history, 'a') as file:
+            file.write(json.dumps({'time': time.strftime('%Y-%m-%dT%H:%M:%S'), 'module': args.module,
+                                   'milliseconds': total_ms, 'budget_ms': args.budget_ms, 'modules': len(times),
+                                   'deferred': deferred}) + '\n')
+    over = total_ms > args.budget_ms
+    if over:
+        print("Over budget")
+    sys.exit(1 if over or deferred else 0)
+
+if __name__ == '__main__':
+    main()
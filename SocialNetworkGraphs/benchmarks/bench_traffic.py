@@ -0,0 +1,59 @@
+"""
+Traffic equilibrium benchmark: Nash and social optimum flows on grid digraphs.
+Run from the SocialNetworkGraphs directory:
+    python -m benchmarks.bench_traffic --sides 30 50 --drivers 1000 --methods gradient_projection frank_wolfe
+"""
+import argparse
+import time
+import numpy as np
+import networkx as nx
+from traffic import TrafficNetwork
+
+def grid_digraph(side, seed):
+    """
+    side x side grid with roads in both directions and random (a, b) latencies, in the read_digraph format
+    Params:
+        side: grid width
+        seed: random seed
+    Returns:
+        G: directed graph object, source node, destination node
+    """
+    rng = np.random.default_rng(seed)
+    grid = nx.grid_2d_graph(side, side)
+    index = {node: i for i, node in enumerate(sorted(grid.nodes()))}
+    G = nx.DiGraph()
+    for u, v in grid.edges():
+        for tail, head in ((u, v), (v, u)):
+            G.add_edge(index[tail], index[head], weight=(int(rng.integers(1, 5)), int(rng.integers(0, 20))))
+    return G, 0, side * side - 1
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sides', type=int, nargs='+', default=[30, 50])
+    parser.add_argument('--methods', nargs='+', default=['gradient_projection', 'frank_wolfe'])
+    parser.add_argument('--drivers', type=int, default=1000)
+    parser.add_argument('--tol', type=float, default=1e-4)
+    parser.add_argument('--max-iter', type=int, default=2000)
+    parser.add_argument('--seed', type=int, default=427)
+    args = parser.parse_args()
+
+    print(f"{'edges':>7} {'method':>19} {'objective':>9} {'iters':>6} {'final gap':>9} {'converged':>9} {'seconds':>8} "
+          f"{'total time':>12}")
+    for side in args.sides:
+        G, source, destination = grid_digraph(side, args.seed)
+        network = TrafficNetwork(G)
+        for method in args.methods:
+            totals, converged = {}, True
+            for objective in ('nash', 'social'):
+                start = time.perf_counter()
+                result = network.solve(args.drivers, source, destination, objective, args.tol, args.max_iter, method)
+                seconds = time.perf_counter() - start
+                totals[objective] = result.total_time
+                converged = converged and result.converged
+                print(f"{G.number_of_edges():>7} {method:>19} {objective:>9} {result.iterations:>6} "
+                      f"{result.relative_gap:>9.2e} {str(result.converged):>9} {seconds:>8.2f} {result.total_time:>12.1f}")
+            note = '' if converged else ' (not converged, the flows are not equilibria)'
+            print(f"{'':>7} {method:>19} price of anarchy {totals['nash'] / totals['social']:.4f}{note}")
+
+if __name__ == '__main__':
+    main()
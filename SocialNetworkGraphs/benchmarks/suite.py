@@ -0,0 +1,417 @@
+"""
+Benchmark suite over the Algos, Analytics, GraphManager and GraphGenerator entry points. Every benchmark runs
+on seeded fixtures at each requested scale: generated graphs plus market, sparse market, graph and
+traffic digraph files written in the repository's formats to a temporary directory. Each entry
+point is timed over a few repeats (the fastest counts) and run once more under tracemalloc for its
+peak memory. Results are compared with a stored baseline and regressions are flagged; the exit
+code is 1 when any is found.
+Run from the SocialNetworkGraphs directory:
+    python -m benchmarks.suite --scales small medium --save-baseline
+    python -m benchmarks.suite --scales small medium --filter partition perfect_matching
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import statistics
+import tempfile
+import time
+import numpy as np
+import networkx as nx
+from algos import Algos
+from analytics import Analytics
+from graph_generator import GraphGenerator
+from graph_manager import GraphManager
+from benchmarks.bench_memory import measure
+from benchmarks.bench_traffic import grid_digraph
+
+#Fixture sizes per scale
+SCALES = {
+    'small': {'nodes': 500, 'degree': 6, 'partition_nodes': 200, 'market': 50, 'side': 6, 'drivers': 100, 'queries': 50},
+    'medium': {'nodes': 5000, 'degree': 8, 'partition_nodes': 600, 'market': 300, 'side': 12, 'drivers': 1000, 'queries': 200},
+    'large': {'nodes': 50000, 'degree': 8, 'partition_nodes': 1500, 'market': 1500, 'side': 25, 'drivers': 10000, 'queries': 1000},
+}
+#Default baseline file, written by --save-baseline
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+#Changes below these are noise whatever the relative tolerance says
+NOISE_SECONDS = 0.005
+NOISE_BYTES = 64 * 1024
+
+#name -> (scales it runs at or None for all, setup(fixtures) -> callable timed on its own)
+BENCHMARKS = {}
+
+def benchmark(name, scales=None):
+    """
+    Registers a benchmark
+    Params:
+        name: entry point name, the result key is 'name[scale]'
+        scales: scales it runs at, None for every scale
+    """
+    def register(setup):
+        BENCHMARKS[name] = (scales, setup)
+        return setup
+    return register
+
+class Fixtures:
+    """
+    Seeded inputs of one scale, built on first use and shared by the benchmarks
+    """
+
+    def __init__(self, scale, seed, directory):
+        """
+        Params:
+            scale: key of SCALES
+            seed: random seed
+            directory: where the fixture files are written
+        """
+        self.scale = scale
+        self.size = SCALES[scale]
+        self.seed = seed
+        self.directory = directory
+        self._built = {}
+
+    def path(self, name):
+        return os.path.join(self.directory, f'{self.scale}_{name}')
+
+    def _cached(self, key, build):
+        if key not in self._built:
+            self._built[key] = build()
+        return self._built[key]
+
+    @property
+    def graph(self):
+        #Erdos-Renyi graph with the scale's average degree
+        return self._cached('graph', lambda: GraphGenerator.generate_erdos_graph(
+            self.size['nodes'], self.size['degree'], seed=self.seed))
+
+    @property
+    def blocks(self):
+        #Four planted blocks, few edges between them, for partition
+        def build():
+            size = self.size['partition_nodes'] // 4
+            return GraphGenerator.generate_sbm([size] * 4, (8 / size, 0.2 / size), seed=self.seed)
+        return self._cached('blocks', build)
+
+    @property
+    def partitioned(self):
+        #blocks after partition, scored by partition_score
+        def build():
+            G = self.blocks.copy()
+            Algos.partition(G, 4, k=32, seed=self.seed)
+            return G
+        return self._cached('partitioned', build)
+
+    @property
+    def pairs(self):
+        #Query pairs inside the largest component of graph
+        def build():
+            rng = np.random.default_rng(self.seed)
+            nodes = np.array(sorted(max(nx.connected_components(self.graph), key=len)))
+            return [tuple(pair) for pair in rng.choice(nodes, (self.size['queries'], 2)).tolist()]
+        return self._cached('pairs', build)
+
+    @property
+    def graph_file(self):
+        #graph in the adjacency format of read_graph
+        def build():
+            GraphManager.save_graph(self.graph, self.path('graph.txt'))
+            return self.path('graph.txt')
+        return self._cached('graph_file', build)
+
+    @property
+    def traffic(self):
+        #(digraph, source, destination) of a grid with (a, b) latencies
+        return self._cached('traffic', lambda: grid_digraph(self.size['side'], self.seed))
+
+    @property
+    def traffic_file(self):
+        #traffic digraph in the 'source target a b' format of read_digraph (file.txt)
+        def build():
+            GraphManager.save_graph(self.traffic[0], self.path('traffic.txt'))
+            return self.path('traffic.txt')
+        return self._cached('traffic_file', build)
+
+    @property
+    def valuations(self):
+        #Dense integer valuations, one row per buyer
+        n = self.size['market']
+        return self._cached('valuations', lambda: np.random.default_rng(self.seed).integers(0, 10 * n, (n, n)))
+
+    @property
+    def market_file(self):
+        #valuations in the market.txt format: 'n prices' then one comma separated row per buyer
+        def build():
+            n = self.size['market']
+            with open(self.path('market.txt'), 'w') as file:
+                file.write(f"{n} {','.join(['0'] * n)}\n")
+                file.write('\n'.join(','.join(map(str, row)) for row in self.valuations.tolist()) + '\n')
+            return self.path('market.txt')
+        return self._cached('market_file', build)
+
+    @property
+    def sparse_market_file(self):
+        #sparse_market.txt format: 'buyers houses' then 'buyer,house,value' for five houses per buyer
+        def build():
+            n = self.size['market']
+            rng = np.random.default_rng(self.seed)
+            houses = np.argsort(rng.random((n, n)), axis=1)[:, :5]
+            values = rng.integers(1, 10 * n, houses.shape)
+            with open(self.path('sparse_market.txt'), 'w') as file:
+                file.write(f"{n} {n}\n")
+                file.writelines(f"{buyer},{house},{value}\n" for buyer in range(n)
+                                for house, value in zip(houses[buyer].tolist(), values[buyer].tolist()))
+            return self.path('sparse_market.txt')
+        return self._cached('sparse_market_file', build)
+
+    @property
+    def sparse_valuations(self):
+        return self._cached('sparse_valuations', lambda: GraphGenerator.generate_sparse_market(self.sparse_market_file)[2])
+
+#GraphManager
+
+@benchmark('GraphManager.read_graph')
+def _read_graph(f):
+    file_name = f.graph_file
+    return lambda: GraphManager.read_graph(file_name)
+
+@benchmark('GraphManager.read_graph[compact]')
+def _read_graph_compact(f):
+    file_name = f.graph_file
+    return lambda: GraphManager.read_graph(file_name, compact=True)
+
+@benchmark('GraphManager.read_digraph')
+def _read_digraph(f):
+    file_name = f.traffic_file
+    return lambda: GraphManager.read_digraph(file_name)
+
+@benchmark('GraphManager.save_graph')
+def _save_graph(f):
+    G = f.graph
+    return lambda: GraphManager.save_graph(G, f.path('saved.txt'))
+
+@benchmark('GraphManager.save_graph_binary')
+def _save_graph_binary(f):
+    G = f.graph
+    return lambda: GraphManager.save_graph_binary(G, f.path('binary'))
+
+@benchmark('GraphManager.read_graph_binary')
+def _read_graph_binary(f):
+    GraphManager.save_graph_binary(f.graph, f.path('binary'))
+    return lambda: GraphManager.read_graph_binary(f.path('binary'), mmap=False)
+
+#GraphGenerator
+
+@benchmark('GraphGenerator.generate_erdos_graph')
+def _generate_erdos_graph(f):
+    return lambda: GraphGenerator.generate_erdos_graph(f.size['nodes'], f.size['degree'], seed=f.seed)
+
+@benchmark('GraphGenerator.generate_bipartite')
+def _generate_bipartite(f):
+    half = f.size['nodes'] // 2
+    return lambda: GraphGenerator.generate_bipartite(half, half, f.size['degree'] / half, seed=f.seed)
+
+@benchmark('GraphGenerator.generate_barabasi_albert')
+def _generate_barabasi_albert(f):
+    return lambda: GraphGenerator.generate_barabasi_albert(f.size['nodes'], f.size['degree'] // 2, seed=f.seed)
+
+@benchmark('GraphGenerator.generate_watts_strogatz')
+def _generate_watts_strogatz(f):
+    return lambda: GraphGenerator.generate_watts_strogatz(f.size['nodes'], f.size['degree'], 0.1, seed=f.seed)
+
+@benchmark('GraphGenerator.generate_sbm')
+def _generate_sbm(f):
+    size = f.size['nodes'] // 4
+    return lambda: GraphGenerator.generate_sbm([size] * 4, (f.size['degree'] / size, 0.5 / size), seed=f.seed)
+
+@benchmark('GraphGenerator.generate_karate', scales=['small'])
+def _generate_karate(f):
+    return GraphGenerator.generate_karate
+
+@benchmark('GraphGenerator.generate_market')
+def _generate_market(f):
+    file_name = f.market_file
+    return lambda: GraphGenerator.generate_market(file_name)
+
+@benchmark('GraphGenerator.generate_sparse_market')
+def _generate_sparse_market(f):
+    file_name = f.sparse_market_file
+    return lambda: GraphGenerator.generate_sparse_market(file_name)
+
+#Algos
+
+@benchmark('Algos.calculate_shortest')
+def _calculate_shortest(f):
+    G, (source, target) = f.graph, f.pairs[0]
+    return lambda: Algos.calculate_shortest(G, source, target)
+
+@benchmark('Algos.calculate_shortest[bidirectional]')
+def _calculate_shortest_bidirectional(f):
+    G, (source, target) = f.graph, f.pairs[0]
+    return lambda: Algos.calculate_shortest(G, source, target, method='bidirectional')
+
+@benchmark('Algos.batch_shortest')
+def _batch_shortest(f):
+    G, pairs = f.graph, f.pairs
+    return lambda: Algos.batch_shortest(G, pairs, cache=None)
+
+@benchmark('Algos.partition')
+def _partition(f):
+    G = f.blocks.copy()
+    return lambda: Algos.partition(G, 4, k=32, seed=f.seed)
+
+@benchmark('Algos.partition_score')
+def _partition_score(f):
+    G = f.partitioned
+    return lambda: Algos.partition_score(G)
+
+@benchmark('Algos.perfect_matching[hungarian]')
+def _perfect_matching_hungarian(f):
+    n, valuations = f.size['market'], f.valuations
+    return lambda: Algos.perfect_matching(n, [0] * n, valuations)
+
+@benchmark('Algos.perfect_matching[auction]')
+def _perfect_matching_auction(f):
+    n, valuations = f.size['market'], f.valuations
+    return lambda: Algos.perfect_matching(n, [0] * n, valuations, method='auction')
+
+@benchmark('Algos.perfect_matching[rounds]', scales=['small'])
+def _perfect_matching_rounds(f):
+    n, valuations = f.size['market'], f.valuations
+    return lambda: Algos.perfect_matching(n, [0] * n, valuations, method='rounds')
+
+@benchmark('Algos.perfect_matching[sparse]')
+def _perfect_matching_sparse(f):
+    n, valuations = f.size['market'], f.sparse_valuations
+    return lambda: Algos.perfect_matching(n, [0] * n, valuations)
+
+@benchmark('Algos.preferred_seller_graph')
+def _preferred_seller_graph(f):
+    n, valuations = f.size['market'], f.valuations
+    assignment, payoffs, prices = Algos.perfect_matching(n, [0] * n, valuations)
+    return lambda: Algos.preferred_seller_graph(n, assignment, payoffs, prices, valuations)
+
+@benchmark('Algos.nash_social[gradient_projection]')
+def _nash_social(f):
+    G, source, destination = f.traffic
+    return lambda: Algos.nash_social(f.size['drivers'], source, destination, G, plot=False)
+
+@benchmark('Algos.nash_social[frank_wolfe]')
+def _nash_social_frank_wolfe(f):
+    G, source, destination = f.traffic
+    return lambda: Algos.nash_social(f.size['drivers'], source, destination, G, method='frank_wolfe', plot=False)
+
+@benchmark('Algos.nash_social_sweep')
+def _nash_social_sweep(f):
+    G, source, destination = f.traffic
+    drivers = f.size['drivers']
+    return lambda: Algos.nash_social_sweep(range(drivers // 5, drivers + 1, drivers // 5), source, destination, G)
+
+#Analytics
+
+@benchmark('Analytics.neighborhood')
+def _neighborhood(f):
+    G = f.graph
+    return lambda: Analytics.neighborhood(G)
+
+def run(name, fixtures, repeat):
+    """
+    Times one benchmark and measures its peak memory
+    Params:
+        name: key of BENCHMARKS
+        fixtures: Fixtures of the scale
+        repeat: timed runs, each with a fresh setup
+    Returns:
+        dict with the fastest and median seconds and the peak traced bytes
+    """
+    _, setup = BENCHMARKS[name]
+    times = []
+    #The entry points print their results, which would bury the report
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        for _ in range(repeat):
+            call = setup(fixtures)
+            start = time.perf_counter()
+            call()
+            times.append(time.perf_counter() - start)
+        call = setup(fixtures)
+        _, peak = measure(call)
+    return {'seconds': min(times), 'median_seconds': statistics.median(times), 'peak_bytes': peak}
+
+def compare(result, baseline, tolerance, memory_tolerance):
+    """
+    Params:
+        result: dict from run
+        baseline: stored dict for the same key, or None
+        tolerance: allowed relative slowdown of the fastest run
+        memory_tolerance: allowed relative growth of the peak memory
+    Returns:
+        list of flags: 'new', 'slower', 'more memory'
+    """
+    if baseline is None:
+        return ['new']
+    flags = []
+    if result['seconds'] > baseline['seconds'] * (1 + tolerance) and result['seconds'] - baseline['seconds'] > NOISE_SECONDS:
+        flags.append('slower')
+    if result['peak_bytes'] > baseline['peak_bytes'] * (1 + memory_tolerance) and \
+            result['peak_bytes'] - baseline['peak_bytes'] > NOISE_BYTES:
+        flags.append('more memory')
+    return flags
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--scales', nargs='+', default=['small', 'medium'], choices=list(SCALES))
+    parser.add_argument('--filter', nargs='+', default=None, help='only benchmarks whose name contains one of these')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=427)
+    parser.add_argument('--baseline', default=BASELINE)
+    parser.add_argument('--save-baseline', action='store_true', help='store these results as the new baseline')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed relative slowdown')
+    parser.add_argument('--memory-tolerance', type=float, default=0.10, help='allowed relative peak memory growth')
+    parser.add_argument('--output', default=None, help='JSON file for the results')
+    args = parser.parse_args()
+
+    stored = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, 'r') as file:
+            stored = json.load(file)['results']
+    elif not args.save_baseline:
+        print(f"No baseline at {args.baseline}, run with --save-baseline to store one")
+
+    names = [name for name in BENCHMARKS if args.filter is None or any(part in name for part in args.filter)]
+    results, regressions = {}, 0
+    print(f"{'benchmark':<45} {'scale':>7} {'seconds':>9} {'median':>9} {'peak MB':>8} {'baseline':>9} {'change':>8}  flags")
+    with tempfile.TemporaryDirectory() as directory:
+        for scale in args.scales:
+            fixtures = Fixtures(scale, args.seed, directory)
+            for name in names:
+                scales, _ = BENCHMARKS[name]
+                if scales is not None and scale not in scales:
+                    continue
+                key = f'{name}[{scale}]'
+                result = run(name, fixtures, args.repeat)
+                results[key] = result
+                base = stored.get(key)
+                flags = compare(result, base, args.tolerance, args.memory_tolerance)
+                regressions += bool(set(flags) - {'new'})
+                before = f"{base['seconds']:.4f}" if base else ''
+                change = f"{result['seconds'] / base['seconds'] - 1:+.0%}" if base and base['seconds'] > 0 else ''
+                print(f"{name:<45} {scale:>7} {result['seconds']:>9.4f} {result['median_seconds']:>9.4f} "
+                      f"{result['peak_bytes'] / 2**20:>8.2f} {before:>9} {change:>8}  {', '.join(flags)}", flush=True)
+
+    report = {'python': platform.python_version(), 'numpy': np.__version__, 'networkx': nx.__version__,
+              'machine': platform.machine(), 'time': time.strftime('%Y-%m-%dT%H:%M:%S'), 'results': results}
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent=1)
+    if args.save_baseline:
+        #Entries that were not run this time are kept
+        report['results'] = dict(stored, **results)
+        with open(args.baseline, 'w') as file:
+            json.dump(report, file, indent=1)
+        print(f"Baseline saved to {args.baseline}")
+    if regressions:
+        print(f"{regressions} regressions")
+    raise SystemExit(1 if regressions and not args.save_baseline else 0)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,156 @@
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+import numpy as np
+from csr_graph import CSRGraph
+
+#Components smaller than this are scored in the calling process, a pool round trip costs more than the work
+MIN_PARALLEL_NODES = 500
+
+class EdgeBetweenness:
+    """
+    Edge betweenness backend for Algos.partition.
+    Brandes passes are sharded by source node across a process pool. The graph is handed to the
+    workers as CSR arrays in shared memory, created once per context, so it is never pickled or
+    copied per task. With k set, only k
+    sampled sources are used and the scores are scaled up, giving approximate betweenness.
+
+    Use as a context manager so the pool is created once for a whole partition run:
+        with EdgeBetweenness(workers=4, k=256, seed=1) as scorer:
+            scores = scorer(G)
+    """
+
+    def __init__(self, workers=None, k=None, seed=None):
+        """
+        Params:
+            workers: number of worker processes, None or 1 runs in the calling process
+            k: number of sampled source nodes per call, None uses every node
+            seed: seed for the source sampling
+        """
+        self.workers = workers
+        self.k = k
+        self.rng = np.random.default_rng(seed)
+        self._pool = None
+        #Shared offsets and targets blocks, created on the first parallel call and grown when a graph does not fit
+        self._blocks = None
+
+    def __enter__(self):
+        if self.workers and self.workers > 1:
+            self._pool = ProcessPoolExecutor(max_workers=self.workers)
+        return self
+
+    def __exit__(self, *exc):
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+        if self._blocks is not None:
+            for block in self._blocks:
+                block.close()
+                block.unlink()
+            self._blocks = None
+
+    def __call__(self, G):
+        """
+        Unnormalized edge betweenness, the same values as nx.edge_betweenness_centrality(G, normalized=False)
+        when every source is used
+        Params:
+            G: undirected graph object or CSRGraph
+        Returns:
+            dict of edge -> betweenness
+        """
+        csr = G if isinstance(G, CSRGraph) else CSRGraph.from_networkx(G)
+        n = csr.number_of_nodes()
+        sources = np.arange(n, dtype=np.int64)
+        scale = 0.5
+        if self.k is not None and self.k < n:
+            sources = np.sort(self.rng.choice(n, self.k, replace=False))
+            scale *= n / self.k
+
+        if self._pool is None or n < MIN_PARALLEL_NODES:
+            slot_scores = brandes_edge_scores(csr.offsets.tolist(), csr.targets.tolist(), sources.tolist())
+        else:
+            slot_scores = self._parallel_scores(csr, sources)
+
+        #Each undirected edge is stored twice. Rows are sorted, so ordering the slots by
+        #(target, source) lines every slot up with its reverse copy
+        mirror = np.lexsort((csr.sources(), csr.targets))
+        edge_sources, edge_targets, slots = csr._edge_slots()
+        values = (slot_scores[slots] + slot_scores[mirror[slots]]) * scale
+        nodes = csr.node_ids.tolist()
+        return {(nodes[u], nodes[v]): value
+                for u, v, value in zip(edge_sources.tolist(), edge_targets.tolist(), values.tolist())}
+
+    def _parallel_scores(self, csr, sources):
+        #Copy the CSR arrays into the shared blocks, workers read them in place by name
+        arrays = (csr.offsets, csr.targets)
+        if self._blocks is None or any(block.size < array.nbytes for block, array in zip(self._blocks, arrays)):
+            if self._blocks is not None:
+                for block in self._blocks:
+                    block.close()
+                    block.unlink()
+            #Room to spare so the following, smaller components reuse the blocks
+            self._blocks = [shared_memory.SharedMemory(create=True, size=max(2 * array.nbytes, 8)) for array in arrays]
+        for block, array in zip(self._blocks, arrays):
+            np.ndarray(array.shape, dtype=np.int64, buffer=block.buf)[:] = array
+        specs = [(block.name, len(array)) for block, array in zip(self._blocks, arrays)]
+        shards = np.array_split(sources, self.workers * 4)
+        futures = [self._pool.submit(_worker_scores, specs[0], specs[1], shard.tolist())
+                   for shard in shards if len(shard)]
+        return sum(future.result() for future in futures)
+
+def brandes_edge_scores(offsets, targets, sources):
+    """
+    Brandes dependency accumulation over a CSR graph for the given sources
+    Params:
+        offsets, targets: CSR arrays as lists or int64 memoryviews
+        sources: list of source node indices
+    Returns:
+        float64 array aligned with targets, the dependency carried by each directed slot
+    """
+    scores = [0.0] * len(targets)
+    for s in sources:
+        sigma = {s: 1}
+        dist = {s: 0}
+        preds = {s: []}
+        order = []
+        queue = deque([s])
+        while queue:
+            v = queue.popleft()
+            order.append(v)
+            next_dist = dist[v] + 1
+            for slot in range(offsets[v], offsets[v + 1]):
+                w = targets[slot]
+                if w not in dist:
+                    dist[w] = next_dist
+                    sigma[w] = 0
+                    preds[w] = []
+                    queue.append(w)
+                if dist[w] == next_dist:
+                    sigma[w] += sigma[v]
+                    preds[w].append((v, slot))
+
+        delta = dict.fromkeys(order, 0.0)
+        for w in reversed(order):
+            coefficient = (1 + delta[w]) / sigma[w]
+            for v, slot in preds[w]:
+                c = sigma[v] * coefficient
+                scores[slot] += c
+                delta[v] += c
+    return np.array(scores, dtype=np.float64)
+
+#Shared blocks a pool process has attached to, by name
+_attached = {}
+
+def _worker_scores(offsets_spec, targets_spec, sources):
+    #Runs in a pool process: score one shard of sources straight from the shared CSR arrays.
+    #int64 memoryviews index to Python ints as fast as lists, without copying the arrays
+    names = [name for name, _ in (offsets_spec, targets_spec)]
+    for name in list(_attached):
+        if name not in names:
+            _attached.pop(name).close()
+    for name in names:
+        if name not in _attached:
+            _attached[name] = shared_memory.SharedMemory(name=name)
+    with _attached[names[0]].buf.cast('q') as offsets, _attached[names[1]].buf.cast('q') as targets:
+        with offsets[:offsets_spec[1]] as offsets, targets[:targets_spec[1]] as targets:
+            return brandes_edge_scores(offsets, targets, sources)
@@ -0,0 +1,558 @@
+import json
+import os
+import warnings
+from collections import deque
+from numbers import Number
+import numpy as np
+import networkx as nx
+
+#Version written into meta.json of binary graph directories
+FORMAT_VERSION = 1
+
+class CSRGraph:
+    """
+    Compressed sparse row (CSR) storage of a graph.
+    The neighbors of the node at index i are targets[offsets[i]:offsets[i+1]], sorted by index.
+    Undirected graphs store every edge in both directions.
+
+    The read API follows networkx (nodes, edges, adj, degree, G[u][v], edge attributes)
+    so code that only reads a graph works on either representation.
+    """
+    __slots__ = ('node_ids', 'offsets', 'targets', 'weight_a', 'weight_b', 'directed',
+                 'edge_attrs', 'node_attrs', '_index', '_nx_graph', '__weakref__')
+
+    def __init__(self, node_ids, offsets, targets, directed=False, weight_a=None, weight_b=None,
+                 edge_attrs=None, node_attrs=None):
+        """
+        Params:
+            node_ids: array of node ids, position i is the id of node index i
+            offsets: int64 array of length n+1
+            targets: int64 array of neighbor indices
+            directed: boolean flag
+            weight_a, weight_b: optional arrays aligned with targets holding (a, b) edge weights
+            edge_attrs: optional dict of attribute name -> array aligned with targets
+            node_attrs: optional dict of attribute name -> array aligned with node_ids
+        """
+        self.node_ids = node_ids
+        self.offsets = offsets
+        self.targets = targets
+        self.directed = directed
+        self.weight_a = weight_a
+        self.weight_b = weight_b
+        self.edge_attrs = edge_attrs if edge_attrs is not None else {}
+        self.node_attrs = node_attrs if node_attrs is not None else {}
+        self._index = None
+        self._nx_graph = None
+
+    #Construction
+
+    @classmethod
+    def from_edges(cls, num_nodes, sources, targets, directed=False, node_ids=None,
+                   weight_a=None, weight_b=None, edge_attrs=None, node_attrs=None):
+        """
+        Builds a CSR graph from parallel arrays of edge endpoints (node indices).
+        Duplicate edges are merged, keeping the attributes of the last one.
+        Params:
+            num_nodes: number of nodes
+            sources, targets: integer arrays of node indices
+            directed: boolean flag
+            node_ids: optional array of node ids, defaults to 0..num_nodes-1
+            weight_a, weight_b, edge_attrs: optional arrays aligned with the edges
+            node_attrs: optional dict of arrays aligned with the nodes
+        Returns:
+            CSRGraph
+        """
+        sources = np.asarray(sources, dtype=np.int64)
+        targets = np.asarray(targets, dtype=np.int64)
+        attrs = dict(edge_attrs or {})
+        if weight_a is not None:
+            attrs['\0a'], attrs['\0b'] = weight_a, weight_b
+        attrs = {name: np.asarray(values) for name, values in attrs.items()}
+
+        if not directed:
+            #Mirror every edge except self loops
+            mirror = sources != targets
+            sources, targets = np.concatenate([sources, targets[mirror]]), np.concatenate([targets, sources[mirror]])
+            attrs = {name: np.concatenate([values, values[mirror]]) for name, values in attrs.items()}
+
+        #Sort by (source, target) and keep the last copy of repeated edges. A stable sort of one
+        #combined key is about 3x faster than lexsort on the two columns
+        keys = sources * max(num_nodes, 1) + targets
+        order = np.argsort(keys, kind='stable')
+        keys = keys[order]
+        last = np.ones(len(keys), dtype=bool)
+        last[:-1] = keys[1:] != keys[:-1]
+        order = order[last]
+
+        sources, targets = sources[order], targets[order]
+        attrs = {name: values[order] for name, values in attrs.items()}
+        offsets = np.zeros(num_nodes + 1, dtype=np.int64)
+        np.cumsum(np.bincount(sources, minlength=num_nodes), out=offsets[1:])
+
+        if node_ids is None:
+            node_ids = np.arange(num_nodes, dtype=np.int64)
+        weight_a, weight_b = attrs.pop('\0a', None), attrs.pop('\0b', None)
+        return cls(node_ids, offsets, targets, directed, weight_a, weight_b, attrs, node_attrs)
+
+    @classmethod
+    def from_networkx(cls, G):
+        """
+        Builds a CSR graph from a networkx graph. Numeric and string attributes are kept,
+        (a, b) tuple weights go into weight_a/weight_b.
+        Params:
+            G: graph object
+        Returns:
+            CSRGraph
+        """
+        nodes = list(G.nodes())
+        index = {node: i for i, node in enumerate(nodes)}
+        edges = list(G.edges(data=True))
+        sources = np.fromiter((index[u] for u, _, _ in edges), dtype=np.int64, count=len(edges))
+        targets = np.fromiter((index[v] for _, v, _ in edges), dtype=np.int64, count=len(edges))
+
+        weight_a = weight_b = None
+        weights = [data.get('weight') for _, _, data in edges]
+        pairs = any(isinstance(weight, (tuple, list)) for weight in weights)
+        edge_attrs = _attribute_arrays([data for _, _, data in edges], 'edge', ('weight',) if pairs else ())
+        if pairs:
+            #(a, b) polynomial weights as written by read_digraph
+            pairs = [weight if isinstance(weight, (tuple, list)) else (0, 0) for weight in weights]
+            weight_a = np.array([a for a, _ in pairs], dtype=np.float64)
+            weight_b = np.array([b for _, b in pairs], dtype=np.float64)
+        node_attrs = _attribute_arrays([G.nodes[node] for node in nodes], 'node')
+
+        return cls.from_edges(len(nodes), sources, targets, G.is_directed(), node_id_array(nodes),
+                              weight_a, weight_b, edge_attrs, node_attrs)
+
+    def to_networkx(self):
+        """
+        Converts to a networkx graph. The conversion is done once and cached,
+        so algorithms that need networkx only pay for it on first use.
+        Returns:
+            G: graph object
+        """
+        if self._nx_graph is None:
+            G = nx.DiGraph() if self.directed else nx.Graph()
+            nodes = self.node_ids.tolist()
+            node_attrs = {name: values.tolist() for name, values in self.node_attrs.items()}
+            G.add_nodes_from((node, {name: values[i] for name, values in node_attrs.items()})
+                             for i, node in enumerate(nodes))
+            sources, targets, slots = self._edge_slots()
+            G.add_edges_from((nodes[u], nodes[v], self._edge_data(slot))
+                             for u, v, slot in zip(sources.tolist(), targets.tolist(), slots.tolist()))
+            self._nx_graph = G
+        return self._nx_graph
+
+    def refresh(self):
+        """
+        Rebuilds the arrays from the cached networkx conversion after an algorithm edited it
+        (Algos.partition removes edges from it), so both representations hold the same graph again.
+        Memory-mapped arrays are replaced by in-memory ones.
+        """
+        if self._nx_graph is None:
+            return
+        fresh = CSRGraph.from_networkx(self._nx_graph)
+        self.node_ids, self.offsets, self.targets = fresh.node_ids, fresh.offsets, fresh.targets
+        self.weight_a, self.weight_b = fresh.weight_a, fresh.weight_b
+        self.edge_attrs, self.node_attrs = fresh.edge_attrs, fresh.node_attrs
+        self._index = None
+
+    #networkx style read API
+
+    @property
+    def nodes(self):
+        return _NodeView(self)
+
+    @property
+    def edges(self):
+        return _EdgeView(self)
+
+    @property
+    def adj(self):
+        return _AdjacencyView(self)
+
+    @property
+    def degree(self):
+        return _DegreeView(self)
+
+    def __getitem__(self, node):
+        return _NeighborView(self, self.index_of(node))
+
+    def __iter__(self):
+        return iter(self.node_ids.tolist())
+
+    def __len__(self):
+        return self.number_of_nodes()
+
+    def __contains__(self, node):
+        return self.has_node(node)
+
+    def number_of_nodes(self):
+        return len(self.offsets) - 1
+
+    def number_of_edges(self):
+        if self.directed:
+            return len(self.targets)
+        #Self loops are stored once, every other edge twice
+        self_loops = int(np.count_nonzero(self.sources() == self.targets))
+        return (len(self.targets) + self_loops) // 2
+
+    def is_directed(self):
+        return self.directed
+
+    def has_node(self, node):
+        try:
+            self.index_of(node)
+            return True
+        except KeyError:
+            return False
+
+    def has_edge(self, u, v):
+        try:
+            self.edge_slot(u, v)
+            return True
+        except KeyError:
+            return False
+
+    def neighbors(self, node):
+        i = self.index_of(node)
+        return iter(self.node_ids[self.targets[self.offsets[i]:self.offsets[i + 1]]].tolist())
+
+    def degrees(self):
+        """
+        Returns:
+            int64 array of node degrees (out-degrees for digraphs), aligned with node_ids
+        """
+        return np.diff(self.offsets)
+
+    def sources(self):
+        """
+        Returns:
+            int64 array aligned with targets holding the source index of every stored edge
+        """
+        return np.repeat(np.arange(self.number_of_nodes(), dtype=np.int64), np.diff(self.offsets))
+
+    def edge_array(self):
+        """
+        Returns:
+            (sources, targets) index arrays with every edge once, even for undirected graphs
+        """
+        sources, targets, _ = self._edge_slots()
+        return sources, targets
+
+    def index_of(self, node):
+        """
+        Position of a node id in node_ids.
+        Raises:
+            KeyError if the node is not in the graph
+        """
+        if self._index is None:
+            ids = self.node_ids
+            if ids.dtype.kind == 'i' and np.array_equal(ids, np.arange(len(ids))):
+                #Generated graphs use 0..n-1 as ids, no lookup table needed
+                self._index = len(ids)
+            else:
+                self._index = {node: i for i, node in enumerate(ids.tolist())}
+        if isinstance(self._index, int):
+            if isinstance(node, (int, np.integer)) and 0 <= node < self._index:
+                return int(node)
+            raise KeyError(node)
+        return self._index[node]
+
+    def edge_slot(self, u, v):
+        """
+        Position of edge (u, v) in targets and the attribute arrays.
+        Raises:
+            KeyError if the edge is not in the graph
+        """
+        i, j = self.index_of(u), self.index_of(v)
+        start, end = self.offsets[i], self.offsets[i + 1]
+        slot = start + int(np.searchsorted(self.targets[start:end], j))
+        if slot >= end or self.targets[slot] != j:
+            raise KeyError((u, v))
+        return slot
+
+    def shortest_path(self, source, target):
+        """
+        Unweighted shortest path by breadth first search over the CSR arrays
+        Params:
+            source, target: node ids
+        Returns:
+            path: list of node ids, or None if target is unreachable
+        """
+        s, t = self.index_of(source), self.index_of(target)
+        parent = np.full(self.number_of_nodes(), -1, dtype=np.int64)
+        parent[s] = s
+        offsets, targets = self.offsets, self.targets
+        queue = deque([s])
+        while queue and parent[t] == -1:
+            u = queue.popleft()
+            for v in targets[offsets[u]:offsets[u + 1]].tolist():
+                if parent[v] == -1:
+                    parent[v] = u
+                    queue.append(v)
+        if parent[t] == -1:
+            return None
+
+        path = [t]
+        while path[-1] != s:
+            path.append(int(parent[path[-1]]))
+        return self.node_ids[path[::-1]].tolist()
+
+    def nbytes(self):
+        """
+        Returns:
+            total size in bytes of the arrays backing the graph
+        """
+        arrays = [self.node_ids, self.offsets, self.targets, self.weight_a, self.weight_b]
+        arrays += list(self.edge_attrs.values()) + list(self.node_attrs.values())
+        return sum(array.nbytes for array in arrays if array is not None)
+
+    #Binary format
+
+    def save(self, path):
+        """
+        Writes the graph as a directory of .npy arrays plus meta.json
+        Params:
+            path: directory name, created if missing
+        """
+        os.makedirs(path, exist_ok=True)
+        np.save(os.path.join(path, 'node_ids.npy'), np.asarray(self.node_ids))
+        np.save(os.path.join(path, 'offsets.npy'), np.asarray(self.offsets, dtype=np.int64))
+        np.save(os.path.join(path, 'targets.npy'), np.asarray(self.targets, dtype=np.int64))
+        weighted = self.weight_a is not None
+        if weighted:
+            np.save(os.path.join(path, 'weight_a.npy'), np.asarray(self.weight_a, dtype=np.float64))
+            np.save(os.path.join(path, 'weight_b.npy'), np.asarray(self.weight_b, dtype=np.float64))
+        for name, values in self.edge_attrs.items():
+            np.save(os.path.join(path, f'edge_{name}.npy'), np.asarray(values))
+        for name, values in self.node_attrs.items():
+            np.save(os.path.join(path, f'node_{name}.npy'), np.asarray(values))
+
+        meta = {'version': FORMAT_VERSION, 'directed': self.directed, 'weighted': weighted,
+                'edge_attrs': list(self.edge_attrs), 'node_attrs': list(self.node_attrs)}
+        with open(os.path.join(path, 'meta.json'), 'w') as file:
+            json.dump(meta, file)
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        """
+        Opens a directory written by save. With mmap the arrays are memory-mapped
+        (numpy.memmap) so nothing is read from disk until it is used.
+        Params:
+            path: directory name
+            mmap: boolean flag
+        Returns:
+            CSRGraph
+        """
+        meta_file = os.path.join(path, 'meta.json')
+        if not os.path.exists(meta_file):
+            raise FileNotFoundError(f"Error: '{path}' is not a binary graph directory.")
+        with open(meta_file, 'r') as file:
+            meta = json.load(file)
+        if meta.get('version') != FORMAT_VERSION:
+            raise ValueError(f"Unsupported binary graph version: {meta.get('version')}")
+
+        mode = 'r' if mmap else None
+        load = lambda name: np.load(os.path.join(path, name + '.npy'), mmap_mode=mode)
+        arrays = {name: load(name) for name in ('node_ids', 'offsets', 'targets')}
+        if meta['weighted']:
+            arrays['weight_a'] = load('weight_a')
+            arrays['weight_b'] = load('weight_b')
+        arrays['edge_attrs'] = {name: load(f'edge_{name}') for name in meta.get('edge_attrs', [])}
+        arrays['node_attrs'] = {name: load(f'node_{name}') for name in meta.get('node_attrs', [])}
+        return cls(directed=meta['directed'], **arrays)
+
+    #Helpers
+
+    def _edge_slots(self):
+        #Every edge once: undirected graphs keep the copy stored under the smaller index
+        sources = self.sources()
+        slots = np.arange(len(self.targets), dtype=np.int64)
+        if not self.directed:
+            keep = sources <= self.targets
+            sources, slots = sources[keep], slots[keep]
+        return sources, self.targets[slots], slots
+
+    def _edge_data(self, slot):
+        data = {name: values[slot].item() for name, values in self.edge_attrs.items()}
+        if self.weight_a is not None:
+            data['weight'] = (_plain(self.weight_a[slot]), _plain(self.weight_b[slot]))
+        return data
+
+class _NodeView:
+    __slots__ = ('_graph',)
+
+    def __init__(self, graph):
+        self._graph = graph
+
+    def __call__(self, data=False):
+        if not data:
+            return self
+        graph = self._graph
+        return ((node, {name: values[i].item() for name, values in graph.node_attrs.items()})
+                for i, node in enumerate(graph.node_ids.tolist()))
+
+    def __iter__(self):
+        return iter(self._graph.node_ids.tolist())
+
+    def __len__(self):
+        return self._graph.number_of_nodes()
+
+    def __contains__(self, node):
+        return self._graph.has_node(node)
+
+    def __getitem__(self, node):
+        graph = self._graph
+        i = graph.index_of(node)
+        return {name: values[i].item() for name, values in graph.node_attrs.items()}
+
+class _EdgeView:
+    __slots__ = ('_graph',)
+
+    def __init__(self, graph):
+        self._graph = graph
+
+    def __call__(self, data=False):
+        graph = self._graph
+        nodes = graph.node_ids.tolist()
+        sources, targets, slots = graph._edge_slots()
+        if not data:
+            return ((nodes[u], nodes[v]) for u, v in zip(sources.tolist(), targets.tolist()))
+        return ((nodes[u], nodes[v], graph._edge_data(slot))
+                for u, v, slot in zip(sources.tolist(), targets.tolist(), slots.tolist()))
+
+    def __iter__(self):
+        return self()
+
+    def __len__(self):
+        return self._graph.number_of_edges()
+
+    def __contains__(self, edge):
+        return self._graph.has_edge(*edge)
+
+    def __getitem__(self, edge):
+        graph = self._graph
+        return graph._edge_data(graph.edge_slot(*edge))
+
+class _AdjacencyView:
+    __slots__ = ('_graph',)
+
+    def __init__(self, graph):
+        self._graph = graph
+
+    def __getitem__(self, node):
+        return self._graph[node]
+
+    def __iter__(self):
+        return iter(self._graph)
+
+    def __len__(self):
+        return self._graph.number_of_nodes()
+
+    def items(self):
+        return ((node, self._graph[node]) for node in self._graph)
+
+class _NeighborView:
+    __slots__ = ('_graph', '_index')
+
+    def __init__(self, graph, index):
+        self._graph = graph
+        self._index = index
+
+    def _slots(self):
+        graph = self._graph
+        return range(graph.offsets[self._index], graph.offsets[self._index + 1])
+
+    def __iter__(self):
+        graph = self._graph
+        return iter(graph.node_ids[graph.targets[graph.offsets[self._index]:graph.offsets[self._index + 1]]].tolist())
+
+    def __len__(self):
+        return len(self._slots())
+
+    def __contains__(self, node):
+        return self._graph.has_edge(self._graph.node_ids[self._index].item(), node)
+
+    def __getitem__(self, node):
+        graph = self._graph
+        return graph._edge_data(graph.edge_slot(graph.node_ids[self._index].item(), node))
+
+    def items(self):
+        graph = self._graph
+        return ((graph.node_ids[graph.targets[slot]].item(), graph._edge_data(slot)) for slot in self._slots())
+
+class _DegreeView:
+    __slots__ = ('_graph',)
+
+    def __init__(self, graph):
+        self._graph = graph
+
+    def __call__(self, nbunch=None):
+        if nbunch is None:
+            return self
+        return self[nbunch]
+
+    def __iter__(self):
+        graph = self._graph
+        return zip(graph.node_ids.tolist(), graph.degrees().tolist())
+
+    def __len__(self):
+        return self._graph.number_of_nodes()
+
+    def __getitem__(self, node):
+        graph = self._graph
+        i = graph.index_of(node)
+        degree = int(graph.offsets[i + 1] - graph.offsets[i])
+        if not graph.directed and graph.has_edge(node, node):
+            #networkx counts a self loop twice
+            degree += 1
+        return degree
+
+def as_networkx(G):
+    """
+    Returns G itself for networkx graphs and the cached networkx conversion for CSR graphs
+    Params:
+        G: graph object or CSRGraph
+    Returns:
+        G: graph object
+    """
+    if isinstance(G, CSRGraph):
+        return G.to_networkx()
+    return G
+
+def _attribute_arrays(records, kind, handled=()):
+    #Columns of attribute dicts that are all numbers or all strings. Anything else (missing on some
+    #records, mixed or other types) has no array to go in and is dropped with a warning, except the
+    #names in handled that the caller stores another way
+    names = set().union(*records) if records else set()
+    arrays, dropped = {}, []
+    for name in sorted(names):
+        values = [record.get(name) for record in records]
+        if all(isinstance(value, Number) for value in values):
+            arrays[name] = np.array(values)
+        elif all(isinstance(value, str) for value in values):
+            arrays[name] = np.array(values, dtype=str)
+        elif name not in handled:
+            dropped.append(name)
+    if dropped:
+        warnings.warn(f"CSRGraph drops the {kind} attributes {', '.join(map(repr, dropped))}: they are missing "
+                      f"on some {kind}s or not all numbers or all strings", stacklevel=3)
+    return arrays
+
+def node_id_array(nodes):
+    """
+    Packs node ids into an array: int64 for integer ids, fixed width strings otherwise
+    so the table stays memory-mappable
+    Params:
+        nodes: list of node ids
+    Returns:
+        numpy array
+    """
+    if all(isinstance(node, (int, np.integer)) and not isinstance(node, bool) for node in nodes):
+        return np.array(nodes, dtype=np.int64)
+    return np.array([str(node) for node in nodes], dtype=str)
+
+def _plain(value):
+    #Weights read from text files are ints, keep them that way after a round trip
+    return int(value) if float(value).is_integer() else float(value)
@@ -1,75 +1,154 @@
-import networkx as nx
-from matplotlib import pyplot as plt
-import numpy as np
-import dwave_networkx as dnx
-from dwave.samplers import SimulatedAnnealingSampler
-class Attributes:
-
-    @staticmethod
-    def homophily(G,p):
-        """
-        Calculates homophily in graph
-        Param:
-            G: a graph object
-            p: probability of the graph
-        Returns:
-            none"""
-        for node in G.nodes():
-            G.nodes[node]['color'] = 'red' if np.random.rand() < p else 'blue'
-        
-        
-        # Calculate and print the assortativity coefficient
-        assortativity = nx.attribute_assortativity_coefficient(G, 'color')
-        print(f"Assortativity coefficient: {assortativity}")
-
-        #Plot the graph 
-        colors = [G.nodes[node]['color'] for node in G.nodes()]
-        nx.draw(G, node_color=colors, with_labels=True)
-        plt.title("Homophily graph")
-        plt.show()
-        
-    @staticmethod
-    def balanced_graph(G,p):
-        """
-        Assigns + or - to edges in a graph and checks if the graph is balanced
-        Param:
-            G: a graph object
-            p: probability of the graph
-        Returns:
-            is_balanced: boolean that is True if the graph is balanced
-            num_frustrated_edges: Number of edges that are '-'
-        """
-        edge_labels = {}
-
-        for edge in G.edges():
-            # Set 'sign' attribute to '+' or '-'
-            # Signs are in integers because the dnx function will not work without them
-            # 1 for positive -1 for negative
-            G.edges[edge]['sign'] = 1 if np.random.rand() < p else -1
-
-            #Labeling edges with actual signs to display them correctly
-            sign = G.edges[edge]['sign']
-            edge_labels[edge] = '+' if sign == 1 else '-'
-
-        # Initialize the sampler
-        sampler = SimulatedAnnealingSampler()
-
-        # Check structural imbalance
-        try:
-            imbalances= dnx.structural_imbalance(G, sampler)
-            is_balanced = len(imbalances) == 0
-            num_frustrated_edges = len(imbalances)  # Number of negative edges
-        except Exception as e:
-            print(f"Error checking structural imbalance: {e}")
-            return None, None
-        #Initializing position
-        pos = nx.spring_layout(G)
-
-        #Drawing nodes and labeling edges with different colors depending on sign
-        nx.draw_networkx(G, pos, edge_color=[G[u][v]['sign'] for u,v in G.edges()], node_color='blue', with_labels=True)
-        nx.draw_networkx_edge_labels(G, pos, edge_labels=edge_labels, font_color='green')
-
-        #Showing
-        plt.title("Graph with Signed Edges")
-        plt.show()
-        return is_balanced, num_frustrated_edges
\ No newline at end of file
+import networkx as nx
+import numpy as np
+from balance import SignedGraph, check_balance, frustration
+from csr_graph import CSRGraph, as_networkx
+from instrumentation import instrumented
+from layout import LAYOUT_CACHE
+
+#Trials x edges cells colored per batch in Attributes.homophily
+TRIAL_CELLS = 1 << 24
+
+class Attributes:
+
+    @staticmethod
+    @instrumented
+    def homophily(G,p,plot=True,trials=1,seed=None,confidence=0.95):
+        """
+        Calculates homophily in graph: nodes are colored red with probability p and the color
+        assortativity is computed from the mixing matrix over the edge arrays
+        Param:
+            G: a graph object or CSRGraph
+            p: probability of the graph
+            plot: draw the colored graph (single trial only)
+            trials: independent colorings, drawn and scored in batches without drawing
+            seed: seed of the random generator
+            confidence: mass of the interval returned for several trials
+        Returns:
+            assortativity: assortativity coefficient, the mean over the trials
+            interval: (low, high) quantiles of the trials holding the confidence mass, None for one trial
+        """
+        rng = np.random.default_rng(seed)
+        sources, targets, nodes, directed = Attributes._edge_arrays(G)
+        values = []
+        #Trials per batch so the trials x edges color codes stay small
+        batch = max(1, TRIAL_CELLS // max(len(sources), len(nodes), 1))
+        for start in range(0, trials, batch):
+            red = rng.random((min(batch, trials - start), len(nodes))) < p
+            values.append(Attributes.assortativity(sources, targets, red, directed))
+        values = np.concatenate(values)
+        assortativity = float(values.mean())
+
+        if trials > 1:
+            tail = (1 - confidence) / 2
+            interval = tuple(np.quantile(values, [tail, 1 - tail]).tolist())
+            print(f"Assortativity coefficient: {assortativity} ({confidence:.0%} of {trials} trials in {interval})")
+            return assortativity, interval
+        print(f"Assortativity coefficient: {assortativity}")
+
+        #Plot the graph, pyplot is only imported once something is drawn
+        if plot:
+            from matplotlib import pyplot as plt
+            graph = as_networkx(G)
+            colors = np.where(red[0], 'red', 'blue').tolist()
+            nx.set_node_attributes(graph, dict(zip(nodes, colors)), 'color')
+            #The colors went into the networkx view of a CSR graph, its arrays follow
+            if isinstance(G, CSRGraph):
+                G.refresh()
+            nx.draw(graph, node_color=colors, with_labels=True)
+            plt.title("Homophily graph")
+            plt.show()
+        return assortativity, None
+
+    @staticmethod
+    def assortativity(sources, targets, red, directed=False):
+        """
+        Color assortativity r = (trace(e) - sum(a * b)) / (1 - sum(a * b)) from the 2 x 2 mixing
+        matrix e of every coloring, same as nx.attribute_assortativity_coefficient
+        Params:
+            sources, targets: edge index arrays, every edge once
+            red: trials x nodes boolean array of colorings
+            directed: count edges one way only
+        Returns:
+            array of one coefficient per coloring, nan when every node has the same color
+        """
+        tail, head = red[:, sources], red[:, targets]
+        both = np.count_nonzero(tail & head, axis=1)
+        tails, heads = np.count_nonzero(tail, axis=1), np.count_nonzero(head, axis=1)
+        #Rows are the source color (blue, red), columns the target color
+        mixing = np.stack([len(sources) - tails - heads + both, heads - both,
+                           tails - both, both], axis=1).reshape(-1, 2, 2).astype(np.float64)
+        if not directed:
+            #Every edge is counted both ways except self loops, which networkx counts once
+            mixing += mixing.transpose(0, 2, 1)
+            loops = red[:, sources[sources == targets]]
+            loops_red = np.count_nonzero(loops, axis=1)
+            mixing[:, 0, 0] -= loops.shape[1] - loops_red
+            mixing[:, 1, 1] -= loops_red
+        mixing /= np.maximum(mixing.sum(axis=(1, 2), keepdims=True), 1)
+        expected = (mixing.sum(axis=2) * mixing.sum(axis=1)).sum(axis=1)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return (np.trace(mixing, axis1=1, axis2=2) - expected) / (1 - expected)
+
+    @staticmethod
+    def _edge_arrays(G):
+        #(sources, targets) index arrays, node list and directedness, straight from the arrays of a CSRGraph
+        if isinstance(G, CSRGraph):
+            sources, targets = G.edge_array()
+            return sources, targets, G.node_ids.tolist(), G.is_directed()
+        nodes = list(G.nodes())
+        index = {node: i for i, node in enumerate(nodes)}
+        m = G.number_of_edges()
+        sources = np.fromiter((index[u] for u, _ in G.edges()), dtype=np.int64, count=m)
+        targets = np.fromiter((index[v] for _, v in G.edges()), dtype=np.int64, count=m)
+        return sources, targets, nodes, G.is_directed()
+
+    @staticmethod
+    @instrumented
+    def balanced_graph(G,p,method='local_search',seed=None,plot=True):
+        """
+        Assigns + or - to edges in a graph and checks if the graph is balanced
+        Param:
+            G: a graph object or CSRGraph
+            p: probability of the graph
+            method: how frustrated edges are counted on an unbalanced graph, 'local_search'
+                    or 'annealing' (D-Wave's SimulatedAnnealingSampler, see balance.frustration)
+            seed: seed of the random generator drawing the signs and of the frustration search
+            plot: draw the signed graph
+        Returns:
+            is_balanced: boolean that is True if the graph is balanced
+            num_frustrated_edges: Number of edges that have to change sign to balance the graph
+            witness: the two sides (lists of nodes) when balanced, otherwise a cycle with an odd number
+                     of negative edges, the first node repeated at the end (see balance.check_balance)
+        """
+        rng = np.random.default_rng(seed)
+        graph = as_networkx(G)
+
+        # Set 'sign' attribute to 1 for '+' or -1 for '-', one draw for all edges
+        signs = np.where(rng.random(graph.number_of_edges()) < p, 1, -1).tolist()
+        nx.set_edge_attributes(graph, dict(zip(graph.edges(), signs)), 'sign')
+        #The signs went into the networkx view of a CSR graph, its arrays follow
+        if isinstance(G, CSRGraph):
+            G.refresh()
+        G = graph
+
+        # Exact balance check, the frustration count is only searched for when it is not 0
+        signed = SignedGraph(G)
+        is_balanced, witness = check_balance(signed)
+        num_frustrated_edges = 0 if is_balanced else frustration(signed, method=method, seed=seed)[0]
+        if not plot:
+            return is_balanced, num_frustrated_edges, witness
+
+        from matplotlib import pyplot as plt
+        #Labeling edges with actual signs to display them correctly
+        edge_labels = {edge: '+' if sign == 1 else '-' for edge, sign in zip(G.edges(), signs)}
+        #Initializing position, signs do not change the structure so the cached layout is reused
+        pos = dict(zip(*LAYOUT_CACHE.layout(G, 'spring')))
+
+        #Drawing nodes and labeling edges with different colors depending on sign
+        nx.draw_networkx(G, pos, edge_color=[G[u][v]['sign'] for u,v in G.edges()], node_color='blue', with_labels=True)
+        nx.draw_networkx_edge_labels(G, pos, edge_labels=edge_labels, font_color='green')
+
+        #Showing
+        plt.title("Graph with Signed Edges")
+        plt.show()
+        return is_balanced, num_frustrated_edges, witness
\ No newline at end of file
@@ -1,83 +1,381 @@
-import math
-import numpy as np
-import networkx as nx
-class GraphGenerator:
-
-    @staticmethod
-    def generate_erdos_graph(n, c):
-        """
-        Generates a random Erdos Reyni graph based on n and c values
-        Params:
-            n: integer value
-            c: float value
-        Returns
-            G: a graph object """
-    
-        #Computes the probability p based on c and n
-        p = c * (math.log(n) / n) if n > 1 else 0
-
-        #Generating a erdos reyni graph with integers as nodes
-        G = nx.erdos_renyi_graph(n, p)
-
-        return G
-    
-    @staticmethod
-    def generate_karate():
-        """Generates a Karate Club graph
-        Params:
-            none
-        Returns
-            G: a graph object"""
-        G = nx.karate_club_graph()
-        
-        return G
-
-    @staticmethod
-    def generate_bipartite(n,m,p):
-        """
-        Crates a random bipartite graph based on n, m and probability values
-        Params:
-            n: number of nodes in A
-            m: number of nodes in B 
-            p: probability of edge u,v between A u and B v 
-        Returns:
-            G: bipartite graph
-        """
-        G = nx.bipartite.random_graph(n,m,p)
-
-        return G
-
-    #Market clearing
-    @staticmethod
-    def generate_market(file_name):
-        """Generates a standard market clearing graph
-        Params:
-            file_name: name of the file that incluides the info for the market clearing graph
-        Returns:
-            prices: price of the house 
-            valuation: homeowner valuation of the house
-            G: market clearing graph with no computations"""
-        #Open file
-        with open(file_name, 'r') as file:
-            lines = file.readlines()
-            n = int(lines[0].split()[0])
-            prices = list(map(int, lines[0].split()[1].split(',')))
-            valuations = np.array([list(map(int, line.split(','))) for line in lines[1:]])
-
-        #Initialize a graph that just has the House and buyer prices and valuations in case someone wants to see it
-        G = nx.Graph()
-        for i in range(n):
-            G.add_node(f"House {i+1}", bipartite=0)  # House nodes
-        
-        for j in range(valuations.shape[0]):
-            G.add_node(f"Buyer {j+1}", bipartite=1)  # Buyer nodes
-        
-        # Add edges for buyers' highest valuations only
-        for j in range(valuations.shape[0]):
-            max_valuation = max(valuations[j])
-            for i in range(n):
-                if valuations[j, i] == max_valuation:
-                    G.add_edge(f"House {i+1}", f"Buyer {j+1}")
-                    break  # Move to the next buyer after connecting to the highest valued house
-                
-        return n, prices, valuations, G
\ No newline at end of file
+import math
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import networkx as nx
+from scipy import sparse
+from csr_graph import CSRGraph
+from instrumentation import instrumented
+from market import preferred_sellers
+
+#Most geometric gaps drawn at once by the skip samplers
+SKIP_BLOCK = 1 << 20
+
+class GraphGenerator:
+
+    @staticmethod
+    @instrumented
+    def generate_erdos_graph(n, c, compact=False, seed=None, shards=1, workers=None):
+        """
+        Generates a random Erdos Reyni graph based on n and c values, in O(n + m) (see erdos_edges)
+        Params:
+            n: integer value
+            c: float value
+            compact: True to return a CSRGraph built straight from the edge arrays
+            seed: random seed, the same seed and shards give the same graph
+            shards: node ranges sampled with independent random streams
+            workers: processes sampling the shards, None or 1 runs in the calling process
+        Returns
+            G: a graph object """
+    
+        #Computes the probability p based on c and n
+        p = c * (math.log(n) / n) if n > 1 else 0
+
+        #Generating a erdos reyni graph with integers as nodes
+        sources, targets = _join(GraphGenerator.erdos_edges(n, p, seed, shards, workers))
+        return _graph(n, sources, targets, compact)
+
+    @staticmethod
+    def erdos_edges(n, p, seed=None, shards=1, workers=None):
+        """
+        Edges of a G(n, p) random graph by geometric skipping (Batagelj-Brandes): the gap between
+        two chosen node pairs is geometric, so the cost is O(n + m) instead of one draw per pair.
+        Shards split the pairs by node range, each with its own stream spawned from seed, so the
+        graph depends on seed and shards but not on workers
+        Params:
+            n: number of nodes
+            p: edge probability
+            seed: random seed
+            shards: node ranges sampled with independent random streams
+            workers: processes sampling the shards, None or 1 runs in the calling process
+        Returns:
+            generator of (sources, targets) node index arrays, one block at a time
+        """
+        #Rows v hold the pairs (v, w) with w < v, boundaries at n * sqrt(i / shards) even out the pairs
+        bounds = np.unique(np.round(n * np.sqrt(np.linspace(0, 1, shards + 1))).astype(np.int64))
+        tasks = [('triangle', int(lo) * (int(lo) - 1) // 2, int(hi) * (int(hi) - 1) // 2, 0, p)
+                 for lo, hi in zip(bounds[:-1], bounds[1:])]
+        return ((sources, targets) for _, sources, targets in _sharded_edges(tasks, seed, shards, workers))
+
+    @staticmethod
+    def bipartite_edges(n, m, p, seed=None, shards=1, workers=None):
+        """
+        Edges of a random bipartite graph between nodes 0..n-1 and n..n+m-1 by geometric skipping,
+        see erdos_edges
+        Params:
+            n: number of nodes in A
+            m: number of nodes in B
+            p: probability of edge u,v between A u and B v
+            seed: random seed
+            shards: ranges of A sampled with independent random streams
+            workers: processes sampling the shards, None or 1 runs in the calling process
+        Returns:
+            generator of (sources, targets) node index arrays, one block at a time
+        """
+        bounds = np.unique(np.linspace(0, n, shards + 1).astype(np.int64))
+        tasks = [('rectangle', int(lo) * m, int(hi) * m, m, p) for lo, hi in zip(bounds[:-1], bounds[1:])]
+        return ((sources, n + targets) for _, sources, targets in _sharded_edges(tasks, seed, shards, workers))
+
+    @staticmethod
+    @instrumented
+    def write_edges(file_name, edges):
+        """
+        Writes edge blocks to a file one block at a time, as "source target" lines that
+        GraphManager.read_graph (compact=True for large files) reads back
+        Params:
+            file_name: string
+            edges: iterable of (sources, targets) arrays, e.g. from erdos_edges
+        Returns:
+            number of edges written
+        """
+        count = 0
+        with open(file_name, 'w') as file:
+            for sources, targets in edges:
+                #One format call per block, several times faster than np.savetxt's per row formatting
+                file.write(('%d %d\n' * len(sources)) % tuple(np.column_stack([sources, targets]).ravel().tolist()))
+                count += len(sources)
+        return count
+    
+    @staticmethod
+    @instrumented
+    def generate_karate(compact=False):
+        """Generates a Karate Club graph
+        Params:
+            compact: True to return a CSRGraph
+        Returns
+            G: a graph object"""
+        G = nx.karate_club_graph()
+        
+        return CSRGraph.from_networkx(G) if compact else G
+
+    @staticmethod
+    @instrumented
+    def generate_bipartite(n,m,p,compact=False,seed=None,shards=1,workers=None):
+        """
+        Crates a random bipartite graph based on n, m and probability values, in O(n + m + edges)
+        Params:
+            n: number of nodes in A
+            m: number of nodes in B 
+            p: probability of edge u,v between A u and B v 
+            compact: True to return a CSRGraph built straight from the edge arrays
+            seed: random seed, see bipartite_edges
+            shards: ranges of A sampled with independent random streams
+            workers: processes sampling the shards
+        Returns:
+            G: bipartite graph
+        """
+        sources, targets = _join(GraphGenerator.bipartite_edges(n, m, p, seed, shards, workers))
+        #Same labels as nx.bipartite.random_graph: A is 0..n-1 with bipartite=0, B is n..n+m-1
+        side = np.concatenate([np.zeros(n, dtype=np.int64), np.ones(m, dtype=np.int64)])
+        return _graph(n + m, sources, targets, compact, {'bipartite': side})
+
+    @staticmethod
+    @instrumented
+    def generate_barabasi_albert(n, m, compact=False, seed=None):
+        """
+        Preferential attachment graph: every new node links to m earlier nodes picked with
+        probability proportional to their degree, giving a heavy tailed degree distribution.
+        Array version of the Batagelj-Brandes list of edge endpoints, O(n * m); repeated picks
+        of one node are merged, so a few nodes get fewer than m new edges
+        Params:
+            n: number of nodes
+            m: edges added per new node
+            compact: True to return a CSRGraph
+            seed: random seed
+        Returns:
+            G: a graph object
+        """
+        rng = np.random.default_rng(seed)
+        edges = n * m
+        #Endpoint list: slot 2j is the new node of edge j, slot 2j + 1 copies a uniform earlier slot
+        picks = (rng.random(edges) * (2 * np.arange(edges) + 1)).astype(np.int64)
+        #A pick of an odd slot is itself a copy, follow the chain back to a new node slot; every step
+        #lands on a strictly earlier edge and half of them end, so the chains are short
+        odd = picks % 2 == 1
+        while odd.any():
+            picks[odd] = picks[picks[odd] // 2]
+            odd = picks % 2 == 1
+        sources = np.arange(edges) // m
+        targets = picks // 2 // m
+        keep = sources != targets
+        return _graph(n, sources[keep], targets[keep], compact)
+
+    @staticmethod
+    @instrumented
+    def generate_watts_strogatz(n, k, p, compact=False, seed=None):
+        """
+        Small world graph: a ring where every node links to its k nearest neighbors, then each
+        edge has its far end moved to a uniform random node with probability p, avoiding self
+        loops and repeated edges as nx.watts_strogatz_graph does. Edges of nodes linked to every
+        other node are not rewired, in nearly complete graphs some of them end on an existing edge
+        and merge with it, so the graph may have a few edges less than networkx's
+        Params:
+            n: number of nodes
+            k: neighbors of each node on the ring (even), at most n
+            p: rewiring probability
+            compact: True to return a CSRGraph
+            seed: random seed
+        Returns:
+            G: a graph object
+        """
+        if k > n:
+            raise ValueError(f"Watts-Strogatz needs k <= n, got k={k} and n={n}")
+        if k == n:
+            #Every node already links to all others, as in networkx
+            sources, targets = np.triu_indices(n, 1)
+            return _graph(n, sources.astype(np.int64), targets.astype(np.int64), compact)
+        rng = np.random.default_rng(seed)
+        sources = np.repeat(np.arange(n, dtype=np.int64), k // 2)
+        ring = (sources + np.tile(np.arange(1, k // 2 + 1), n)) % max(n, 1)
+        targets = ring.copy()
+        pending = np.flatnonzero(rng.random(len(sources)) < p)
+        while len(pending):
+            #A source already linked to every other node through the settled edges has nowhere to
+            #go, its edge keeps its ring target as networkx skips rewiring it (copies are merged)
+            settled = np.ones(len(sources), dtype=bool)
+            settled[pending] = False
+            keys = np.unique(np.minimum(sources, targets)[settled] * n + np.maximum(sources, targets)[settled])
+            degree = np.bincount(np.concatenate([keys // n, keys % n]), minlength=n)
+            full = degree[sources[pending]] >= n - 1
+            targets[pending[full]] = ring[pending[full]]
+            pending = pending[~full]
+            if not len(pending):
+                break
+
+            targets[pending] = rng.integers(0, n, len(pending))
+            #Edges already in place win over the ones just moved, which are redrawn when they
+            #became a loop or a copy of another edge
+            moving = np.zeros(len(sources), dtype=bool)
+            moving[pending] = True
+            keys = np.minimum(sources, targets) * n + np.maximum(sources, targets)
+            order = np.lexsort((moving, keys))
+            repeat = np.zeros(len(sources), dtype=bool)
+            repeat[order[1:]] = keys[order[1:]] == keys[order[:-1]]
+            pending = np.flatnonzero(moving & (repeat | (sources == targets)))
+        return _graph(n, sources, targets, compact)
+
+    @staticmethod
+    @instrumented
+    def generate_sbm(sizes, probabilities, compact=False, seed=None, workers=None):
+        """
+        Stochastic block model with planted communities, nodes numbered block by block and
+        labelled with a 'block' attribute (the ground truth for Algos.partition_score)
+        Params:
+            sizes: number of nodes in each block
+            probabilities: edge probability between blocks, a blocks x blocks matrix, or a pair
+                           (inside, between) for the planted partition model
+            compact: True to return a CSRGraph
+            seed: random seed
+            workers: processes sampling the block pairs
+        Returns:
+            G: a graph object
+        """
+        sources, targets = _join(GraphGenerator.sbm_edges(sizes, probabilities, seed, workers))
+        blocks = np.repeat(np.arange(len(sizes)), sizes)
+        return _graph(int(np.sum(sizes)), sources, targets, compact, {'block': blocks})
+
+    @staticmethod
+    def sbm_edges(sizes, probabilities, seed=None, workers=None):
+        """
+        Edges of a stochastic block model by geometric skipping over every pair of blocks,
+        each pair with its own random stream, see erdos_edges and generate_sbm
+        Params:
+            sizes: number of nodes in each block
+            probabilities: blocks x blocks matrix or (inside, between) pair
+            seed: random seed
+            workers: processes sampling the block pairs
+        Returns:
+            generator of (sources, targets) node index arrays, one block at a time
+        """
+        sizes = np.asarray(sizes, dtype=np.int64)
+        probabilities = np.asarray(probabilities, dtype=np.float64)
+        if probabilities.ndim == 1:
+            inside, between = probabilities
+            probabilities = np.full((len(sizes), len(sizes)), between)
+            np.fill_diagonal(probabilities, inside)
+        offsets = np.concatenate([[0], np.cumsum(sizes)])
+        pairs = [(a, b) for a in range(len(sizes)) for b in range(a, len(sizes))]
+        tasks = [('triangle', 0, int(sizes[a]) * (int(sizes[a]) - 1) // 2, 0, probabilities[a, b]) if a == b else
+                 ('rectangle', 0, int(sizes[a]) * int(sizes[b]), int(sizes[b]), probabilities[a, b]) for a, b in pairs]
+        return ((offsets[pairs[i][0]] + sources, offsets[pairs[i][1]] + targets)
+                for i, sources, targets in _sharded_edges(tasks, seed, len(tasks), workers))
+
+    #Market clearing
+    @staticmethod
+    @instrumented
+    def generate_market(file_name):
+        """Generates a standard market clearing graph
+        Params:
+            file_name: name of the file that incluides the info for the market clearing graph
+        Returns:
+            prices: price of the house 
+            valuation: homeowner valuation of the house
+            G: market clearing graph with no computations"""
+        #Open file, the valuation rows are parsed in one pass by NumPy
+        with open(file_name, 'r') as file:
+            header = file.readline().split()
+            n = int(header[0])
+            prices = list(map(int, header[1].split(',')))
+            valuations = np.fromstring(file.read().replace(',', ' '), dtype=np.int64, sep=' ').reshape(-1, n)
+
+        #Initialize a graph that just has the House and buyer prices and valuations in case someone wants to see it
+        G = nx.Graph()
+        G.add_nodes_from((f"House {i+1}" for i in range(n)), bipartite=0)  # House nodes
+        G.add_nodes_from((f"Buyer {j+1}" for j in range(valuations.shape[0])), bipartite=1)  # Buyer nodes
+
+        # Add edges from every buyer to its preferred houses at the starting prices, ties included
+        preferred = preferred_sellers(valuations, prices)[0].tocoo()
+        G.add_edges_from((f"House {i+1}", f"Buyer {j+1}") for j, i in zip(preferred.row.tolist(), preferred.col.tolist()))
+
+        return n, prices, valuations, G
+
+    @staticmethod
+    @instrumented
+    def generate_sparse_market(file_name):
+        """Generates a market clearing graph from a sparse market file. The first line is
+        '<buyers> <houses>' optionally followed by comma separated house prices, every other line is
+        'buyer,house,value' with 0 based indices for one house a buyer wants
+        Params:
+            file_name: name of the sparse market file
+        Returns:
+            n: number of buyers
+            prices: price of the house
+            valuation: CSR matrix of buyer valuations, houses a buyer does not list are not stored
+            G: market clearing graph with no computations"""
+        #Open file, the triples are parsed in one pass by NumPy
+        with open(file_name, 'r') as file:
+            header = file.readline().split()
+            n, houses = int(header[0]), int(header[1])
+            prices = list(map(int, header[2].split(','))) if len(header) > 2 else [0] * houses
+            triples = np.fromstring(file.read().replace(',', ' '), dtype=np.int64, sep=' ').reshape(-1, 3)
+        valuations = sparse.csr_matrix((triples[:, 2], (triples[:, 0], triples[:, 1])), shape=(n, houses))
+
+        #Initialize a graph that just has the House and buyer prices and valuations in case someone wants to see it
+        G = nx.Graph()
+        G.add_nodes_from((f"House {i+1}" for i in range(houses)), bipartite=0)  # House nodes
+        G.add_nodes_from((f"Buyer {j+1}" for j in range(n)), bipartite=1)  # Buyer nodes
+
+        # Add edges from every buyer to its preferred listed houses at the starting prices, ties included
+        preferred = preferred_sellers(valuations, prices)[0].tocoo()
+        G.add_edges_from((f"House {i+1}", f"Buyer {j+1}") for j, i in zip(preferred.row.tolist(), preferred.col.tolist()))
+
+        return n, prices, valuations, G
+
+def _sharded_edges(tasks, seed, shards, workers):
+    #(task index, sources, targets) blocks with one spawned stream per requested shard, in shard
+    #order whether or not workers are used
+    streams = np.random.SeedSequence(seed).spawn(shards)[:len(tasks)]
+    if workers and workers > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for i, (sources, targets) in enumerate(pool.map(_shard_edges, tasks, streams)):
+                yield i, sources, targets
+        return
+    for i, (task, stream) in enumerate(zip(tasks, streams)):
+        for sources, targets in _skip_edges(*task, np.random.default_rng(stream)):
+            yield i, sources, targets
+
+def _shard_edges(task, stream):
+    #Worker side: a whole shard as one pair of arrays
+    return _join(_skip_edges(*task, np.random.default_rng(stream)))
+
+def _skip_edges(kind, start, stop, columns, p, rng):
+    #Pair indices in [start, stop) chosen with probability p: each gap to the next chosen pair is
+    #geometric, drawn in blocks of about the expected count. Indices decode to (v, w), w < v for
+    #'triangle' and (k // columns, k % columns) for 'rectangle'
+    if p <= 0 or start >= stop:
+        return
+    p = min(p, 1.0)
+    block = int(min(SKIP_BLOCK, p * (stop - start) * 1.05 + 64))
+    position = start - 1
+    while position < stop - 1:
+        chosen = position + np.cumsum(rng.geometric(p, block))
+        position = chosen[-1]
+        chosen = chosen[chosen < stop]
+        yield _triangle_pairs(chosen) if kind == 'triangle' else (chosen // columns, chosen % columns)
+
+def _triangle_pairs(index):
+    #Pair index k = v * (v - 1) / 2 + w, w < v; the float root can be one off for large k
+    v = ((1 + np.sqrt(1 + 8 * index.astype(np.float64))) // 2).astype(np.int64)
+    v -= v * (v - 1) // 2 > index
+    v += (v + 1) * v // 2 <= index
+    return v, index - v * (v - 1) // 2
+
+def _graph(num_nodes, sources, targets, compact, node_attrs=None):
+    #Nodes 0..num_nodes-1 with the given edges, as a CSRGraph or a networkx graph
+    if compact:
+        return CSRGraph.from_edges(num_nodes, sources, targets, node_attrs=node_attrs)
+    G = nx.Graph()
+    if node_attrs:
+        names = list(node_attrs)
+        G.add_nodes_from((i, dict(zip(names, values))) for i, values in
+                         enumerate(zip(*(node_attrs[name].tolist() for name in names))))
+    else:
+        G.add_nodes_from(range(num_nodes))
+    G.add_edges_from(zip(sources.tolist(), targets.tolist()))
+    return G
+
+def _join(blocks):
+    #Concatenates (sources, targets) blocks
+    blocks = list(blocks)
+    if not blocks:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    return np.concatenate([b[0] for b in blocks]), np.concatenate([b[1] for b in blocks])
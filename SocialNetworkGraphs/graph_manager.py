@@ -1,76 +1,249 @@
-import networkx as nx
-class GraphManager:
-    def __init__(self):
-        """
-        Initializes the GraphManager instance.
-        """
-        pass  # No initialization required for now, but method is defined for future extensibility.
-
-    @staticmethod
-    def read_graph(file_name):
-        """
-        Reads an undirected graph from a given file.
-
-        Params:
-            file_name: string
-        Returns:
-            G: a graph object
-        """
-        G = nx.Graph()
-        try:
-            with open(file_name, 'r') as file:
-                for line in file:
-                    nodes = line.split()
-                    for target in nodes[1:]:
-                        G.add_edge(nodes[0], target)
-        except FileNotFoundError:
-            raise FileNotFoundError(f"Error: File '{file_name}' was not found.")
-
-        return G
-
-    @staticmethod
-    def read_digraph(file_name):
-        """
-        Reads a directed graph from a given file with edges having polynomial weights.
-
-        Params:
-            file_name: string
-        Returns:
-            G: a directed graph object
-        """
-        G = nx.DiGraph()
-        try:
-            with open(file_name, 'r') as file:
-                for line in file:
-                    parts = line.split()
-                    if len(parts) == 4:
-                        source, target, a, b = parts
-                        source, target = int(source), int(target)
-                        G.add_edge(source, target, weight=(int(a), int(b)))
-                    else:
-                        print(f"Invalid line format: {line}")
-        except FileNotFoundError:
-            raise FileNotFoundError(f"Error: File '{file_name}' was not found.")
-
-        return G
-
-    @staticmethod
-    def save_graph(G, file_name):
-        """
-        Saves a graph to a file.
-
-        Params:
-            G: graph object
-            file_name: string
-        """
-        with open(file_name, 'w') as file:
-            if G.is_directed():
-                for source, target in G.edges():
-                    a, b = G[source][target].get('weight', (0, 0))
-                    line = f'{source} {target} {a} {b}\n'
-                    file.write(line)
-            else:
-                for source in G.nodes():
-                    targets = [str(target) for target in G.adj[source]]
-                    line = f'{source} ' + ' '.join(targets) + '\n'
-                    file.write(line)
\ No newline at end of file
+import os
+import time
+import numpy as np
+import networkx as nx
+from csr_graph import CSRGraph, as_networkx, node_id_array
+import instrumentation
+from instrumentation import instrumented
+from point_to_point import Landmarks, landmark_file
+
+#Bytes parsed per batch when streaming a graph file
+DEFAULT_CHUNK_SIZE = 1 << 22
+
+class GraphManager:
+    def __init__(self):
+        """
+        Initializes the GraphManager instance.
+        """
+        pass  # No initialization required for now, but method is defined for future extensibility.
+
+    @staticmethod
+    def stream_edges(file_name, weighted=False, chunk_size=DEFAULT_CHUNK_SIZE, progress=False):
+        """
+        Streams the edges of a graph file in batches so large files never have to be held in memory.
+
+        Params:
+            file_name: string
+            weighted: True for the 4 column "source target a b" digraph format,
+                      False for the "node neighbor neighbor ..." adjacency format
+            chunk_size: approximate number of bytes read from the file per batch, UTF-8 encoded
+            progress: True to print edges read and edges/sec after every batch
+        Returns:
+            generator of edge lists, ready for add_edges_from
+        """
+        total_bytes = os.path.getsize(file_name)
+        bytes_read = 0
+        edges_read = 0
+        start = time.perf_counter()
+
+        #Binary mode so chunk_size and the progress report count bytes, whatever the encoding of the labels
+        with open(file_name, 'rb') as file:
+            while True:
+                #readlines with a hint stops after roughly chunk_size bytes, on a line boundary
+                lines = file.readlines(chunk_size)
+                if not lines:
+                    break
+                chunk = b''.join(lines)
+                bytes_read += len(chunk)
+
+                batch = []
+                #Chunks end on a line boundary, so every chunk decodes on its own
+                for line in chunk.decode('utf-8').splitlines():
+                    parts = line.split()
+                    if weighted:
+                        if len(parts) == 4:
+                            source, target, a, b = parts
+                            batch.append((int(source), int(target), {'weight': (int(a), int(b))}))
+                        else:
+                            print(f"Invalid line format: {line}")
+                    elif parts:
+                        batch.extend((parts[0], target) for target in parts[1:])
+
+                edges_read += len(batch)
+                instrumentation.count('edges_read', len(batch))
+                if progress:
+                    elapsed = time.perf_counter() - start
+                    rate = edges_read / elapsed if elapsed > 0 else 0.0
+                    percent = 100.0 * bytes_read / total_bytes if total_bytes else 100.0
+                    print(f"Read {edges_read} edges ({percent:.1f}%) at {rate:,.0f} edges/sec")
+
+                yield batch
+
+    @staticmethod
+    @instrumented
+    def read_graph(file_name, chunk_size=DEFAULT_CHUNK_SIZE, progress=False, compact=False):
+        """
+        Reads an undirected graph from a given file.
+
+        Params:
+            file_name: string
+            chunk_size: approximate number of bytes parsed per batch
+            progress: True to print loading progress
+            compact: True to return a CSRGraph built straight from the file
+        Returns:
+            G: a graph object (CSRGraph when compact)
+        """
+        G = nx.Graph()
+        try:
+            if compact:
+                return GraphManager._read_compact(file_name, False, chunk_size, progress)
+            for batch in GraphManager.stream_edges(file_name, False, chunk_size, progress):
+                G.add_edges_from(batch)
+        except FileNotFoundError:
+            raise FileNotFoundError(f"Error: File '{file_name}' was not found.")
+
+        return G
+
+    @staticmethod
+    @instrumented
+    def read_digraph(file_name, chunk_size=DEFAULT_CHUNK_SIZE, progress=False, compact=False):
+        """
+        Reads a directed graph from a given file with edges having polynomial weights.
+
+        Params:
+            file_name: string
+            chunk_size: approximate number of bytes parsed per batch
+            progress: True to print loading progress
+            compact: True to return a CSRGraph built straight from the file
+        Returns:
+            G: a directed graph object (CSRGraph when compact)
+        """
+        G = nx.DiGraph()
+        try:
+            if compact:
+                return GraphManager._read_compact(file_name, True, chunk_size, progress)
+            for batch in GraphManager.stream_edges(file_name, True, chunk_size, progress):
+                G.add_edges_from(batch)
+        except FileNotFoundError:
+            raise FileNotFoundError(f"Error: File '{file_name}' was not found.")
+
+        return G
+
+    @staticmethod
+    def _read_compact(file_name, weighted, chunk_size, progress):
+        """
+        Streams a graph file into CSR arrays without building networkx dicts.
+
+        Params:
+            file_name: string
+            weighted: True for the digraph format
+            chunk_size: approximate number of bytes parsed per batch
+            progress: True to print loading progress
+        Returns:
+            G: CSRGraph
+        """
+        index = {}
+        sources, targets, weight_a, weight_b = [], [], [], []
+        for batch in GraphManager.stream_edges(file_name, weighted, chunk_size, progress):
+            #Node ids are numbered in order of first appearance
+            pairs = np.array([(index.setdefault(edge[0], len(index)), index.setdefault(edge[1], len(index)))
+                              for edge in batch], dtype=np.int64).reshape(-1, 2)
+            sources.append(pairs[:, 0])
+            targets.append(pairs[:, 1])
+            if weighted:
+                weight_a.append(np.fromiter((edge[2]['weight'][0] for edge in batch), dtype=np.float64, count=len(batch)))
+                weight_b.append(np.fromiter((edge[2]['weight'][1] for edge in batch), dtype=np.float64, count=len(batch)))
+
+        join = lambda arrays, dtype: np.concatenate(arrays) if arrays else np.zeros(0, dtype=dtype)
+        return CSRGraph.from_edges(len(index), join(sources, np.int64), join(targets, np.int64), weighted,
+                                   node_id_array(list(index)),
+                                   join(weight_a, np.float64) if weighted else None,
+                                   join(weight_b, np.float64) if weighted else None)
+
+    @staticmethod
+    @instrumented
+    def save_graph(G, file_name, landmarks=None, layouts=None):
+        """
+        Saves a graph to a file.
+
+        Params:
+            G: graph object
+            file_name: string
+            landmarks: optional Landmarks, written next to the file for read_landmarks
+            layouts: optional LayoutCache, its layouts of G are written next to the file for read_layouts
+        """
+        if landmarks is not None:
+            landmarks.save(landmark_file(file_name))
+        if layouts is not None:
+            layouts.save(G, file_name)
+        G = as_networkx(G)
+        with open(file_name, 'w', encoding='utf-8') as file:
+            if G.is_directed():
+                for source, target in G.edges():
+                    a, b = G[source][target].get('weight', (0, 0))
+                    line = f'{source} {target} {a} {b}\n'
+                    file.write(line)
+            else:
+                for source in G.nodes():
+                    targets = [str(target) for target in G.adj[source]]
+                    line = f'{source} ' + ' '.join(targets) + '\n'
+                    file.write(line)
+
+    @staticmethod
+    @instrumented
+    def read_landmarks(file_name, G=None, weight='weight'):
+        """
+        Reads the landmark table saved next to a graph file.
+
+        Params:
+            file_name: graph file name given to save_graph
+            G: optional graph, tables built on other nodes, edges or weight values are ignored
+            weight: edge attribute name the tables must have been built with
+        Returns:
+            landmarks: Landmarks, or None if there is no usable table
+        """
+        path = landmark_file(file_name)
+        if not os.path.exists(path):
+            return None
+        landmarks = Landmarks.load(path)
+        if G is not None and not landmarks.matches(G, weight):
+            print(f"Landmark table '{path}' does not match the graph, ignoring it")
+            return None
+        return landmarks
+
+    @staticmethod
+    @instrumented
+    def read_layouts(file_name, cache=None):
+        """
+        Reads the layouts saved next to a graph file into a layout cache. They are keyed by the
+        graph's structure, so they are only used for a graph with the same nodes and edges.
+
+        Params:
+            file_name: graph file name given to save_graph
+            cache: LayoutCache to fill, layout.LAYOUT_CACHE by default
+        Returns:
+            number of layouts read
+        """
+        #The layout module pulls in scipy, imported on first use so startup does not pay for it
+        from layout import LAYOUT_CACHE
+        return (LAYOUT_CACHE if cache is None else cache).load(file_name)
+
+    @staticmethod
+    @instrumented
+    def save_graph_binary(G, path):
+        """
+        Saves a graph in the binary CSR format: a node id table plus offsets/targets arrays,
+        and the (a, b) weight arrays for digraphs.
+
+        Params:
+            G: graph object or CSRGraph
+            path: directory name
+        """
+        if not isinstance(G, CSRGraph):
+            G = CSRGraph.from_networkx(G)
+        G.save(path)
+
+    @staticmethod
+    @instrumented
+    def read_graph_binary(path, mmap=True):
+        """
+        Opens a graph saved with save_graph_binary. The arrays are memory-mapped,
+        and the networkx graph is only built when an algorithm asks for it.
+
+        Params:
+            path: directory name
+            mmap: boolean flag, False loads the arrays into memory
+        Returns:
+            G: CSRGraph
+        """
+        return CSRGraph.load(path, mmap)
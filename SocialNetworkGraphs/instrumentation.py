@@ -0,0 +1,222 @@
+"""
+Opt-in instrumentation of the graph operations. Methods decorated with @instrumented record their
+wall and CPU time, optionally their peak traced memory, and the counters the algorithms report
+through count(), such as price rounds or removed edges. Nothing is recorded until enable() is
+called; while disabled a decorated call costs one flag check and count() returns at once.
+
+    import instrumentation
+    instrumentation.enable(memory=True)
+    Algos.partition(G, 4)
+    print(instrumentation.to_prometheus())
+"""
+import functools
+import io
+import json
+import time
+import tracemalloc
+from collections import deque
+
+#Individual call records kept for to_json, older ones are dropped
+CALL_HISTORY = 1000
+#Prefix of the exported Prometheus metric names
+METRIC_PREFIX = 'graph'
+
+class _Frame:
+    #One running instrumented call
+    __slots__ = ('name', 'wall', 'cpu', 'base', 'peak', 'counters')
+
+    def __init__(self, name, memory):
+        self.name = name
+        self.counters = {}
+        self.base = tracemalloc.get_traced_memory()[0] if memory else None
+        self.peak = 0
+        self.wall = time.perf_counter()
+        self.cpu = time.process_time()
+
+class _State:
+    def __init__(self):
+        self.enabled = False
+        self.memory = False
+        #Tracing was started by enable, so disable stops it
+        self.owns_tracing = False
+        self.stack = []
+        #Function name -> totals over its calls
+        self.totals = {}
+        self.calls = deque(maxlen=CALL_HISTORY)
+
+_state = _State()
+
+def enable(memory=False):
+    """
+    Starts recording instrumented calls
+    Params:
+        memory: also record the peak memory of each call through tracemalloc, which slows the calls down
+    """
+    _state.enabled = True
+    _state.memory = memory
+    if memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+        _state.owns_tracing = True
+
+def disable():
+    """
+    Stops recording, what was recorded stays until reset
+    """
+    _state.enabled = False
+    if _state.owns_tracing and not _state.stack:
+        tracemalloc.stop()
+        _state.owns_tracing = False
+    _state.memory = False
+
+def enabled():
+    """
+    Returns:
+        True while calls are recorded
+    """
+    return _state.enabled
+
+def reset():
+    """
+    Drops every recorded call and total
+    """
+    _state.totals.clear()
+    _state.calls.clear()
+
+def instrumented(function=None, name=None):
+    """
+    Decorator recording each call of a function while instrumentation is enabled.
+    Used as @instrumented or @instrumented(name='...'), under @staticmethod.
+    Params:
+        function: decorated function
+        name: name the calls are recorded under, the qualified function name by default
+    Returns:
+        wrapped function
+    """
+    if function is None:
+        return lambda function: instrumented(function, name)
+    label = name or function.__qualname__
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        if not _state.enabled:
+            return function(*args, **kwargs)
+        frame = _start(label)
+        try:
+            return function(*args, **kwargs)
+        finally:
+            _finish(frame)
+    return wrapper
+
+def count(name, value=1):
+    """
+    Adds to a counter of the innermost running instrumented call, does nothing when none is running
+    Params:
+        name: counter name
+        value: amount added
+    """
+    if _state.stack:
+        counters = _state.stack[-1].counters
+        counters[name] = counters.get(name, 0) + value
+
+def profile_call(function, *args, sort='cumulative', limit=25, **kwargs):
+    """
+    Runs one call under cProfile
+    Params:
+        function: callable
+        args, kwargs: its arguments
+        sort: pstats sort key
+        limit: number of functions in the report
+    Returns:
+        result: what the call returned
+        report: pstats text report
+    """
+    #Only loaded when a profile is asked for
+    import cProfile
+    import pstats
+    profiler = cProfile.Profile()
+    result = profiler.runcall(function, *args, **kwargs)
+    stream = io.StringIO()
+    pstats.Stats(profiler, stream=stream).sort_stats(sort).print_stats(limit)
+    return result, stream.getvalue()
+
+def snapshot():
+    """
+    Returns:
+        dict with 'totals' (function name -> calls, wall/cpu seconds, peak bytes and summed counters)
+        and 'calls' (the latest individual call records)
+    """
+    return {'totals': {name: dict(totals, counters=dict(totals['counters'])) for name, totals in _state.totals.items()},
+            'calls': list(_state.calls)}
+
+def to_json(indent=None):
+    """
+    Returns:
+        snapshot() as a JSON string
+    """
+    return json.dumps(snapshot(), indent=indent)
+
+def to_prometheus():
+    """
+    Returns:
+        the totals in the Prometheus text exposition format
+    """
+    metrics = [('calls_total', 'counter', 'Instrumented calls', 'calls'),
+               ('call_seconds_total', 'counter', 'Wall time spent in instrumented calls', 'wall_seconds'),
+               ('call_cpu_seconds_total', 'counter', 'CPU time spent in instrumented calls', 'cpu_seconds'),
+               ('call_peak_bytes', 'gauge', 'Largest traced memory peak of a call above its start', 'peak_bytes')]
+    lines = []
+    for metric, kind, description, field in metrics:
+        rows = [(name, totals[field]) for name, totals in sorted(_state.totals.items()) if totals[field] is not None]
+        if not rows:
+            continue
+        lines.append(f"# HELP {METRIC_PREFIX}_{metric} {description}")
+        lines.append(f"# TYPE {METRIC_PREFIX}_{metric} {kind}")
+        lines.extend(f'{METRIC_PREFIX}_{metric}{{function="{_escape(name)}"}} {value}' for name, value in rows)
+    counters = [(name, counter, value) for name, totals in sorted(_state.totals.items())
+                for counter, value in sorted(totals['counters'].items())]
+    if counters:
+        lines.append(f"# HELP {METRIC_PREFIX}_counter_total Algorithm specific counters of instrumented calls")
+        lines.append(f"# TYPE {METRIC_PREFIX}_counter_total counter")
+        lines.extend(f'{METRIC_PREFIX}_counter_total{{function="{_escape(name)}",counter="{_escape(counter)}"}} {value}'
+                     for name, counter, value in counters)
+    return '\n'.join(lines) + '\n' if lines else ''
+
+def _start(name):
+    memory = _state.memory and tracemalloc.is_tracing()
+    if memory:
+        #The parent's peak so far is kept before the child resets it
+        if _state.stack:
+            parent = _state.stack[-1]
+            parent.peak = max(parent.peak, tracemalloc.get_traced_memory()[1])
+        tracemalloc.reset_peak()
+    frame = _Frame(name, memory)
+    _state.stack.append(frame)
+    return frame
+
+def _finish(frame):
+    wall = time.perf_counter() - frame.wall
+    cpu = time.process_time() - frame.cpu
+    _state.stack.pop()
+    peak = None
+    if frame.base is not None and tracemalloc.is_tracing():
+        top = max(frame.peak, tracemalloc.get_traced_memory()[1])
+        peak = max(top - frame.base, 0)
+        if _state.stack:
+            parent = _state.stack[-1]
+            parent.peak = max(parent.peak, top)
+        tracemalloc.reset_peak()
+
+    _state.calls.append({'name': frame.name, 'wall_seconds': wall, 'cpu_seconds': cpu, 'peak_bytes': peak,
+                         'counters': frame.counters})
+    totals = _state.totals.setdefault(frame.name, {'calls': 0, 'wall_seconds': 0.0, 'cpu_seconds': 0.0,
+                                                   'peak_bytes': None, 'counters': {}})
+    totals['calls'] += 1
+    totals['wall_seconds'] += wall
+    totals['cpu_seconds'] += cpu
+    if peak is not None:
+        totals['peak_bytes'] = max(totals['peak_bytes'] or 0, peak)
+    for counter, value in frame.counters.items():
+        totals['counters'][counter] = totals['counters'].get(counter, 0) + value
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
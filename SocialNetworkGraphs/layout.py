@@ -0,0 +1,425 @@
+import hashlib
+import json
+import os
+import weakref
+from collections import OrderedDict
+import numpy as np
+import networkx as nx
+from scipy import sparse
+from csr_graph import CSRGraph, as_networkx
+
+#Levels are coarsened until at most this many nodes are left, those get exact repulsion
+COARSEST = 500
+#Force iterations on the coarsest level and on each finer level
+COARSE_ITERATIONS = 200
+FINE_ITERATIONS = 30
+#A coarsening round that keeps more than this share of the nodes ends the hierarchy
+MIN_SHRINK = 0.9
+#Luby rounds picking the suns every coarse node forms around
+SUN_ROUNDS = 3
+#Nodes per chunk of the exact repulsion, bounds the pairwise temporaries
+REPULSION_CHUNK = 256
+#Default memory cap of the shared layout cache
+DEFAULT_MAX_BYTES = 64 * 2**20
+#A cached layout is refined instead of recomputed when at most this share of the edges changed
+REFINE_SHARE = 0.1
+#Force iterations and starting temperature (in ideal edge lengths) of an incremental refinement
+REFINE_ITERATIONS = 15
+REFINE_TEMPERATURE = 0.5
+#Suffix of the layout file stored next to a graph file
+LAYOUT_SUFFIX = '.layout.npz'
+
+class LayoutCache:
+    """
+    LRU cache of node positions, capped by memory. Entries are keyed by a structural hash of the
+    graph (node labels and edges, independent of insertion order) plus the layout method and its
+    parameters, so any copy of an unchanged graph, a reloaded one included, hits the same entry.
+    When a graph object changes by a few edges its previous layout is refined instead of recomputed.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        """
+        Params:
+            max_bytes: memory cap for the cached positions
+        """
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.refined = 0
+        #(digest, method, seed, options) -> (positions in canonical node order, edge keys, size)
+        self._layouts = OrderedDict()
+        #Graph -> digest of its last layout, to find the layout to refine after edits
+        self._latest = weakref.WeakKeyDictionary()
+
+    def layout(self, G, method='force', seed=None, **options):
+        """
+        Positions of G, computed only when no layout of this structure and these parameters is cached
+        Params:
+            G: graph object or CSRGraph
+            method: 'force' (force_layout), 'spring' (nx.spring_layout) or 'bipartite' (nx.bipartite_layout)
+            seed: random seed
+            options: extra keyword arguments of the networkx layout
+        Returns:
+            nodes: list of nodes
+            positions: len(nodes) x 2 array, row i belongs to nodes[i]
+        """
+        if method not in LAYOUT_METHODS:
+            raise ValueError(f"Unknown layout method: {method}")
+        digest, nodes, adjacency, rank, keys = fingerprint(G)
+        parameters = (method, seed, repr(sorted(options.items())))
+        key = (digest,) + parameters
+        entry = self._layouts.get(key)
+        if entry is not None:
+            self._layouts.move_to_end(key)
+            self.hits += 1
+            self._remember(G, digest)
+            return nodes, entry[0][rank]
+
+        self.misses += 1
+        previous = self._layouts.get((self._latest.get(G),) + parameters) if _weakrefable(G) else None
+        if previous is not None and len(previous[0]) == len(nodes) and \
+                len(np.setxor1d(previous[1], keys, assume_unique=True)) <= REFINE_SHARE * max(len(previous[1]), 1):
+            positions = _refine_layout(previous[0][rank], adjacency)
+            self.refined += 1
+        else:
+            positions = LAYOUT_METHODS[method](G, nodes, adjacency, seed, **options)
+        canonical = np.empty_like(positions)
+        canonical[rank] = positions
+        self._put(key, canonical, keys)
+        self._remember(G, digest)
+        return nodes, positions
+
+    def save(self, G, file_name):
+        """
+        Writes the cached layouts of G next to a graph file
+        Params:
+            G: graph object or CSRGraph
+            file_name: graph file name, see layout_file
+        Returns:
+            number of layouts written
+        """
+        digest = fingerprint(G)[0]
+        entries = [(key, entry) for key, entry in self._layouts.items() if key[0] == digest]
+        if not entries:
+            return 0
+        meta = [{'method': key[1], 'seed': key[2], 'options': key[3]} for key, _ in entries]
+        arrays = {f'positions_{i}': entry[0] for i, (_, entry) in enumerate(entries)}
+        with open(layout_file(file_name), 'wb') as file:
+            np.savez(file, digest=np.array(digest), meta=np.array(json.dumps(meta)), keys=entries[0][1][1], **arrays)
+        return len(entries)
+
+    def load(self, file_name):
+        """
+        Reads the layouts stored next to a graph file into the cache
+        Params:
+            file_name: graph file name given to save
+        Returns:
+            number of layouts read, 0 if there is no layout file
+        """
+        path = layout_file(file_name)
+        if not os.path.exists(path):
+            return 0
+        with np.load(path) as data:
+            digest = str(data['digest'])
+            meta = json.loads(str(data['meta']))
+            for i, parameters in enumerate(meta):
+                key = (digest, parameters['method'], parameters['seed'], parameters['options'])
+                self._put(key, data[f'positions_{i}'], data['keys'])
+        return len(meta)
+
+    def invalidate(self, G=None):
+        """
+        Drops every layout, or the layouts of G's current structure
+        Params:
+            G: graph object or CSRGraph
+        """
+        digest = None if G is None else fingerprint(G)[0]
+        for key in list(self._layouts):
+            if digest is None or key[0] == digest:
+                self._drop(key)
+
+    def __len__(self):
+        return len(self._layouts)
+
+    def _put(self, key, positions, keys):
+        size = positions.nbytes + keys.nbytes
+        if size > self.max_bytes:
+            return
+        if key in self._layouts:
+            self._drop(key)
+        while self._layouts and self.bytes + size > self.max_bytes:
+            self._drop(next(iter(self._layouts)))
+        self._layouts[key] = (positions, keys, size)
+        self.bytes += size
+
+    def _drop(self, key):
+        self.bytes -= self._layouts.pop(key)[2]
+
+    def _remember(self, G, digest):
+        if _weakrefable(G):
+            self._latest[G] = digest
+
+def _weakrefable(G):
+    return isinstance(G, (nx.Graph, CSRGraph))
+
+def fingerprint(G):
+    """
+    Structural hash of a graph: node labels (as strings, so a graph read back from a file matches)
+    and undirected edges, both in a canonical order
+    Params:
+        G: graph object or CSRGraph
+    Returns:
+        digest: hex string
+        nodes: list of nodes
+        adjacency: matrix from adjacency_matrix
+        rank: canonical index of every node, in node order
+        keys: sorted int64 edge keys u * n + v (u < v) over canonical indices
+    """
+    nodes, adjacency = adjacency_matrix(G)
+    n = len(nodes)
+    labels = np.array([str(node) for node in nodes], dtype=object)
+    order = np.argsort(labels, kind='stable')
+    rank = np.empty(n, dtype=np.int64)
+    rank[order] = np.arange(n)
+    upper = sparse.triu(adjacency, k=1).tocoo()
+    low, high = rank[upper.row], rank[upper.col]
+    keys = np.sort(np.minimum(low, high) * n + np.maximum(low, high))
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update('\0'.join(labels[order].tolist()).encode())
+    digest.update(keys.tobytes())
+    return digest.hexdigest(), nodes, adjacency, rank, keys
+
+def layout_file(file_name):
+    """
+    Returns:
+        name of the layout file stored next to a graph file
+    """
+    return file_name + LAYOUT_SUFFIX
+
+def force_layout(G, seed=None, cache=True):
+    """
+    Multilevel force directed layout for large graphs. The graph is coarsened by merging nodes
+    into their neighboring suns until a few hundred nodes are left, those are laid out with exact
+    Fruchterman-Reingold forces, and each finer level starts from its parent's position and
+    is refined with Barnes-Hut repulsion over a quadtree, O(n log n) per iteration.
+    Params:
+        G: graph object or CSRGraph, directed graphs are laid out as undirected
+        seed: random seed
+        cache: look the positions up in LAYOUT_CACHE and store them there
+    Returns:
+        nodes: list of nodes
+        positions: len(nodes) x 2 array in the unit square, row i belongs to nodes[i]
+    """
+    if cache:
+        return LAYOUT_CACHE.layout(G, 'force', seed)
+    nodes, adjacency = adjacency_matrix(G)
+    return nodes, _force_positions(G, nodes, adjacency, seed)
+
+def _force_positions(G, nodes, adjacency, seed):
+    rng = np.random.default_rng(seed)
+    positions = _multilevel(adjacency, np.ones(len(nodes)), rng)
+    if len(nodes):
+        positions -= positions.min(axis=0)
+        positions /= max(float(positions.max()), 1e-12)
+    return positions
+
+def _spring_positions(G, nodes, adjacency, seed, **options):
+    pos = nx.spring_layout(as_networkx(G), seed=seed, **options)
+    return np.array([pos[node] for node in nodes], dtype=np.float64).reshape(-1, 2)
+
+def _bipartite_positions(G, nodes, adjacency, seed, **options):
+    #Deterministic, the seed is not used
+    G = as_networkx(G)
+    pos = nx.bipartite_layout(G, nx.bipartite.sets(G)[0], **options)
+    return np.array([pos[node] for node in nodes], dtype=np.float64).reshape(-1, 2)
+
+def _refine_layout(positions, adjacency):
+    #Scale to unit mean edge length, run a few cool force iterations, and map back to the old box
+    n = len(positions)
+    upper = sparse.triu(adjacency, k=1).tocoo()
+    if n < 2 or upper.nnz == 0:
+        return positions.copy()
+    low, span = positions.min(axis=0), max(float(np.ptp(positions, axis=0).max()), 1e-12)
+    unit = max(float(np.linalg.norm(positions[upper.row] - positions[upper.col], axis=1).mean()), 1e-12)
+    refined = _refine(positions / unit, adjacency, np.ones(n), REFINE_ITERATIONS, n <= COARSEST, REFINE_TEMPERATURE)
+    refined -= refined.min(axis=0)
+    return low + refined * (span / max(float(np.ptp(refined, axis=0).max()), 1e-12))
+
+#Layout method name -> function (G, nodes, adjacency, seed, **options) -> positions
+LAYOUT_METHODS = {'force': _force_positions, 'spring': _spring_positions, 'bipartite': _bipartite_positions}
+
+#Cache shared by the Plot methods and Attributes.balanced_graph
+LAYOUT_CACHE = LayoutCache()
+
+def adjacency_matrix(G):
+    """
+    Params:
+        G: graph object or CSRGraph
+    Returns:
+        nodes: list of nodes
+        adjacency: symmetric CSR matrix of ones without self loops, rows in node order
+    """
+    if isinstance(G, CSRGraph):
+        nodes = G.node_ids.tolist()
+        sources, targets = G.sources(), G.targets
+    else:
+        G = as_networkx(G)
+        nodes = list(G.nodes())
+        index = {node: i for i, node in enumerate(nodes)}
+        m = G.number_of_edges()
+        sources = np.fromiter((index[u] for u, _ in G.edges()), dtype=np.int64, count=m)
+        targets = np.fromiter((index[v] for _, v in G.edges()), dtype=np.int64, count=m)
+    keep = sources != targets
+    sources, targets = sources[keep], targets[keep]
+    n = len(nodes)
+    adjacency = sparse.csr_matrix((np.ones(2 * len(sources)), (np.concatenate([sources, targets]),
+                                                               np.concatenate([targets, sources]))), shape=(n, n))
+    adjacency.data[:] = 1.0
+    return nodes, adjacency
+
+def _multilevel(adjacency, mass, rng):
+    #Coarsen, lay out the coarsest level, then prolong and refine level by level
+    n = adjacency.shape[0]
+    if n <= COARSEST:
+        return _refine(rng.random((n, 2)) * np.sqrt(n), adjacency, mass, COARSE_ITERATIONS, exact=True)
+    groups = _match(adjacency, rng)
+    count = int(groups.max()) + 1
+    if count > MIN_SHRINK * n:
+        return _refine(rng.random((n, 2)) * np.sqrt(n), adjacency, mass, COARSE_ITERATIONS, exact=False)
+
+    projection = sparse.csr_matrix((np.ones(n), (groups, np.arange(n))), shape=(count, n))
+    coarse = (projection @ adjacency @ projection.T).tocsr()
+    coarse.setdiag(0)
+    coarse.eliminate_zeros()
+    coarse_positions = _multilevel(coarse, projection @ mass, rng)
+    #Children start on their parent, slightly apart
+    positions = coarse_positions[groups] + (rng.random((n, 2)) - 0.5) * 0.1
+    return _refine(positions, adjacency, mass, FINE_ITERATIONS, exact=False)
+
+def _match(adjacency, rng):
+    #Solar system coarsening: a few Luby rounds pick suns, nodes with a higher random priority than
+    #every undecided neighbor, and every neighbor of a sun joins the first sun next to it.
+    #Returns the coarse group of every node
+    n = adjacency.shape[0]
+    indptr, indices = adjacency.indptr, adjacency.indices
+    linked = np.flatnonzero(np.diff(indptr))
+    priority = rng.random(n)
+    sun = np.zeros(n, dtype=bool)
+    covered = np.zeros(n, dtype=bool)
+    for _ in range(SUN_ROUNDS):
+        candidate = np.where(covered, -1.0, priority)
+        rival = np.full(n, -1.0)
+        rival[linked] = np.maximum.reduceat(candidate[indices], indptr[linked])
+        sun |= ~covered & (candidate > rival)
+        covered = sun | (adjacency @ sun.astype(np.float64) > 0)
+
+    leader = np.arange(n)
+    planets = (adjacency @ sparse.diags(sun.astype(np.float64))).tocsr()
+    planets.eliminate_zeros()
+    orbiting = np.flatnonzero(~sun & (np.diff(planets.indptr) > 0))
+    leader[orbiting] = planets.indices[planets.indptr[orbiting]]
+    return np.unique(leader, return_inverse=True)[1]
+
+def _refine(positions, adjacency, mass, iterations, exact, temperature=None):
+    #Fruchterman-Reingold with unit ideal length: attraction d^2 along edges, repulsion
+    #mass / d, moves capped by a temperature that cools every iteration (a tenth of the
+    #drawing's width unless given)
+    n = len(positions)
+    if n < 2:
+        return positions
+    rows = np.repeat(np.arange(n), np.diff(adjacency.indptr))
+    columns = adjacency.indices
+    weights = adjacency.data
+    if temperature is None:
+        temperature = max(float(np.ptp(positions, axis=0).max()) / 10, 1.0)
+    cooling = (0.01 / temperature) ** (1 / max(iterations, 1)) if temperature > 0.01 else 1.0
+    for _ in range(iterations):
+        repulsion = _exact_repulsion(positions, mass) if exact else _barnes_hut(positions, mass)
+        delta = positions[rows] - positions[columns]
+        distance = np.sqrt((delta ** 2).sum(axis=1)) + 1e-9
+        pull = -(weights * distance)[:, None] * delta
+        attraction = np.column_stack([np.bincount(rows, pull[:, 0], minlength=n), np.bincount(rows, pull[:, 1], minlength=n)])
+        force = mass[:, None] * repulsion + attraction
+        length = np.sqrt((force ** 2).sum(axis=1)) + 1e-12
+        positions = positions + force * (np.minimum(length, temperature) / length)[:, None]
+        temperature *= cooling
+    return positions
+
+def _exact_repulsion(positions, mass):
+    #Sum over every other node of mass * direction / distance, in chunks of rows
+    x, y = positions[:, 0], positions[:, 1]
+    force = np.zeros_like(positions)
+    for start in range(0, len(positions), REPULSION_CHUNK):
+        stop = start + REPULSION_CHUNK
+        weight = np.broadcast_to(mass, (len(x[start:stop]), len(x))).copy()
+        weight[np.arange(len(weight)), np.arange(start, start + len(weight))] = 0.0
+        force[start:stop] = np.column_stack(_pull(x[start:stop], y[start:stop], weight, x[None, :], y[None, :]))
+    return force
+
+def _barnes_hut(positions, mass):
+    #Quadtree levels as uniform grids. On every level a node feels, as a point mass, each cell that
+    #is a child of its parent's neighbors but not adjacent to its own cell; cells further away were
+    #already counted one level up. The finest level adds the adjacent cells, its own cell without itself
+    n = len(positions)
+    depth = max(2, int(np.ceil(np.log(n) / np.log(4))))
+    low = positions.min(axis=0)
+    span = max(float((positions.max(axis=0) - low).max()), 1e-9) * (1 + 1e-9)
+    x, y = positions[:, 0], positions[:, 1]
+    force_x, force_y = np.zeros(n), np.zeros(n)
+    for level in range(2, depth + 1):
+        size = 1 << level
+        cells = np.minimum(((positions - low) / span * size).astype(np.int64), size - 1)
+        total, center_x, center_y = _cell_masses(cells, positions, mass, size)
+        #Grids are padded by two empty cells on each side, so every offset stays inside
+        parity = (cells[:, 0] % 2) * 2 + cells[:, 1] % 2
+        index = (2 * (cells[:, :1] // 2) + _FAR_X[parity] + 2) * (size + 4) + 2 * (cells[:, 1:] // 2) + _FAR_Y[parity] + 2
+        pull_x, pull_y = _pull(x, y, total[index], center_x[index], center_y[index])
+        force_x += pull_x
+        force_y += pull_y
+
+    #Near field on the finest grid, the node's own mass taken out of its cell
+    index = (cells[:, :1] + _NEAR_X + 2) * (size + 4) + cells[:, 1:] + _NEAR_Y + 2
+    weight, source_x, source_y = total[index], center_x[index], center_y[index]
+    own = _NEAR_OWN
+    rest = weight[:, own] - mass
+    alone = rest <= 1e-12
+    rest[alone] = 1.0
+    source_x[:, own] = np.where(alone, x, (source_x[:, own] * weight[:, own] - x * mass) / rest)
+    source_y[:, own] = np.where(alone, y, (source_y[:, own] * weight[:, own] - y * mass) / rest)
+    weight[:, own] = np.where(alone, 0.0, rest)
+    pull_x, pull_y = _pull(x, y, weight, source_x, source_y)
+    return np.column_stack([force_x + pull_x, force_y + pull_y])
+
+def _offsets(low, high):
+    grid_x, grid_y = np.meshgrid(np.arange(low, high), np.arange(low, high), indexing='ij')
+    return grid_x.ravel(), grid_y.ravel()
+
+#For each parity of a cell (x % 2, y % 2), the 27 children of its parent's neighbors, relative to
+#2 * parent, that are not adjacent to it, and the 9 cells around a cell with its own cell at _NEAR_OWN
+_CHILD_X, _CHILD_Y = _offsets(-2, 4)
+_FAR = [(np.abs(_CHILD_X - a) > 1) | (np.abs(_CHILD_Y - b) > 1) for a in (0, 1) for b in (0, 1)]
+_FAR_X = np.array([_CHILD_X[far] for far in _FAR])
+_FAR_Y = np.array([_CHILD_Y[far] for far in _FAR])
+_NEAR_X, _NEAR_Y = (offset.reshape(1, -1) for offset in _offsets(-1, 2))
+_NEAR_OWN = 4
+
+def _cell_masses(cells, positions, mass, size):
+    #Total mass and center of mass of every cell on the padded (size + 4) x (size + 4) grid
+    padded = size + 4
+    index = (cells[:, 0] + 2) * padded + cells[:, 1] + 2
+    total = np.bincount(index, mass, minlength=padded * padded)
+    center_x = np.bincount(index, mass * positions[:, 0], minlength=padded * padded)
+    center_y = np.bincount(index, mass * positions[:, 1], minlength=padded * padded)
+    occupied = total > 0
+    center_x[occupied] /= total[occupied]
+    center_y[occupied] /= total[occupied]
+    return total, center_x, center_y
+
+def _pull(x, y, weight, source_x, source_y):
+    #Sum of weight * direction / distance from n x k point masses at (source_x, source_y), empty
+    #cells have zero weight
+    delta_x = x[:, None] - source_x
+    delta_y = y[:, None] - source_y
+    scale = weight / (delta_x * delta_x + delta_y * delta_y + 1e-12)
+    return (delta_x * scale).sum(axis=1), (delta_y * scale).sum(axis=1)
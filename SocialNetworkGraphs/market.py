@@ -0,0 +1,697 @@
+import numpy as np
+from scipy import sparse
+from scipy.sparse.csgraph import maximum_bipartite_matching, min_weight_full_bipartite_matching
+import instrumentation
+
+#Each auction phase divides epsilon by this
+EPSILON_FACTOR = 4
+#Cells of the valuation matrix handled per NumPy block, keeps temporaries small on large markets
+BLOCK_CELLS = 1 << 22
+
+def clear_market(valuations, reserve=None, method='hungarian'):
+    """
+    Market clearing for buyers with valuations over houses.
+    A value maximizing assignment is found first (by either method), then the minimal market
+    clearing prices supporting it are computed exactly, so both methods give the same prices
+    and payoffs and may only differ in the assignment of indifferent buyers.
+    Sparse valuations (a scipy sparse matrix, see read_sparse_market) only hold the houses a buyer
+    wants. Every buyer then also has an outside option worth 0, may stay unmatched, and the work
+    scales with the number of stored valuations.
+    Params:
+        valuations: buyers x houses array, at most as many buyers as houses, or a sparse matrix of any shape
+        reserve: starting (reserve) price of every house, zeros when None
+        method: 'hungarian' (exact, scipy's Jonker-Volgenant solver, LAPJVsp when sparse) or 'auction'
+                (epsilon scaling auction, exact for integer valuations)
+    Returns:
+        assignment: array with the house of every buyer, -1 for unmatched buyers
+        payoffs: array of buyer payoffs at the clearing prices
+        prices: array of minimal market clearing prices
+    """
+    if sparse.issparse(valuations):
+        return _clear_sparse(sparse.csr_matrix(valuations), reserve, method)
+    valuations = np.asarray(valuations)
+    buyers, houses = valuations.shape
+    if buyers > houses:
+        raise ValueError(f"Market has {buyers} buyers but only {houses} houses")
+    reserve = np.zeros(houses, dtype=valuations.dtype) if reserve is None else np.asarray(reserve)
+
+    if method == 'hungarian':
+        #scipy.optimize is slow to import and only needed here
+        from scipy.optimize import linear_sum_assignment
+        #Reserves only cancel out when every house is sold
+        _, assignment = linear_sum_assignment(valuations - reserve if buyers < houses else valuations, maximize=True)
+    elif method == 'auction':
+        assignment, _ = auction(valuations, reserve)
+    else:
+        raise ValueError(f"Unknown method: {method}")
+
+    prices = minimal_prices(valuations, assignment, reserve)
+    payoffs = valuations[np.arange(buyers), assignment] - prices[assignment]
+    return assignment, payoffs, prices
+
+def auction(valuations, reserve=None, epsilon=None):
+    """
+    Bertsekas auction with epsilon scaling and Jacobi (simultaneous) bidding.
+    Every round, all unassigned buyers bid at once for their best house, raising its price by
+    the gap to their second best plus epsilon; each house goes to its highest bidder.
+    Integer valuations are scaled by buyers + 1 so that a final epsilon of 1 gives an optimal assignment.
+    Params:
+        valuations: buyers x houses array
+        reserve: starting price of every house, zeros when None
+        epsilon: final epsilon, None for the exact value on integer valuations
+    Returns:
+        assignment: array with the house of every buyer
+        rounds: number of bidding rounds over all phases
+    """
+    valuations = np.asarray(valuations)
+    buyers, houses = valuations.shape
+    reserve = np.zeros(houses, dtype=valuations.dtype) if reserve is None else np.asarray(reserve)
+    scale, final = _resolution(valuations, reserve, buyers, epsilon)
+    prices = reserve.astype(np.float64) * scale
+
+    spread = float(valuations.max() - valuations.min()) * scale if valuations.size else 0.0
+    #With spare houses scaling could leave one unsold above its reserve, see sparse_auction
+    current = max(spread / EPSILON_FACTOR, final) if buyers == houses else final
+    bids = lambda bidders, epsilon: _bids(valuations, prices, bidders, epsilon, scale)
+    return _scaled_auction(bids, prices, buyers, current, final)
+
+def _resolution(valuations, reserve, buyers, epsilon):
+    #Scale applied to valuations and final epsilon in scaled units. Integer markets are scaled
+    #by buyers + 1 so that epsilon 1 stays below the smallest value difference over all buyers
+    values = valuations.data if sparse.issparse(valuations) else valuations
+    if np.issubdtype(np.result_type(values.dtype, reserve.dtype), np.integer):
+        scale = buyers + 1
+        return scale, 1.0 if epsilon is None else epsilon * scale
+    if epsilon is not None:
+        return 1, epsilon
+    magnitude = max(float(np.abs(values).max()) if values.size else 0.0, 1.0)
+    return 1, 1e-9 * magnitude / (buyers + 1)
+
+def _scaled_auction(bids, prices, buyers, current, final):
+    #Epsilon scaling: each phase starts from the previous phase's prices with no buyer assigned
+    rounds = 0
+    while True:
+        assignment, phase_rounds = _auction_phase(bids, prices, buyers, current)
+        rounds += phase_rounds
+        if current <= final:
+            return assignment, rounds
+        current = max(current / EPSILON_FACTOR, final)
+
+def _auction_phase(bid, prices, buyers, epsilon, assignment=None, max_rounds=None):
+    #One epsilon phase: bid until every buyer holds a house or its outside option, marked by
+    #the index len(prices) and never contested. Prices are raised in place. After max_rounds
+    #the phase stops with some buyers still unassigned
+    houses = len(prices)
+    if assignment is None:
+        assignment = np.full(buyers, -1, dtype=np.int64)
+    owner = np.full(houses, -1, dtype=np.int64)
+    held = (assignment >= 0) & (assignment < houses)
+    owner[assignment[held]] = np.flatnonzero(held)
+    rounds = 0
+    while True:
+        bidders = np.flatnonzero(assignment < 0)
+        if len(bidders) == 0 or (max_rounds is not None and rounds >= max_rounds):
+            instrumentation.count('auction_rounds', rounds)
+            return assignment, rounds
+        rounds += 1
+        targets, bids = bid(bidders, epsilon)
+        outside = targets == houses
+        assignment[bidders[outside]] = houses
+        bidders, targets, bids = bidders[~outside], targets[~outside], bids[~outside]
+
+        #Highest bid per house wins; sort by (house, bid) and keep the last bid of every house
+        order = np.lexsort((bids, targets))
+        last = np.ones(len(order), dtype=bool)
+        last[:-1] = targets[order[1:]] != targets[order[:-1]]
+        winners, won, price = bidders[order[last]], targets[order[last]], bids[order[last]]
+
+        outbid = owner[won]
+        assignment[outbid[outbid >= 0]] = -1
+        owner[won] = winners
+        assignment[winners] = won
+        prices[won] = price
+
+def _bids(values, prices, bidders, epsilon, scale=1):
+    #Best house and bid of every bidder, computed in row blocks; prices are in scaled units
+    houses = values.shape[1]
+    targets = np.empty(len(bidders), dtype=np.int64)
+    bids = np.empty(len(bidders))
+    step = max(1, BLOCK_CELLS // max(houses, 1))
+    for start in range(0, len(bidders), step):
+        rows = bidders[start:start + step]
+        payoffs = values[rows] * float(scale) - prices
+        best = payoffs.argmax(axis=1)
+        best_value = payoffs[np.arange(len(rows)), best]
+        if houses > 1:
+            payoffs[np.arange(len(rows)), best] = -np.inf
+            second = payoffs.max(axis=1)
+        else:
+            second = best_value
+        targets[start:start + step] = best
+        bids[start:start + step] = prices[best] + best_value - second + epsilon
+    return targets, bids
+
+def _sparse_bids(matrix, prices, bidders, epsilon, scale=1):
+    #Best house and bid of every bidder over its stored entries only. The outside option is worth 0
+    #and counts as a choice, a bidder whose best house pays no more takes it (target len(prices))
+    lengths = matrix.indptr[bidders + 1] - matrix.indptr[bidders]
+    targets = np.full(len(bidders), len(prices), dtype=np.int64)
+    bids = np.zeros(len(bidders))
+    listed = lengths > 0
+    if not listed.any():
+        return targets, bids
+    slots, segments, owner = _slots(matrix.indptr, bidders[listed])
+    houses = matrix.indices[slots]
+    payoffs = matrix.data[slots] * float(scale) - prices[houses]
+
+    best_value = np.maximum.reduceat(payoffs, segments)
+    #First slot reaching the maximum in each segment
+    hits = np.flatnonzero(payoffs == best_value[owner])
+    _, first = np.unique(owner[hits], return_index=True)
+    best = hits[first]
+    payoffs[best] = -np.inf
+    second = np.maximum(np.maximum.reduceat(payoffs, segments), 0.0)
+    buying = best_value > 0
+    rows = np.flatnonzero(listed)[buying]
+    targets[rows] = houses[best[buying]]
+    bids[rows] = prices[targets[rows]] + best_value[buying] - second[buying] + epsilon
+    return targets, bids
+
+def _slots(indptr, rows):
+    #Positions of the stored entries of the given CSR rows, the start of each row's segment
+    #among them and the row (by position in rows) every entry belongs to
+    starts = indptr[rows]
+    lengths = indptr[rows + 1] - starts
+    segments = np.zeros(len(rows), dtype=np.int64)
+    np.cumsum(lengths[:-1], out=segments[1:])
+    slots = np.arange(int(lengths.sum())) - np.repeat(segments - starts, lengths)
+    return slots, segments, np.repeat(np.arange(len(rows)), lengths)
+
+def sparse_auction(valuations, reserve=None, epsilon=None):
+    """
+    Auction on sparse valuations where every buyer may take an outside option worth 0.
+    Bids only look at the houses a buyer lists, so a round costs the stored entries of its bidders.
+    There is a single phase at the final epsilon: with epsilon scaling a house bid up in an early
+    phase can end unsold above its reserve, which breaks optimality once buyers may stay out,
+    while in one phase a house that got a bid stays sold and the others keep their reserve.
+    Params:
+        valuations: scipy sparse buyers x houses matrix
+        reserve: reserve price of every house, zeros when None
+        epsilon: final epsilon, None for the exact value on integer valuations
+    Returns:
+        assignment: array with the house of every buyer, -1 for unmatched buyers
+        rounds: number of bidding rounds
+    """
+    matrix = sparse.csr_matrix(valuations)
+    buyers, houses = matrix.shape
+    reserve = np.zeros(houses, dtype=matrix.dtype) if reserve is None else np.asarray(reserve)
+    scale, final = _resolution(matrix, reserve, buyers, epsilon)
+    #Prices start at the reserve, where a house pays its buyer no more than the outside option
+    prices = reserve.astype(np.float64) * scale
+    bids = lambda bidders, epsilon: _sparse_bids(matrix, prices, bidders, epsilon, scale)
+    assignment, rounds = _auction_phase(bids, prices, buyers, final)
+    return np.where(assignment < houses, assignment, -1), rounds
+
+def _clear_sparse(valuations, reserve, method):
+    buyers, houses = valuations.shape
+    reserve = np.zeros(houses, dtype=valuations.dtype) if reserve is None else np.asarray(reserve)
+    if method == 'hungarian':
+        assignment = _sparse_assignment(valuations, reserve)
+    elif method == 'auction':
+        assignment, _ = sparse_auction(valuations, reserve)
+    else:
+        raise ValueError(f"Unknown method: {method}")
+
+    prices = minimal_prices(valuations, assignment, reserve)
+    matched = assignment >= 0
+    payoffs = np.zeros(buyers, dtype=prices.dtype)
+    payoffs[matched] = _entries(valuations, np.flatnonzero(matched), assignment[matched]) - prices[assignment[matched]]
+    return assignment, payoffs, prices
+
+def _sparse_assignment(valuations, reserve):
+    #LAPJVsp on the buyers x (houses + outside options) matrix. Every row is matched, so a
+    #constant can be added to make all weights positive without changing the optimum
+    buyers, houses = valuations.shape
+    rows = np.repeat(np.arange(buyers), np.diff(valuations.indptr))
+    gains = (valuations.data - reserve[valuations.indices]).astype(np.float64)
+    ceiling = max(float(gains.max()) if len(gains) else 0.0, 0.0) + 1.0
+    weights = sparse.csr_matrix((np.concatenate([ceiling - gains, np.full(buyers, ceiling)]),
+                                 (np.concatenate([rows, np.arange(buyers)]),
+                                  np.concatenate([valuations.indices, houses + np.arange(buyers)]))),
+                                shape=(buyers, houses + buyers))
+    matched_rows, columns = min_weight_full_bipartite_matching(weights)
+    assignment = np.full(buyers, -1, dtype=np.int64)
+    assignment[matched_rows] = np.where(columns < houses, columns, -1)
+    return assignment
+
+def _entries(matrix, rows, columns):
+    #Stored values of a CSR matrix at (row, column) pairs, 0 where nothing is stored
+    return np.asarray(matrix[rows, columns]).ravel()
+
+def preferred_sellers(valuations, prices, tol=1e-9):
+    """
+    Preferred seller graph: every house that maximizes a buyer's payoff at the given prices,
+    all ties included, found in one pass over the valuations (row blocks when dense).
+    With sparse valuations the outside option (worth 0) is a choice too: a buyer whose best
+    payoff is negative prefers no seller, one whose best payoff is 0 is also happy unmatched.
+    Params:
+        valuations: buyers x houses array or scipy sparse matrix
+        prices: price of every house
+        tol: payoffs within tol of the best count as ties
+    Returns:
+        preferred: buyers x houses boolean CSR matrix
+        outside: boolean array, True for buyers whose outside option is among their best choices
+    """
+    prices = np.asarray(prices, dtype=np.float64)
+    if sparse.issparse(valuations):
+        valuations = sparse.csr_matrix(valuations)
+        buyers, houses = valuations.shape
+        lengths = np.diff(valuations.indptr)
+        owner = np.repeat(np.arange(buyers), lengths)
+        payoffs = valuations.data - prices[valuations.indices]
+        best = np.zeros(buyers)
+        listed = np.flatnonzero(lengths)
+        if len(listed):
+            best[listed] = np.maximum(np.maximum.reduceat(payoffs, valuations.indptr[listed]), 0.0)
+        keep = payoffs >= best[owner] - tol
+        indptr = np.zeros(buyers + 1, dtype=np.int64)
+        np.cumsum(np.bincount(owner[keep], minlength=buyers), out=indptr[1:])
+        return (sparse.csr_matrix((np.ones(int(keep.sum()), dtype=bool), valuations.indices[keep], indptr),
+                                  shape=(buyers, houses)), best <= tol)
+
+    valuations = np.asarray(valuations)
+    buyers, houses = valuations.shape
+    rows, columns = [], []
+    step = max(1, BLOCK_CELLS // max(houses, 1))
+    for start in range(0, buyers, step):
+        payoffs = valuations[start:start + step] - prices
+        row, column = np.nonzero(payoffs >= payoffs.max(axis=1, keepdims=True) - tol)
+        rows.append(row + start)
+        columns.append(column)
+    rows = np.concatenate(rows) if rows else np.zeros(0, dtype=np.int64)
+    columns = np.concatenate(columns) if columns else np.zeros(0, dtype=np.int64)
+    return (sparse.csr_matrix((np.ones(len(rows), dtype=bool), (rows, columns)), shape=(buyers, houses)),
+            np.zeros(buyers, dtype=bool))
+
+def constricted_set(preferred, outside=None):
+    """
+    Maximum matching of the preferred seller graph (Hopcroft-Karp) and, when some buyer is left
+    out, a constricted set: the buyers reachable from left out buyers along alternating paths,
+    whose preferred houses (their neighbors) are fewer than they are (Konig's theorem).
+    A buyer whose outside option is among its best choices is never left out, it is matched
+    to a private dummy house instead.
+    Params:
+        preferred: buyers x houses boolean CSR matrix, see preferred_sellers
+        outside: boolean array of buyers happy to stay unmatched, see preferred_sellers
+    Returns:
+        matching: array with the house of every buyer, -1 for unmatched buyers
+        buyers: array of the constricted buyers, empty when every buyer is matched
+        houses: array of their preferred houses
+    """
+    preferred = sparse.csr_matrix(preferred)
+    buyers, houses = preferred.shape
+    if outside is not None and np.any(outside):
+        #Dummy house houses + i for every buyer i with the outside option
+        dummies = np.flatnonzero(outside)
+        preferred = sparse.hstack([preferred, sparse.csr_matrix(
+            (np.ones(len(dummies), dtype=bool), (dummies, np.arange(len(dummies)))),
+            shape=(buyers, len(dummies)))], format='csr')
+    columns = preferred.shape[1]
+    matching = maximum_bipartite_matching(preferred, perm_type='column').astype(np.int64)
+    frontier = np.flatnonzero(matching < 0)
+    if len(frontier) == 0:
+        return np.where(matching < houses, matching, -1), frontier, np.zeros(0, dtype=np.int64)
+
+    owner = np.full(columns, -1, dtype=np.int64)
+    matched = np.flatnonzero(matching >= 0)
+    owner[matching[matched]] = matched
+    seen_buyers = np.zeros(buyers, dtype=bool)
+    seen_houses = np.zeros(columns, dtype=bool)
+    seen_buyers[frontier] = True
+    while len(frontier):
+        #Buyer to any preferred house, house back to its matched buyer. The matching is maximum,
+        #so every house reached is matched and leads to a buyer not seen yet
+        slots, _, _ = _slots(preferred.indptr, frontier)
+        reached = np.unique(preferred.indices[slots])
+        reached = reached[~seen_houses[reached]]
+        seen_houses[reached] = True
+        frontier = owner[reached]
+        seen_buyers[frontier] = True
+    return (np.where(matching < houses, matching, -1), np.flatnonzero(seen_buyers),
+            np.flatnonzero(seen_houses[:houses]))
+
+def equilibrium_matching(preferred, outside, elevated):
+    """
+    Once the preferred seller graph has no constricted set, picks the matching that sells as many
+    houses priced above their reserve as possible (all of them at market clearing prices), while
+    every buyer gets a preferred seller or its outside option. LAPJVsp over the preferred edges.
+    Params:
+        preferred: buyers x houses boolean CSR matrix, see preferred_sellers
+        outside: boolean array of buyers happy to stay unmatched
+        elevated: boolean array of houses priced above their reserve
+    Returns:
+        matching: array with the house of every buyer, -1 for unmatched buyers
+    """
+    preferred = sparse.csr_matrix(preferred)
+    buyers, houses = preferred.shape
+    dummies = np.flatnonzero(outside)
+    rows = np.concatenate([np.repeat(np.arange(buyers), np.diff(preferred.indptr)), dummies])
+    columns = np.concatenate([preferred.indices, houses + np.arange(len(dummies))])
+    weights = np.concatenate([np.where(elevated[preferred.indices], 1.0, 2.0), np.full(len(dummies), 2.0)])
+    matched_rows, matched = min_weight_full_bipartite_matching(
+        sparse.csr_matrix((weights, (rows, columns)), shape=(buyers, houses + len(dummies))))
+    matching = np.full(buyers, -1, dtype=np.int64)
+    matching[matched_rows] = np.where(matched < houses, matched, -1)
+    return matching
+
+def minimal_prices(valuations, assignment, reserve=None):
+    """
+    Smallest prices, no lower than reserve, at which every buyer weakly prefers their assigned house.
+    Each buyer i holding house h asks p[j] >= p[h] + v[i, j] - v[i, h] for every j, a longest path
+    problem over houses solved by Bellman-Ford. Unmatched buyers (-1) hold their outside option and
+    ask p[j] >= v[i, j]. The assignment must maximize total value, otherwise there is a positive
+    cycle and no such prices exist.
+    Params:
+        valuations: buyers x houses array or scipy sparse matrix (only stored entries constrain prices)
+        assignment: array with the house of every buyer, -1 for unmatched buyers
+        reserve: starting price of every house, zeros when None
+    Returns:
+        prices: array of prices, integer when valuations and reserve are
+    """
+    is_sparse = sparse.issparse(valuations)
+    valuations = sparse.csr_matrix(valuations) if is_sparse else np.asarray(valuations)
+    assignment = np.asarray(assignment)
+    buyers, houses = valuations.shape
+    reserve = np.zeros(houses, dtype=valuations.dtype) if reserve is None else np.asarray(reserve)
+    dtype = np.result_type(valuations.dtype, reserve.dtype)
+    if not np.issubdtype(dtype, np.integer):
+        dtype = np.float64
+    prices = reserve.astype(dtype)
+    matched = assignment >= 0
+    own = np.zeros(buyers, dtype=dtype)
+    if is_sparse:
+        own[matched] = _entries(valuations, np.flatnonzero(matched), assignment[matched])
+    else:
+        own[matched] = valuations[np.flatnonzero(matched), assignment[matched]]
+    step = max(1, BLOCK_CELLS // max(houses, 1))
+
+    #Bounds only rise, so each pass rescans just the buyers whose house got dearer in the last one.
+    #A longest path has at most houses + 1 edges, the first one may come from an unmatched buyer
+    changed = np.arange(buyers)
+    for _ in range(houses + 2):
+        held = assignment[changed]
+        payoffs = own[changed] - np.where(held >= 0, prices[held], 0)
+        bound = prices.copy()
+        if is_sparse:
+            block = valuations[changed]
+            np.maximum.at(bound, block.indices, block.data.astype(dtype) - np.repeat(payoffs, np.diff(block.indptr)))
+        else:
+            for start in range(0, len(changed), step):
+                rows = changed[start:start + step]
+                block = valuations[rows].astype(dtype) - payoffs[start:start + step, None]
+                np.maximum(bound, block.max(axis=0), out=bound)
+        raised = bound > prices
+        prices = bound
+        changed = np.flatnonzero(matched & raised[np.maximum(assignment, 0)])
+        if len(changed) == 0:
+            return prices
+    raise ValueError("Assignment does not maximize total value, no clearing prices support it")
+
+class Market:
+    """
+    Market that stays cleared while it changes a few buyers at a time.
+    The auction state (bid prices and assignment) is kept between updates. After a delta only the
+    buyers it touches, and those who would now rather switch, bid again from the previous prices,
+    instead of the whole market bidding up from the reserves. Dense markets make every buyer buy,
+    sparse ones (scipy sparse valuations) give buyers an outside option worth 0.
+
+        market = Market(valuations)
+        market.update_buyer(3, row)
+        rounds = market.clear()
+    """
+
+    def __init__(self, valuations, reserve=None, epsilon=None):
+        """
+        Params:
+            valuations: buyers x houses array, or scipy sparse matrix
+            reserve: reserve price of every house, zeros when None
+            epsilon: final auction epsilon, None for exact clearing on integer valuations
+        """
+        self.is_sparse = sparse.issparse(valuations)
+        self.valuations = sparse.csr_matrix(valuations) if self.is_sparse else np.array(valuations)
+        buyers, houses = self.valuations.shape
+        self.reserve = np.zeros(houses, dtype=self.valuations.dtype) if reserve is None else np.array(reserve)
+        self.epsilon = epsilon
+        #Last clearing: assignment (-1 unmatched), payoffs, minimal clearing prices and the rounds it took
+        self.assignment = self.payoffs = self.prices = None
+        self.rounds = 0
+        #Auction state: prices in scaled units and held house per buyer (houses for the outside option)
+        self._bid_prices = None
+        self._held = np.full(buyers, -1, dtype=np.int64)
+        self._scale = None
+        self._cold_rounds = None
+        self.clear(cold=True)
+
+    @property
+    def houses(self):
+        return self.valuations.shape[1]
+
+    @property
+    def buyers(self):
+        return self.valuations.shape[0]
+
+    def add_buyer(self, row):
+        """
+        Params:
+            row: valuations of the new buyer, a sequence over houses or for sparse markets a dict house -> value
+        Returns:
+            index of the new buyer
+        """
+        row = self._row(row)
+        if self.is_sparse:
+            self.valuations = sparse.vstack([self.valuations, row], format='csr')
+        else:
+            if self.buyers + 1 > self.houses:
+                raise ValueError("A dense market needs a house for every buyer")
+            self.valuations = np.vstack([self.valuations, row])
+        self._held = np.append(self._held, -1)
+        return self.buyers - 1
+
+    def remove_buyer(self, buyer):
+        """
+        Params:
+            buyer: index of the buyer, later buyers move down by one
+        """
+        if self.is_sparse:
+            keep = np.delete(np.arange(self.buyers), buyer)
+            self.valuations = self.valuations[keep]
+        else:
+            self.valuations = np.delete(self.valuations, buyer, axis=0)
+        self._held = np.delete(self._held, buyer)
+
+    def update_buyer(self, buyer, row):
+        """
+        Params:
+            buyer: index of the buyer
+            row: new valuations, as for add_buyer
+        """
+        row = self._row(row)
+        if self.is_sparse:
+            self.valuations = sparse.vstack([self.valuations[:buyer], row, self.valuations[buyer + 1:]], format='csr')
+        else:
+            self.valuations[buyer] = row
+        self._held[buyer] = -1
+
+    def set_reserve(self, house, price):
+        """
+        Params:
+            house: index of the house
+            price: new reserve price
+        """
+        self.reserve = self.reserve.astype(np.result_type(self.reserve.dtype, np.asarray(price).dtype))
+        self.reserve[house] = price
+        #Bid prices never sit below the reserve; an owner who now minds is caught by clear
+        self._bid_prices[house] = max(self._bid_prices[house], float(price) * self._scale)
+
+    def clear(self, cold=False):
+        """
+        Re-clears the market after deltas
+        Params:
+            cold: start over from the reserve prices instead of the previous prices
+        Returns:
+            rounds: bidding rounds this clearing took (also kept in self.rounds)
+        """
+        self.rounds = 0
+        if not cold:
+            warm = self._warm_start()
+            if warm is not None:
+                self.rounds = warm
+            else:
+                #Gave up after the budget of the last cold solve
+                self.rounds, cold = self._cold_rounds, True
+        if cold:
+            #Prices stay in units of this scale; epsilon follows the buyer count (see _final)
+            self._scale, _ = _resolution(self.valuations, self.reserve, self.buyers, self.epsilon)
+            self._held = np.full(self.buyers, -1, dtype=np.int64)
+            self._bid_prices, self._held, self._cold_rounds = self._solve(self._held)
+            self.rounds += self._cold_rounds
+
+        assignment = np.where(self._held < self.houses, self._held, -1)
+        try:
+            prices = minimal_prices(self.valuations, assignment, self.reserve)
+        except ValueError:
+            prices = None
+        if prices is None or not self._clears(assignment, prices):
+            if cold:
+                raise ValueError("Auction did not find an optimal assignment, try a smaller epsilon")
+            #Safety net, a warm start that went wrong costs one cold solve
+            warm_rounds = self.rounds
+            self.clear(cold=True)
+            self.rounds += warm_rounds
+            return self.rounds
+
+        matched = assignment >= 0
+        payoffs = np.zeros(self.buyers, dtype=prices.dtype)
+        rows = np.flatnonzero(matched)
+        own = _entries(self.valuations, rows, assignment[rows]) if self.is_sparse else self.valuations[rows, assignment[rows]]
+        payoffs[rows] = own - prices[assignment[rows]]
+        self.assignment, self.payoffs, self.prices = assignment, payoffs, prices
+        return self.rounds
+
+    def cold_rounds(self):
+        """
+        Returns:
+            rounds a cold solve of the current market takes, for comparison with self.rounds
+        """
+        _, _, rounds = self._solve(np.full(self.buyers, -1, dtype=np.int64))
+        return rounds
+
+    def _solve(self, held):
+        #Auction from the reserve prices; scaled phases only when every house must be sold
+        prices = self.reserve.astype(np.float64) * self._scale
+        final = self._final()
+        if self.is_sparse or self.buyers < self.houses:
+            held, rounds = _auction_phase(self._bidder(prices), prices, self.buyers, final, held)
+            return prices, held, rounds
+        held, rounds = _scaled_auction(self._bidder(prices), prices, self.buyers,
+                                       max(self._spread() / EPSILON_FACTOR, final), final)
+        return prices, held, rounds
+
+    def _warm_start(self):
+        #Buyers who would now gain more than epsilon by switching (after a reserve change, or a finer
+        #epsilon for more buyers) bid again along with the new and updated buyers, at the final epsilon.
+        #A price war between near indifferent buyers can take longer than solving cold, so the warm
+        #start gives up after as many rounds as the last cold solve took
+        prices, held, final = self._bid_prices, self._held, self._final()
+        held[self._switching(prices, held, final)] = -1
+        held, rounds = _auction_phase(self._bidder(prices), prices, self.buyers, final, held, self._cold_rounds)
+        if np.any(held < 0):
+            return None
+        self._held = held
+        #Houses left unsold above their reserve bid for buyers in turn
+        unsold = np.ones(self.houses, dtype=bool)
+        unsold[held[(held >= 0) & (held < self.houses)]] = False
+        elevated = np.flatnonzero(unsold & (prices > self.reserve * float(self._scale)))
+        if len(elevated):
+            rounds += self._reverse(elevated, prices, held, final)
+        return rounds
+
+    def _reverse(self, houses, prices, held, epsilon):
+        """
+        Reverse auction steps: an unsold house priced above its reserve takes the buyer it offers the
+        most, at the price leaving the runner up within epsilon, so every buyer keeps epsilon
+        complementary slackness. The buyer's old house is then unsold and takes its turn.
+        Returns:
+            number of steps
+        """
+        scale = float(self._scale)
+        columns = self.valuations.tocsc() if self.is_sparse else None
+        inside = held < self.houses
+        own = np.zeros(self.buyers)
+        rows = np.flatnonzero(inside)
+        own[rows] = (_entries(self.valuations, rows, held[rows]) if self.is_sparse
+                     else self.valuations[rows, held[rows]]) * scale
+        steps = 0
+        for house in houses.tolist():
+            while True:
+                floor = float(self.reserve[house]) * scale
+                if self.is_sparse:
+                    start, end = columns.indptr[house], columns.indptr[house + 1]
+                    bidders, values = columns.indices[start:end], columns.data[start:end] * scale
+                else:
+                    bidders, values = np.arange(self.buyers), self.valuations[:, house] * scale
+                current = held[bidders]
+                profits = np.where(current < self.houses, own[bidders] - prices[np.minimum(current, self.houses - 1)], 0.0)
+                offers = values - profits
+                if len(offers) == 0 or offers.max() <= floor:
+                    prices[house] = floor
+                    break
+                best = int(np.argmax(offers))
+                runner_up = np.partition(offers, -2)[-2] if len(offers) > 1 else -np.inf
+                prices[house] = max(floor, runner_up - epsilon)
+                buyer, previous = int(bidders[best]), int(current[best])
+                held[buyer], own[buyer] = house, values[best]
+                steps += 1
+                if previous >= self.houses or prices[previous] <= float(self.reserve[previous]) * scale:
+                    break
+                house = previous
+        return steps
+
+    def _switching(self, prices, held, epsilon):
+        #Settled buyers whose best choice pays more than epsilon above what they hold
+        settled = np.flatnonzero(held >= 0)
+        if len(settled) == 0:
+            return settled
+        scale = float(self._scale)
+        if self.is_sparse:
+            rows = self.valuations[settled]
+            lengths = np.diff(rows.indptr)
+            owner = np.repeat(np.arange(len(settled)), lengths)
+            payoffs = rows.data * scale - prices[rows.indices]
+            best = np.zeros(len(settled))
+            np.maximum.at(best, owner, payoffs)
+            own = np.zeros(len(settled))
+            house = held[settled]
+            inside = house < self.houses
+            own[inside] = _entries(rows, np.flatnonzero(inside), house[inside]) * scale - prices[house[inside]]
+        else:
+            best = np.empty(len(settled))
+            step = max(1, BLOCK_CELLS // max(self.houses, 1))
+            for start in range(0, len(settled), step):
+                best[start:start + step] = (self.valuations[settled[start:start + step]] * scale - prices).max(axis=1)
+            house = held[settled]
+            own = self.valuations[settled, house] * scale - prices[house]
+        return settled[own < best - epsilon]
+
+    def _clears(self, assignment, prices):
+        #Minimal prices clear the market when no unsold house is priced above its reserve
+        unsold = np.ones(self.houses, dtype=bool)
+        unsold[assignment[assignment >= 0]] = False
+        return bool(np.all(prices[unsold] == self.reserve[unsold]))
+
+    def _spread(self):
+        #Range of the valuations in price units
+        values = self.valuations.data if self.is_sparse else self.valuations
+        return float(values.max() - min(values.min(), 0)) * self._scale if values.size else 0.0
+
+    def _final(self):
+        #Final epsilon for the current buyer count, in the units of the stored prices
+        scale, final = _resolution(self.valuations, self.reserve, self.buyers, self.epsilon)
+        return final * self._scale / scale
+
+    def _bidder(self, prices):
+        if self.is_sparse:
+            return lambda bidders, epsilon: _sparse_bids(self.valuations, prices, bidders, epsilon, self._scale)
+        return lambda bidders, epsilon: _bids(self.valuations, prices, bidders, epsilon, self._scale)
+
+    def _row(self, row):
+        if not self.is_sparse:
+            row = np.asarray(row, dtype=self.valuations.dtype)
+            if row.shape != (self.houses,):
+                raise ValueError(f"Valuation row needs {self.houses} values")
+            return row
+        if isinstance(row, dict):
+            houses = np.fromiter(row.keys(), dtype=np.int64, count=len(row))
+            values = np.fromiter(row.values(), dtype=self.valuations.dtype, count=len(row))
+            return sparse.csr_matrix((values, (np.zeros(len(row), dtype=np.int64), houses)), shape=(1, self.houses))
+        return sparse.csr_matrix(np.asarray(row, dtype=self.valuations.dtype).reshape(1, -1))
@@ -0,0 +1,196 @@
+import hashlib
+import sys
+import weakref
+from collections import OrderedDict
+import numpy as np
+import networkx as nx
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import breadth_first_order, dijkstra
+from csr_graph import CSRGraph
+
+#Default memory cap of the shared cache
+DEFAULT_MAX_BYTES = 256 * 2**20
+
+class PathTreeCache:
+    """
+    LRU cache of single-source shortest path trees, capped by memory.
+    Entries remember their graph through a weak reference and a digest of its nodes, edges and
+    the weight the tree was built with (see graph_digest). A tree is dropped when the graph is gone
+    or its digest has changed, so edits of any kind invalidate it.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        """
+        Params:
+            max_bytes: memory cap for the cached trees
+        """
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        #(id(G), source, weight) -> (weak reference to G, digest, tree, size)
+        self._trees = OrderedDict()
+
+    def get(self, G, source, weight=None, digest=None):
+        """
+        Params:
+            G: graph object or CSRGraph
+            source: source node
+            weight: weight the tree was built with
+            digest: graph_digest(G, weight) when the caller already has it, computed otherwise
+        Returns:
+            the cached tree, or None
+        """
+        key = (id(G), source, weight)
+        entry = self._trees.get(key)
+        if entry is not None and (entry[0]() is not G or
+                                  entry[1] != (digest if digest is not None else graph_digest(G, weight))):
+            self._drop(key)
+            entry = None
+        if entry is None:
+            self.misses += 1
+            return None
+        self._trees.move_to_end(key)
+        self.hits += 1
+        return entry[2]
+
+    def put(self, G, source, weight, tree, digest=None):
+        """
+        Stores a tree, evicting the least recently used ones to stay under max_bytes
+        Params:
+            G: graph object or CSRGraph
+            source: source node
+            weight: weight the tree was built with
+            tree: tree from shortest_path_tree
+            digest: graph_digest(G, weight) when the caller already has it, computed otherwise
+        """
+        size = tree_bytes(tree)
+        if size > self.max_bytes:
+            return
+        key = (id(G), source, weight)
+        if key in self._trees:
+            self._drop(key)
+        while self._trees and self.bytes + size > self.max_bytes:
+            self._drop(next(iter(self._trees)))
+        self._trees[key] = (weakref.ref(G), digest if digest is not None else graph_digest(G, weight), tree, size)
+        self.bytes += size
+
+    def invalidate(self, G=None):
+        """
+        Drops the trees of one graph, or of every graph when G is None
+        Params:
+            G: graph object or CSRGraph
+        """
+        for key in list(self._trees):
+            if G is None or key[0] == id(G):
+                self._drop(key)
+
+    def __len__(self):
+        return len(self._trees)
+
+    def _drop(self, key):
+        self.bytes -= self._trees.pop(key)[3]
+
+#Cache shared by Algos.batch_shortest, Algos.partition invalidates it
+PATH_CACHE = PathTreeCache()
+
+def shortest_path_tree(G, source, weight=None):
+    """
+    Builds a single-source shortest path tree, BFS when weight is None and Dijkstra otherwise
+    Params:
+        G: graph object or CSRGraph
+        source: source node
+        weight: edge attribute name (or a networkx weight function for networkx graphs)
+    Returns:
+        tree: dict node -> parent for networkx graphs, int64 parent index array for CSR graphs
+    """
+    if isinstance(G, CSRGraph):
+        n = G.number_of_nodes()
+        if weight is None:
+            data = np.ones(len(G.targets))
+        elif weight in G.edge_attrs:
+            data = np.asarray(G.edge_attrs[weight], dtype=np.float64)
+        else:
+            raise ValueError(f"Graph has no numeric edge attribute '{weight}'")
+        matrix = csr_matrix((data, np.asarray(G.targets), np.asarray(G.offsets)), shape=(n, n))
+        s = G.index_of(source)
+        if weight is None:
+            _, parents = breadth_first_order(matrix, s, directed=True, return_predecessors=True)
+        else:
+            _, parents = dijkstra(matrix, directed=True, indices=s, return_predecessors=True)
+        parents = parents.astype(np.int64)
+        #scipy marks the source and unreachable nodes alike, make the source its own parent
+        parents[parents < 0] = -1
+        parents[s] = s
+        return parents
+
+    if weight is None:
+        tree = dict(nx.bfs_predecessors(G, source))
+    else:
+        predecessors, _ = nx.dijkstra_predecessor_and_distance(G, source, weight=weight)
+        tree = {node: parents[0] for node, parents in predecessors.items() if parents}
+    tree[source] = source
+    return tree
+
+def tree_path(G, tree, source, target):
+    """
+    Reads the path to target out of a tree built by shortest_path_tree
+    Params:
+        G: graph the tree was built on
+        tree: tree from shortest_path_tree
+        source, target: nodes
+    Returns:
+        path: list of nodes, or None if target is unreachable
+    """
+    if isinstance(tree, np.ndarray):
+        t = G.index_of(target)
+        if tree[t] < 0:
+            return None
+        path = [t]
+        while tree[path[-1]] != path[-1]:
+            path.append(int(tree[path[-1]]))
+        return G.node_ids[path[::-1]].tolist()
+
+    if target not in tree:
+        return None
+    path = [target]
+    while path[-1] != source:
+        path.append(tree[path[-1]])
+    return path[::-1]
+
+def tree_bytes(tree):
+    """
+    Memory the cache is charged for a tree
+    Params:
+        tree: tree from shortest_path_tree
+    Returns:
+        size in bytes
+    """
+    if isinstance(tree, np.ndarray):
+        return tree.nbytes
+    #Node objects belong to the graph, only the dict itself is extra
+    return sys.getsizeof(tree)
+
+def graph_digest(G, weight=None):
+    """
+    Digest of what a shortest path tree depends on: the nodes, the edges and the weight values.
+    Hashing reads the whole graph, so callers answering many queries compute it once.
+    Params:
+        G: graph object or CSRGraph
+        weight: edge attribute name, or a weight function (only its identity is hashed)
+    Returns:
+        hex digest
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(repr(weight if weight is None or isinstance(weight, str) else id(weight)).encode())
+    if isinstance(G, CSRGraph):
+        digest.update(np.ascontiguousarray(G.node_ids).tobytes())
+        digest.update(np.ascontiguousarray(G.offsets).tobytes())
+        digest.update(np.ascontiguousarray(G.targets).tobytes())
+        if isinstance(weight, str) and weight in G.edge_attrs:
+            digest.update(np.ascontiguousarray(G.edge_attrs[weight]).tobytes())
+        return digest.hexdigest()
+    digest.update(repr(list(G.nodes())).encode())
+    edges = G.edges(data=weight) if isinstance(weight, str) else G.edges()
+    digest.update(repr(list(edges)).encode())
+    return digest.hexdigest()
@@ -0,0 +1,249 @@
+"""
+Runs graph jobs without the menu. A job spec (JSON, or YAML when PyYAML is installed) lists jobs,
+each a list of steps calling GraphManager, GraphGenerator, Algos, Attributes, Analytics or Plot methods:
+
+    {"workers": 2,
+     "jobs": [{"name": "sbm",
+               "steps": [{"call": "GraphGenerator.generate_sbm",
+                          "kwargs": {"sizes": [50, 50], "probabilities": [0.2, 0.01], "seed": 1}},
+                         {"call": "Algos.partition", "kwargs": {"num_components": 2}},
+                         {"call": "Algos.partition_score", "as": "ari"},
+                         {"call": "GraphManager.save_graph", "kwargs": {"file_name": "sbm.txt"}}]},
+              {"name": "traffic",
+               "steps": [{"call": "GraphManager.read_digraph", "kwargs": {"file_name": "roads.txt"}},
+                         {"call": "Algos.nash_social", "as": ["nash", "social"],
+                          "kwargs": {"n": 1000, "source": 0, "destination": 3, "plot": false}},
+                         {"call": "Algos.nash_social_sweep", "as": "rows",
+                          "kwargs": {"ns": [250, 500, 1000], "source": 0, "destination": 3}}]}]}
+
+A step returning a graph makes it the job's graph G, which is passed to every later step that takes
+a G argument and does not set one. "as" names a result, or with a list of names unpacks a tuple
+result into them, and "$name" in args or kwargs refers to it ("$G" is the current graph). "$name.2"
+or "$name.key" picks an item of a result, so a market read by GraphGenerator.generate_market can
+feed Algos.perfect_matching:
+
+    {"call": "GraphGenerator.generate_market", "kwargs": {"file_name": "market.txt"}, "as": "m"},
+    {"call": "Algos.perfect_matching", "args": ["$m.0", "$m.1", "$m.2"], "as": ["assignment", "payoffs", "prices"]}
+
+ Graphs stay in memory between steps. Jobs run concurrently in a
+process pool, plots are rendered off screen and discarded, printed messages go to standard error,
+and every step is reported as a JSON line with its time and a summary of its result, followed by
+one line per job.
+Run from the SocialNetworkGraphs directory:
+    python pipeline.py jobs.json --workers 4 --output results.jsonl
+"""
+import argparse
+import contextlib
+import inspect
+import json
+import sys
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import matplotlib
+import numpy as np
+import networkx as nx
+from csr_graph import CSRGraph
+from graph_manager import GraphManager
+from graph_generator import GraphGenerator
+from algos import Algos
+from graph_attributes import Attributes
+from analytics import Analytics
+from plot import Plot
+
+#Classes whose public methods a step may call, Plot methods should be given a file_name
+CALLABLES = {'GraphManager': GraphManager, 'GraphGenerator': GraphGenerator, 'Algos': Algos,
+             'Attributes': Attributes, 'Analytics': Analytics, 'Plot': Plot}
+#Longest list, dict or array written out in full in a result summary
+SUMMARY_ITEMS = 20
+
+def load_spec(file_name):
+    """
+    Params:
+        file_name: .json, .yaml or .yml job spec
+    Returns:
+        spec: dict with a 'jobs' list and optionally 'workers'
+    """
+    with open(file_name, 'r') as file:
+        if file_name.endswith(('.yaml', '.yml')):
+            #Optional dependency, only needed for YAML specs
+            try:
+                import yaml
+            except ImportError as error:
+                raise ImportError("YAML job specs need PyYAML, use a JSON spec instead") from error
+            spec = yaml.safe_load(file)
+        else:
+            spec = json.load(file)
+    if isinstance(spec, list):
+        spec = {'jobs': spec}
+    if not isinstance(spec, dict) or not isinstance(spec.get('jobs'), list):
+        raise ValueError(f"Job spec '{file_name}' must hold a list of jobs")
+    for i, job in enumerate(spec['jobs']):
+        job.setdefault('name', f'job{i}')
+        for step in job.get('steps', []):
+            resolve_call(step['call'])
+    return spec
+
+def resolve_call(name):
+    """
+    Params:
+        name: 'Class.method' with Class one of CALLABLES
+    Returns:
+        the method
+    """
+    owner, _, method = name.partition('.')
+    if owner not in CALLABLES or not method or method.startswith('_') or not hasattr(CALLABLES[owner], method):
+        raise ValueError(f"Unknown step call: {name}")
+    return getattr(CALLABLES[owner], method)
+
+def run_job(job):
+    """
+    Runs the steps of one job in order, stopping at the first step that raises
+    Params:
+        job: dict with 'name' and 'steps'
+    Returns:
+        records: one dict per step run and a final one for the job
+    """
+    #Plots go to an off screen canvas, show() returns at once
+    matplotlib.use('Agg')
+    from matplotlib import pyplot as plt
+    values, records = {}, []
+    start = time.perf_counter()
+    status = 'ok'
+    for i, step in enumerate(job.get('steps', [])):
+        record = {'job': job['name'], 'step': i, 'call': step['call']}
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            method = resolve_call(step['call'])
+            args = [_resolve(value, values) for value in step.get('args', [])]
+            kwargs = {key: _resolve(value, values) for key, value in step.get('kwargs', {}).items()}
+            if 'G' in values and 'G' not in kwargs and _takes_graph(method, len(args)):
+                kwargs['G'] = values['G']
+            #Messages the methods print would break the JSON lines on standard output
+            with contextlib.redirect_stdout(sys.stderr):
+                result = method(*args, **kwargs)
+            if isinstance(step.get('as'), list):
+                if not isinstance(result, (tuple, list)) or len(result) != len(step['as']):
+                    raise ValueError(f"Cannot unpack the result of {step['call']} into {step['as']}")
+                values.update(zip(step['as'], result))
+            elif 'as' in step:
+                values[step['as']] = result
+        except Exception as error:
+            record['error'] = f"{type(error).__name__}: {error}"
+            record['traceback'] = traceback.format_exc(limit=3)
+            status = 'failed'
+        else:
+            if _is_graph(result):
+                values['G'] = result
+            record['result'] = summarize(result)
+        finally:
+            plt.close('all')
+        record['seconds'] = time.perf_counter() - wall
+        record['cpu_seconds'] = time.process_time() - cpu
+        records.append(record)
+        if status == 'failed':
+            break
+    records.append({'job': job['name'], 'status': status, 'steps': len(records),
+                    'seconds': time.perf_counter() - start})
+    return records
+
+def run_jobs(jobs, workers=None, output=sys.stdout):
+    """
+    Runs jobs, concurrently when workers > 1, writing each job's records as JSON lines as soon as it finishes
+    Params:
+        jobs: list of job dicts
+        workers: number of processes, None or 1 runs the jobs here one after the other
+        output: text stream the JSON lines are written to
+    Returns:
+        failed: number of jobs that stopped on an error
+    """
+    failed = 0
+    if workers and workers > 1 and len(jobs) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for future in as_completed([pool.submit(run_job, job) for job in jobs]):
+                failed += _write(future.result(), output)
+        return failed
+    for job in jobs:
+        failed += _write(run_job(job), output)
+    return failed
+
+def summarize(value):
+    """
+    JSON friendly summary of a step result: graphs become their sizes, long containers their length
+    Params:
+        value: anything a step returned
+    Returns:
+        value made of JSON types
+    """
+    if _is_graph(value):
+        return {'nodes': value.number_of_nodes(), 'edges': value.number_of_edges(), 'directed': value.is_directed()}
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist() if value.size <= SUMMARY_ITEMS else {'shape': list(value.shape), 'dtype': str(value.dtype)}
+    if isinstance(value, (list, tuple, set, frozenset)):
+        if len(value) > SUMMARY_ITEMS:
+            return {'length': len(value)}
+        return [summarize(item) for item in value]
+    if isinstance(value, dict):
+        if len(value) > SUMMARY_ITEMS:
+            return {'length': len(value)}
+        return {str(key): summarize(item) for key, item in value.items()}
+    return repr(value)[:200]
+
+def _resolve(value, values):
+    #"$name" refers to an earlier result and "$name.i.key" to an item of it, containers are resolved item by item
+    if isinstance(value, str) and value.startswith('$'):
+        name, *items = value[1:].split('.')
+        if name not in values:
+            raise KeyError(f"No earlier step result named '{name}'")
+        result = values[name]
+        for item in items:
+            try:
+                result = result[int(item)] if isinstance(result, (tuple, list, np.ndarray)) else result[item]
+            except (ValueError, IndexError, KeyError, TypeError) as error:
+                raise KeyError(f"'{value}' has no item '{item}'") from error
+        return result
+    if isinstance(value, list):
+        return [_resolve(item, values) for item in value]
+    if isinstance(value, dict):
+        return {key: _resolve(item, values) for key, item in value.items()}
+    return value
+
+def _takes_graph(method, positional):
+    #True when method has a G parameter that the positional arguments do not already fill
+    try:
+        parameters = list(inspect.signature(method).parameters)
+    except (TypeError, ValueError):
+        return False
+    return 'G' in parameters[positional:]
+
+def _is_graph(value):
+    return isinstance(value, (nx.Graph, CSRGraph))
+
+def _write(records, output):
+    for record in records:
+        output.write(json.dumps(record) + '\n')
+    output.flush()
+    return int(records[-1]['status'] == 'failed')
+
+def main():
+    parser = argparse.ArgumentParser(description="Runs graph jobs from a JSON or YAML spec")
+    parser.add_argument('spec', help='job spec file')
+    parser.add_argument('--workers', type=int, default=None, help="processes, overrides the spec's workers")
+    parser.add_argument('--output', default=None, help='JSON lines file, standard output by default')
+    args = parser.parse_args()
+
+    spec = load_spec(args.spec)
+    workers = args.workers if args.workers is not None else spec.get('workers')
+    if args.output:
+        with open(args.output, 'w') as output:
+            failed = run_jobs(spec['jobs'], workers, output)
+    else:
+        failed = run_jobs(spec['jobs'], workers)
+    sys.exit(1 if failed else 0)
+
+if __name__ == '__main__':
+    main()
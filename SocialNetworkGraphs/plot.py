@@ -1,144 +1,263 @@
-import networkx as nx
-from matplotlib import pyplot as plt
-import numpy as np
-
-class Plot:
-    
-    #Normal graph
-    @staticmethod
-    def plot_graph(G, shortest_path, plot_shortest, plot_cluster, plot_neighbor):
-        """
-        Creates the graph into a nx window
-        Params:
-            G: graph object
-            shortest_path: an nx object that dictates the shortest path to a node
-            plot_shortest: Boolean flag to plot shortest path
-            plot_cluster : Boolean flag to plot node sizes and colors based on cluster coefficents
-            plot_neighbor: Boolean flag to highlight neighborhood overlaps
-        Returns
-            None """
-        #Source: https://stackoverflow.com/questions/29797990/networkx-spring-layout-with-different-edge-values
-        initialpos = {1:(0,0), 2:(0,3), 3:(0,-1), 4:(5,5)}
-        #Seed allows us to keep the graph the same from each iteration
-        pos = nx.spring_layout(G, pos=initialpos, seed= 420, weight=None)
-        nx.draw(G, pos, with_labels=True, font_weight='bold')
-
-        #Cluster coefficients 
-        max_pixel = 1000
-        min_pixel = 100
-        if plot_cluster:
-            #Cluster function from nx
-            cluster_coefficients = nx.clustering(G)
-            cluster_min, cluster_max = min(cluster_coefficients.values()), max(cluster_coefficients.values())
-
-            for node, cc in cluster_coefficients.items():
-                pv = (cc - cluster_min) / (cluster_max - cluster_min) if cluster_max > cluster_min else 0
-                nx.draw_networkx_nodes(G, pos, nodelist=[node], node_size=min_pixel + pv * (max_pixel - min_pixel), node_color=[(pv, (1 - pv), 0)], alpha=0.8)
-
-        #Shortest path
-        if shortest_path and plot_shortest:
-            path_edges = list(zip(shortest_path, shortest_path[1:]))
-            nx.draw_networkx_edges(G, pos, edgelist=path_edges, edge_color='r', width=1, style='dotted')
-        
-        #Neighbor overlaps
-        if plot_neighbor:
-            for u,v in G.edges():
-                common_neighbors = len(list(nx.common_neighbors(G,u,v)))
-                if common_neighbors > 0:
-                    nx.draw_networkx_edges(G, pos, edgelist=[(u, v)], edge_color='y', width=1 + common_neighbors *0.8, alpha = 0.5)
-        plt.show()
-
-    #Digraph
-    @staticmethod
-    def plot_digraph(G):
-        """
-        Plots the graph
-        Param:
-            G: graph
-        Returns: 
-            None """
-        pos = nx.spring_layout(G, weight=None)
-        #Nodes
-        nx.draw_networkx_nodes(G,pos, node_size = 600, node_color = 'lightblue')
-        #Edges
-        nx.draw_networkx_edges(G, pos, edge_color='black', arrows=True, arrowsize=20)
-        #Labels
-        nx.draw_networkx_labels(G, pos)
-        #Create the labels to show the weights and draw
-        edge_labels = {(u, v): '{}x + {}'.format(data['weight'][0], data['weight'][1]) for u, v, data in G.edges(data=True)}
-        nx.draw_networkx_edge_labels(G, pos, edge_labels=edge_labels)
-        
-        plt.show()
-
-    #Prefered seller graph
-    def plot_preferred_seller_graph(G,n):
-        """
-        Plots the prefered seller graph 
-        Params:
-            n: number of buyer sellers
-            G: graph object
-        Returns: 
-            None
-        """
-        plt.figure(figsize=(10, 8))
-
-        #Manual positioning of nodes to align them side by side
-        pos = {}
-        buyer_y_positions = [1 - (i / (n - 1)) for i in range(n)] if n > 1 else [0.5]
-        seller_y_positions = [1 - (i / (n - 1)) for i in range(n)] if n > 1 else [0.5]
-        
-        for i, node in enumerate(G.nodes):
-            if G.nodes[node]['bipartite'] == 0:  # Buyer
-                pos[node] = (0, buyer_y_positions.pop(0))
-            else:  # Seller
-                pos[node] = (1, seller_y_positions.pop(0))
-
-        #Classifying and drawing nodes
-        buyer_nodes = [node for node in G.nodes if G.nodes[node]['bipartite'] == 0]
-        seller_nodes = [node for node in G.nodes if G.nodes[node]['bipartite'] == 1]
-
-        node_labels = {}
-        for node in G.nodes:
-            if node in buyer_nodes:
-                node_labels[node] = f"B{node + 1}"
-            else:
-                node_labels[node] = f"S{node - len(buyer_nodes) + 1} \nPrice: {G.nodes[node]['price']}"
-
-        nx.draw_networkx_nodes(G, pos, nodelist=buyer_nodes, node_color='blue', label='Buyers', node_size=2500)
-        nx.draw_networkx_nodes(G, pos, nodelist=seller_nodes, node_color='green', label='Sellers', node_size=2500)
-
-        # Drawing edges and labels
-        nx.draw_networkx_edges(G, pos)
-        nx.draw_networkx_labels(G, pos, labels=node_labels)
-        edge_labels = nx.get_edge_attributes(G, 'weight')
-        nx.draw_networkx_edge_labels(G, pos, edge_labels=edge_labels,label_pos=0.7)
-
-        plt.title("Preferred Seller Graph")
-        plt.axis('off')
-        plt.show()
-
-    #Bipartite plot
-    @staticmethod
-    def plot_bipartite(G):
-        """
-        Plots a bipartite graph.
-        Params:
-            G: bipartite graph
-        Returns:   
-            None
-        """
-        # Check if the graph is bipartite
-        if not nx.is_bipartite(G):
-            raise ValueError("The graph is not bipartite.")
-        
-        # Get the two node sets
-        nodes_A, nodes_B = nx.bipartite.sets(G)
-        
-        # Define positions using the bipartite layout
-        pos = nx.bipartite_layout(G, nodes_A)
-
-        # Draw the nodes and edges
-        nx.draw(G, pos, with_labels=True, node_color=['blue' if node in nodes_A else 'green' for node in G.nodes()], edge_color='gray')
-        
-        plt.title("Bipartite Graph")
-        plt.show()
\ No newline at end of file
+import networkx as nx
+from matplotlib import pyplot as plt
+from matplotlib.collections import LineCollection
+from matplotlib.figure import Figure
+import numpy as np
+from scipy import sparse
+from analytics import Analytics
+from csr_graph import CSRGraph, as_networkx
+from instrumentation import instrumented
+from layout import LAYOUT_CACHE, adjacency_matrix, force_layout
+
+#Graphs with more nodes than this are drawn with the multilevel layout and collections
+LARGE_GRAPH = 2000
+
+class Plot:
+    
+    #Normal graph
+    @staticmethod
+    @instrumented
+    def plot_graph(G, shortest_path, plot_shortest, plot_cluster, plot_neighbor, large=None, file_name=None, seed=420,
+                   analytics=None):
+        """
+        Creates the graph into a nx window
+        Params:
+            G: graph object
+            shortest_path: an nx object that dictates the shortest path to a node
+            plot_shortest: Boolean flag to plot shortest path
+            plot_cluster : Boolean flag to plot node sizes and colors based on cluster coefficents
+            plot_neighbor: Boolean flag to highlight neighborhood overlaps
+            large: Boolean flag to force (True) or skip (False) the large graph mode, by default
+                   graphs with more than LARGE_GRAPH nodes use it
+            file_name: PNG file to render to without opening a window
+            seed: layout seed
+            analytics: Neighborhood of G from Analytics.neighborhood, computed here when clusters or
+                       overlaps are plotted and it is not given
+        Returns
+            None """
+        if large is None:
+            large = G.number_of_nodes() > LARGE_GRAPH
+        if analytics is None and (plot_cluster or plot_neighbor):
+            analytics = Analytics.neighborhood(G)
+        figure, axes = Plot._canvas(file_name, (12, 12) if large else None)
+        if large:
+            Plot._plot_large_graph(axes, G, shortest_path, plot_shortest, plot_cluster, plot_neighbor, seed, analytics)
+            Plot._finish(figure, file_name)
+            return
+
+        G = as_networkx(G)
+        #Source: https://stackoverflow.com/questions/29797990/networkx-spring-layout-with-different-edge-values
+        initialpos = {1:(0,0), 2:(0,3), 3:(0,-1), 4:(5,5)}
+        #Seed allows us to keep the graph the same from each iteration, the cache skips the layout on repeated plots
+        pos = dict(zip(*LAYOUT_CACHE.layout(G, 'spring', seed, pos=initialpos, weight=None)))
+        nx.draw(G, pos, ax=axes, with_labels=True, font_weight='bold')
+
+        #Cluster coefficients 
+        max_pixel = 1000
+        min_pixel = 100
+        if plot_cluster:
+            #Coefficients of all nodes come from the analytics, drawn in one call
+            pv = Plot._scaled(analytics.clustering)
+            nx.draw_networkx_nodes(G, pos, ax=axes, nodelist=analytics.nodes, node_size=min_pixel + pv * (max_pixel - min_pixel),
+                                   node_color=np.column_stack([pv, 1 - pv, np.zeros(len(pv))]), alpha=0.8)
+
+        #Shortest path
+        if shortest_path and plot_shortest:
+            path_edges = list(zip(shortest_path, shortest_path[1:]))
+            nx.draw_networkx_edges(G, pos, ax=axes, edgelist=path_edges, edge_color='r', width=1, style='dotted')
+        
+        #Neighbor overlaps
+        if plot_neighbor:
+            overlapping = np.flatnonzero(analytics.common)
+            if len(overlapping):
+                nodes = analytics.nodes
+                edges = [(nodes[u], nodes[v]) for u, v in zip(analytics.sources[overlapping].tolist(),
+                                                                analytics.targets[overlapping].tolist())]
+                nx.draw_networkx_edges(G, pos, ax=axes, edgelist=edges, edge_color='y',
+                                       width=1 + analytics.common[overlapping] * 0.8, alpha=0.5)
+        Plot._finish(figure, file_name)
+
+    @staticmethod
+    def _plot_large_graph(axes, G, shortest_path, plot_shortest, plot_cluster, plot_neighbor, seed, analytics=None):
+        #Same elements as plot_graph, but one collection per element instead of one artist per node or
+        #edge, and the multilevel layout instead of spring_layout. Labels are left out
+        if not isinstance(G, CSRGraph):
+            G = as_networkx(G)
+        nodes, positions = force_layout(G, seed=seed)
+        if analytics is not None:
+            sources, targets = analytics.sources, analytics.targets
+        else:
+            upper = sparse.triu(adjacency_matrix(G)[1], k=1).tocoo()
+            sources, targets = upper.row, upper.col
+        axes.add_collection(LineCollection(positions[np.column_stack([sources, targets])],
+                                           colors='black', linewidths=0.2, alpha=0.3))
+
+        #Cluster coefficients
+        max_pixel = 20
+        min_pixel = 2
+        if plot_cluster:
+            pv = Plot._scaled(analytics.clustering)
+            axes.scatter(positions[:, 0], positions[:, 1], s=min_pixel + pv * (max_pixel - min_pixel),
+                         c=np.column_stack([pv, 1 - pv, np.zeros(len(nodes))]), alpha=0.8, linewidths=0)
+        else:
+            axes.scatter(positions[:, 0], positions[:, 1], s=min_pixel, c='#1f78b4', linewidths=0)
+
+        #Shortest path
+        if shortest_path and plot_shortest:
+            index = {node: i for i, node in enumerate(nodes)}
+            path = np.array([index[node] for node in shortest_path])
+            axes.add_collection(LineCollection(positions[np.column_stack([path[:-1], path[1:]])],
+                                               colors='r', linewidths=1, linestyles='dotted'))
+
+        #Neighbor overlaps, edges without common neighbors are left out
+        if plot_neighbor:
+            overlapping = np.flatnonzero(analytics.common)
+            axes.add_collection(LineCollection(positions[np.column_stack([sources[overlapping], targets[overlapping]])],
+                                               colors='y', linewidths=1 + analytics.common[overlapping] * 0.8, alpha=0.5))
+        axes.autoscale_view()
+        axes.set_aspect('equal')
+        axes.set_axis_off()
+
+    @staticmethod
+    def _scaled(values):
+        #Values mapped onto [0, 1], all zeros when they are constant
+        low, high = (values.min(), values.max()) if len(values) else (0, 0)
+        return (values - low) / (high - low) if high > low else np.zeros(len(values))
+
+    @staticmethod
+    def _canvas(file_name, figsize=None):
+        #A figure detached from pyplot renders headless to file, otherwise draw on a pyplot window
+        if file_name:
+            figure = Figure(figsize=figsize)
+            return figure, figure.subplots()
+        figure = plt.figure(figsize=figsize)
+        return figure, figure.gca()
+
+    @staticmethod
+    def _finish(figure, file_name):
+        if file_name:
+            figure.savefig(file_name, dpi=150)
+            print(f"Plot saved to {file_name}")
+        else:
+            plt.show()
+
+    #Digraph
+    @staticmethod
+    @instrumented
+    def plot_digraph(G):
+        """
+        Plots the graph
+        Param:
+            G: graph
+        Returns: 
+            None """
+        G = as_networkx(G)
+        pos = dict(zip(*LAYOUT_CACHE.layout(G, 'spring', weight=None)))
+        #Nodes
+        nx.draw_networkx_nodes(G,pos, node_size = 600, node_color = 'lightblue')
+        #Edges
+        nx.draw_networkx_edges(G, pos, edge_color='black', arrows=True, arrowsize=20)
+        #Labels
+        nx.draw_networkx_labels(G, pos)
+        #Create the labels to show the weights and draw
+        edge_labels = {(u, v): '{}x + {}'.format(data['weight'][0], data['weight'][1]) for u, v, data in G.edges(data=True)}
+        nx.draw_networkx_edge_labels(G, pos, edge_labels=edge_labels)
+        
+        plt.show()
+
+    #Prefered seller graph
+    @instrumented
+    def plot_preferred_seller_graph(G,n):
+        """
+        Plots the prefered seller graph 
+        Params:
+            n: number of buyers
+            G: graph object from Algos.preferred_seller_graph
+        Returns: 
+            None
+        """
+        G = as_networkx(G)
+        plt.figure(figsize=(10, 8))
+
+        #Classifying nodes, a sparse market can have more sellers than buyers
+        buyer_nodes = [node for node in G.nodes if G.nodes[node]['bipartite'] == 0]
+        seller_nodes = [node for node in G.nodes if G.nodes[node]['bipartite'] == 1]
+
+        #Manual positioning of nodes to align them side by side, each column spread over its own count
+        column = lambda count: [1 - (i / (count - 1)) for i in range(count)] if count > 1 else [0.5]
+        pos = {node: (0, y) for node, y in zip(buyer_nodes, column(len(buyer_nodes)))}
+        pos.update({node: (1, y) for node, y in zip(seller_nodes, column(len(seller_nodes)))})
+
+        node_labels = {}
+        for node in G.nodes:
+            if node in buyer_nodes:
+                node_labels[node] = f"B{node + 1}"
+            else:
+                node_labels[node] = f"S{node - len(buyer_nodes) + 1} \nPrice: {G.nodes[node]['price']}"
+
+        nx.draw_networkx_nodes(G, pos, nodelist=buyer_nodes, node_color='blue', label='Buyers', node_size=2500)
+        nx.draw_networkx_nodes(G, pos, nodelist=seller_nodes, node_color='green', label='Sellers', node_size=2500)
+
+        # Drawing edges and labels, preferred sellers a buyer was not assigned are dashed
+        matched = nx.get_edge_attributes(G, 'matched')
+        nx.draw_networkx_edges(G, pos, edgelist=[edge for edge in G.edges if matched.get(edge, True)])
+        nx.draw_networkx_edges(G, pos, edgelist=[edge for edge in G.edges if not matched.get(edge, True)], style='dashed')
+        nx.draw_networkx_labels(G, pos, labels=node_labels)
+        edge_labels = {edge: label for edge, label in nx.get_edge_attributes(G, 'weight').items() if matched.get(edge, True)}
+        nx.draw_networkx_edge_labels(G, pos, edge_labels=edge_labels,label_pos=0.7)
+
+        plt.title("Preferred Seller Graph")
+        plt.axis('off')
+        plt.show()
+
+    #Bipartite plot
+    @staticmethod
+    @instrumented
+    def plot_bipartite(G):
+        """
+        Plots a bipartite graph.
+        Params:
+            G: bipartite graph
+        Returns:   
+            None
+        """
+        G = as_networkx(G)
+        # Check if the graph is bipartite
+        if not nx.is_bipartite(G):
+            raise ValueError("The graph is not bipartite.")
+        
+        # Get the two node sets
+        nodes_A, nodes_B = nx.bipartite.sets(G)
+        
+        # Define positions using the bipartite layout
+        pos = dict(zip(*LAYOUT_CACHE.layout(G, 'bipartite')))
+
+        # Draw the nodes and edges
+        nx.draw(G, pos, with_labels=True, node_color=['blue' if node in nodes_A else 'green' for node in G.nodes()], edge_color='gray')
+        
+        plt.title("Bipartite Graph")
+        plt.show()
+
+    #Price of anarchy sweep
+    @staticmethod
+    @instrumented
+    def plot_price_of_anarchy(rows):
+        """
+        Plots the rows of Algos.nash_social_sweep
+        Params:
+            rows: list of dicts with n, nash, social and ratio
+        Returns:
+            None
+        """
+        ns = [row['n'] for row in rows]
+        figure, (costs, ratios) = plt.subplots(1, 2, figsize=(12, 5))
+        costs.plot(ns, [row['nash'] for row in rows], color='blue', label='Nash Equilibrium')
+        costs.plot(ns, [row['social'] for row in rows], color='red', label='Social Optimum')
+        costs.set_xlabel('Drivers')
+        costs.set_ylabel('Total Travel Time')
+        costs.legend()
+        ratios.plot(ns, [row['ratio'] for row in rows], color='black')
+        ratios.set_xlabel('Drivers')
+        ratios.set_ylabel('Price of Anarchy')
+        figure.suptitle('Nash Equilibrium vs Social Optimum')
+        plt.show()
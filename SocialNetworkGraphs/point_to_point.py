@@ -0,0 +1,305 @@
+import heapq
+import itertools
+from collections import deque
+from numbers import Number
+import numpy as np
+import networkx as nx
+from csr_graph import CSRGraph, as_networkx, node_id_array
+
+#Suffix of the landmark table written next to a saved graph
+LANDMARK_SUFFIX = '.landmarks.npz'
+
+def bfs_path(G, source, target):
+    """
+    Plain breadth first search that stops at target, the baseline the other searches are measured against
+    Params:
+        G: graph object or CSRGraph
+        source, target: nodes
+    Returns:
+        path: list of nodes or None
+        expanded: number of nodes whose neighbors were scanned
+    """
+    successors = _neighbors(G, reverse=False)
+    parents = {source: None}
+    queue = deque([source])
+    expanded = 0
+    while queue:
+        node = queue.popleft()
+        if node == target:
+            return _walk(parents, target)[::-1], expanded
+        expanded += 1
+        for neighbor in successors(node):
+            if neighbor not in parents:
+                parents[neighbor] = node
+                queue.append(neighbor)
+    return None, expanded
+
+def bidirectional_bfs(G, source, target):
+    """
+    Breadth first search from both ends, always growing the smaller frontier by one level
+    Params:
+        G: graph object or CSRGraph
+        source, target: nodes
+    Returns:
+        path: list of nodes or None
+        expanded: number of nodes whose neighbors were scanned
+    """
+    if source == target:
+        return [source], 0
+    forward, backward = _neighbors(G, reverse=False), _neighbors(G, reverse=True)
+    parents = {source: None}
+    children = {target: None}
+    forward_frontier, backward_frontier = [source], [target]
+    expanded = 0
+
+    while forward_frontier and backward_frontier:
+        grow_forward = len(forward_frontier) <= len(backward_frontier)
+        frontier = forward_frontier if grow_forward else backward_frontier
+        seen, other = (parents, children) if grow_forward else (children, parents)
+        neighbors = forward if grow_forward else backward
+
+        next_frontier = []
+        for node in frontier:
+            expanded += 1
+            for neighbor in neighbors(node):
+                if neighbor in seen:
+                    continue
+                seen[neighbor] = node
+                if neighbor in other:
+                    #Frontiers met: source..neighbor from parents, neighbor..target from children
+                    return _walk(parents, neighbor)[::-1] + _walk(children, neighbor)[1:], expanded
+                next_frontier.append(neighbor)
+
+        if grow_forward:
+            forward_frontier = next_frontier
+        else:
+            backward_frontier = next_frontier
+    return None, expanded
+
+def astar_path(G, source, target, weight='weight', heuristic=None):
+    """
+    A* search, Dijkstra when no heuristic is given
+    Params:
+        G: graph object
+        source, target: nodes
+        weight: edge attribute name or function (u, v, data) -> cost, (a, b) weights cost a+b
+        heuristic: function node -> lower bound on the distance to target
+    Returns:
+        path: list of nodes or None
+        expanded: number of nodes settled
+    """
+    G = as_networkx(G)
+    cost = _weight_function(weight)
+    h = heuristic or (lambda node: 0)
+    counter = itertools.count()
+    heap = [(h(source), next(counter), source, 0, None)]
+    parents = {}
+    best = {source: 0}
+    expanded = 0
+
+    while heap:
+        _, _, node, distance, parent = heapq.heappop(heap)
+        if node in parents:
+            continue
+        parents[node] = parent
+        if node == target:
+            return _walk(parents, target)[::-1], expanded
+        expanded += 1
+        for neighbor, data in G.adj[node].items():
+            if neighbor in parents:
+                continue
+            candidate = distance + cost(node, neighbor, data)
+            if candidate < best.get(neighbor, float('inf')):
+                best[neighbor] = candidate
+                heapq.heappush(heap, (candidate + h(neighbor), next(counter), neighbor, candidate, node))
+    return None, expanded
+
+class Landmarks:
+    """
+    Landmark distance tables for the ALT (A*, landmarks, triangle inequality) heuristic.
+    For each landmark L the tables hold d(L, v) and, for digraphs, d(v, L); the triangle
+    inequality turns them into lower bounds on d(v, t) for any pair.
+    """
+
+    def __init__(self, node_ids, landmarks, from_landmark, to_landmark=None, fingerprint=None, weight='weight'):
+        """
+        Params:
+            node_ids: array of node ids, row i of the tables belongs to node_ids[i]
+            landmarks: array of landmark node ids
+            from_landmark: n x k array of d(L, v)
+            to_landmark: n x k array of d(v, L), None for undirected graphs
+            fingerprint: graph_digest of the graph and weight the tables were built on
+            weight: edge attribute name the distances were measured with, None for a weight function
+        """
+        self.node_ids = node_ids
+        self.landmarks = landmarks
+        self.from_landmark = from_landmark
+        self.to_landmark = to_landmark
+        self.fingerprint = fingerprint
+        self.weight = weight
+        self._index = {node: i for i, node in enumerate(node_ids.tolist())}
+
+    @classmethod
+    def build(cls, G, k=8, weight='weight', seed=None):
+        """
+        Picks k landmarks by farthest point selection and runs Dijkstra from (and to) each of them
+        Params:
+            G: graph object or CSRGraph
+            k: number of landmarks
+            weight: edge attribute name or function (u, v, data) -> cost, (a, b) weights cost a+b
+            seed: seed for the first landmark
+        Returns:
+            Landmarks
+        """
+        G = as_networkx(G)
+        nodes = list(G.nodes())
+        index = {node: i for i, node in enumerate(nodes)}
+        rng = np.random.default_rng(seed)
+        cost = _weight_function(weight)
+        reverse = G.reverse(copy=False) if G.is_directed() else None
+
+        def distances(graph, landmark):
+            column = np.full(len(nodes), np.inf)
+            for node, distance in nx.single_source_dijkstra_path_length(graph, landmark, weight=cost).items():
+                column[index[node]] = distance
+            return column
+
+        chosen, from_columns, to_columns = [], [], []
+        #Distance from the nearest chosen landmark, the next landmark is the node farthest from all of them
+        nearest = np.full(len(nodes), np.inf)
+        landmark = nodes[rng.integers(len(nodes))]
+        for _ in range(min(k, len(nodes))):
+            chosen.append(landmark)
+            from_columns.append(distances(G, landmark))
+            if reverse is not None:
+                to_columns.append(distances(reverse, landmark))
+            nearest = np.minimum(nearest, from_columns[-1])
+            reachable = np.where(np.isfinite(nearest), nearest, -1)
+            landmark = nodes[int(np.argmax(reachable))]
+            if landmark in chosen:
+                #Every reachable node is already a landmark, jump to an unreached one if any
+                unreached = np.flatnonzero(~np.isfinite(nearest))
+                if len(unreached) == 0:
+                    break
+                landmark = nodes[int(unreached[0])]
+
+        #path_cache loads scipy, which the menu only imports once an algorithm needs it
+        from path_cache import graph_digest
+        to_landmark = np.column_stack(to_columns) if to_columns else None
+        return cls(node_id_array(nodes), node_id_array(chosen), np.column_stack(from_columns), to_landmark,
+                   graph_digest(G, weight), weight if isinstance(weight, str) else None)
+
+    def heuristic(self, target):
+        """
+        Lower bounds for every node are computed at once with NumPy, the search then only does lookups
+        Params:
+            target: target node
+        Returns:
+            function node -> lower bound on d(node, target)
+        """
+        t = self._index[target]
+        with np.errstate(invalid='ignore'):
+            if self.to_landmark is None:
+                bounds = np.abs(self.from_landmark[t] - self.from_landmark)
+            else:
+                bounds = np.concatenate([self.from_landmark[t] - self.from_landmark,
+                                         self.to_landmark - self.to_landmark[t]], axis=1)
+        #inf - inf means neither end reaches that landmark, it gives no bound
+        bounds = np.where(np.isnan(bounds), 0.0, bounds)
+        lower = np.maximum(bounds.max(axis=1), 0.0).tolist()
+        index = self._index
+        return lambda node: lower[index[node]]
+
+    def matches(self, G, weight='weight'):
+        """
+        Params:
+            G: graph object or CSRGraph
+            weight: edge attribute name or function the search will use
+        Returns:
+            True if the tables were built on G's nodes, edges and weight values, with the same weight.
+            Tables built with a weight function only match in the process that built them.
+        """
+        from path_cache import graph_digest
+        if isinstance(weight, str) and weight != self.weight:
+            return False
+        return self.fingerprint == graph_digest(as_networkx(G), weight)
+
+    def save(self, file_name):
+        """
+        Params:
+            file_name: .npz file name
+        """
+        arrays = {'node_ids': self.node_ids, 'landmarks': self.landmarks,
+                  'from_landmark': self.from_landmark, 'fingerprint': np.array(str(self.fingerprint)),
+                  'weight': np.array('' if self.weight is None else self.weight)}
+        if self.to_landmark is not None:
+            arrays['to_landmark'] = self.to_landmark
+        with open(file_name, 'wb') as file:
+            np.savez(file, **arrays)
+
+    @classmethod
+    def load(cls, file_name):
+        """
+        Params:
+            file_name: .npz file written by save
+        Returns:
+            Landmarks
+        """
+        with np.load(file_name) as data:
+            to_landmark = data['to_landmark'] if 'to_landmark' in data else None
+            #Tables saved before the digest was stored keep a (nodes, edges) pair, which never matches
+            fingerprint = data['fingerprint'].tolist()
+            weight = str(data['weight']) if 'weight' in data else None
+            return cls(data['node_ids'], data['landmarks'], data['from_landmark'], to_landmark,
+                       fingerprint if isinstance(fingerprint, str) else None, weight or None)
+
+def alt_path(G, source, target, landmarks, weight='weight'):
+    """
+    A* guided by landmark lower bounds
+    Params:
+        G: graph object or CSRGraph
+        source, target: nodes
+        landmarks: Landmarks built on G
+        weight: edge attribute name or function (u, v, data) -> cost, (a, b) weights cost a+b
+    Returns:
+        path: list of nodes or None
+        expanded: number of nodes settled
+    """
+    return astar_path(G, source, target, weight, landmarks.heuristic(target))
+
+def landmark_file(file_name):
+    """
+    Returns:
+        name of the landmark table stored next to a graph file
+    """
+    return file_name + LANDMARK_SUFFIX
+
+def _neighbors(G, reverse):
+    #Neighbor iterator: CSR arrays for undirected CSR graphs, networkx adjacency otherwise
+    if isinstance(G, CSRGraph) and not G.is_directed():
+        return G.neighbors
+    G = as_networkx(G)
+    if reverse and G.is_directed():
+        return G.predecessors
+    return G.adj.__getitem__
+
+def _weight_function(weight):
+    if callable(weight):
+        return weight
+
+    def cost(u, v, data):
+        value = data.get(weight, 1)
+        if isinstance(value, (tuple, list)):
+            #(a, b) weights of read_digraph graphs are travel times a*x+b, the cost is one driver's
+            a, b = value
+            return a + b
+        if not isinstance(value, Number):
+            raise ValueError(f"Edge ({u}, {v}) has a non numeric '{weight}' weight: {value!r}")
+        return value
+    return cost
+
+def _walk(links, node):
+    path = [node]
+    while links[path[-1]] is not None:
+        path.append(links[path[-1]])
+    return path
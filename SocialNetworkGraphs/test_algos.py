@@ -0,0 +1,42 @@
+import networkx as nx
+from algos import Algos
+from csr_graph import CSRGraph
+
+def _components(G):
+    return sorted(sorted(component) for component in nx.connected_components(G))
+
+def _planted(seed=4):
+    #Three dense blocks joined by a few edges, so each cut has a clear answer
+    return nx.stochastic_block_model([12, 12, 12], [[0.6, 0.02, 0.02], [0.02, 0.6, 0.02], [0.02, 0.02, 0.6]],
+                                     seed=seed)
+
+def test_dendrogram_reuse_gives_the_same_partition():
+    for num_components in (2, 3, 5):
+        fresh = _planted()
+        dendrogram = Algos.partition(fresh, num_components)
+
+        reused = _planted()
+        Algos.partition(reused, num_components, dendrogram=Algos.girvan_newman(_planted()))
+        assert _components(reused) == _components(fresh)
+
+def test_dendrogram_reuse_on_a_csr_graph():
+    dendrogram = Algos.girvan_newman(_planted())
+    expected = _planted()
+    Algos.cut_dendrogram(expected, dendrogram, 3)
+
+    G = CSRGraph.from_networkx(_planted())
+    Algos.partition(G, 3, dendrogram=dendrogram)
+    assert _components(G.to_networkx()) == _components(expected)
+    #The arrays follow the edges removed from the networkx view
+    assert G.number_of_edges() == expected.number_of_edges()
+
+def test_cut_dendrogram_continues_from_a_partitioned_graph():
+    dendrogram = Algos.girvan_newman(_planted())
+    G = _planted()
+    Algos.cut_dendrogram(G, dendrogram, 2)
+    Algos.cut_dendrogram(G, dendrogram, 3)
+
+    expected = _planted()
+    Algos.cut_dendrogram(expected, dendrogram, 3)
+    assert _components(G) == _components(expected)
+    assert nx.number_connected_components(G) >= 3
@@ -0,0 +1,62 @@
+import networkx as nx
+import numpy as np
+from csr_graph import CSRGraph
+
+def _same_graph(G, H):
+    #Same nodes, edges and attributes, whatever the insertion order
+    assert G.is_directed() == H.is_directed()
+    assert sorted(G.nodes(data=True)) == sorted(H.nodes(data=True))
+    edges = lambda graph: sorted((tuple(sorted((u, v))) if not graph.is_directed() else (u, v), sorted(data.items()))
+                                 for u, v, data in graph.edges(data=True))
+    assert edges(G) == edges(H)
+
+def _karate():
+    G = nx.karate_club_graph()
+    for node in G:
+        G.nodes[node]['size'] = node % 3
+    return G
+
+def _roads():
+    #Directed graph with (a, b) weights, as read_digraph builds it
+    G = nx.DiGraph()
+    G.add_edge(0, 1, weight=(1, 0))
+    G.add_edge(1, 3, weight=(0, 45))
+    G.add_edge(0, 2, weight=(0, 45))
+    G.add_edge(2, 3, weight=(1, 0))
+    G.add_edge(1, 2, weight=(0, 0))
+    return G
+
+def test_networkx_round_trip():
+    for G in (_karate(), _roads()):
+        C = CSRGraph.from_networkx(G)
+        assert C.number_of_nodes() == G.number_of_nodes()
+        assert C.number_of_edges() == G.number_of_edges()
+        _same_graph(C.to_networkx(), G)
+
+def test_from_edges_merges_duplicates_and_mirrors_undirected_edges():
+    C = CSRGraph.from_edges(4, [0, 1, 1, 2, 0], [1, 2, 2, 3, 1], edge_attrs={'w': np.array([1, 2, 3, 4, 5])})
+    assert C.number_of_edges() == 3
+    assert C.has_edge(1, 0) and C.has_edge(3, 2)
+    #The last copy of a repeated edge wins
+    assert C[0][1]['w'] == 5 and C[2][1]['w'] == 3
+    assert sorted(C.neighbors(1)) == [0, 2]
+
+def test_binary_round_trip(tmp_path):
+    for name, G in (('karate', _karate()), ('roads', _roads())):
+        C = CSRGraph.from_networkx(G)
+        C.save(tmp_path / name)
+        for mmap in (True, False):
+            loaded = CSRGraph.load(tmp_path / name, mmap=mmap)
+            np.testing.assert_array_equal(loaded.offsets, C.offsets)
+            np.testing.assert_array_equal(loaded.targets, C.targets)
+            _same_graph(loaded.to_networkx(), G)
+
+def test_refresh_follows_edits_of_the_networkx_view():
+    C = CSRGraph.from_networkx(_karate())
+    view = C.to_networkx()
+    view.remove_edge(0, 1)
+    nx.set_node_attributes(view, 'red', 'color')
+    C.refresh()
+    assert not C.has_edge(0, 1)
+    assert C.number_of_edges() == view.number_of_edges()
+    assert set(C.node_attrs['color'].tolist()) == {'red'}
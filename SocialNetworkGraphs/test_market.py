@@ -0,0 +1,92 @@
+import numpy as np
+import pytest
+from scipy import sparse
+from market import Market, clear_market, constricted_set, preferred_sellers
+
+def _total_value(valuations, assignment):
+    #Value of an assignment; ties may pick different houses but never a different total
+    valuations = sparse.csr_matrix(valuations) if sparse.issparse(valuations) else np.asarray(valuations)
+    rows = np.flatnonzero(assignment >= 0)
+    return float(valuations[rows, assignment[rows]].sum())
+
+def _assert_clears_like_cold(market):
+    #The warm started market must agree with clearing its valuations from scratch
+    assignment, payoffs, prices = clear_market(market.valuations, market.reserve)
+    np.testing.assert_allclose(market.prices, prices)
+    np.testing.assert_allclose(market.payoffs, payoffs)
+    assert _total_value(market.valuations, market.assignment) == pytest.approx(_total_value(market.valuations, assignment))
+
+def test_dense_market_follows_every_delta():
+    rng = np.random.default_rng(13)
+    market = Market(rng.integers(0, 50, size=(6, 9)))
+    _assert_clears_like_cold(market)
+
+    market.add_buyer(rng.integers(0, 50, size=9))
+    market.clear()
+    _assert_clears_like_cold(market)
+
+    market.update_buyer(2, rng.integers(0, 50, size=9))
+    market.clear()
+    _assert_clears_like_cold(market)
+
+    market.remove_buyer(0)
+    market.clear()
+    _assert_clears_like_cold(market)
+
+    market.set_reserve(int(np.argmax(market.prices)), int(market.prices.max()) + 5)
+    market.clear()
+    _assert_clears_like_cold(market)
+
+def test_sparse_market_follows_every_delta():
+    rng = np.random.default_rng(14)
+    valuations = sparse.random(8, 6, density=0.4, format='csr', random_state=14,
+                               data_rvs=lambda size: rng.integers(1, 40, size=size))
+    market = Market(valuations)
+    _assert_clears_like_cold(market)
+
+    market.add_buyer({0: 35, 3: 20})
+    market.clear()
+    _assert_clears_like_cold(market)
+
+    market.update_buyer(1, {2: 30, 5: 12})
+    market.clear()
+    _assert_clears_like_cold(market)
+
+    market.remove_buyer(4)
+    market.clear()
+    _assert_clears_like_cold(market)
+
+    market.set_reserve(0, 10)
+    market.clear()
+    _assert_clears_like_cold(market)
+
+def test_constricted_set_has_fewer_houses_than_buyers():
+    #Buyers 0, 1 and 2 all prefer houses 0 and 1 only, buyer 3 prefers house 2
+    preferred = sparse.csr_matrix(np.array([[1, 1, 0, 0],
+                                            [1, 1, 0, 0],
+                                            [0, 1, 0, 0],
+                                            [0, 0, 1, 0]], dtype=bool))
+    matching, buyers, houses = constricted_set(preferred)
+    assert np.count_nonzero(matching >= 0) == 3
+    assert len(houses) < len(buyers)
+    #The houses returned are exactly the constricted buyers' neighbors
+    assert set(houses.tolist()) == set(preferred[buyers].indices.tolist())
+    assert set(buyers.tolist()) <= {0, 1, 2}
+
+def test_constricted_set_at_zero_prices():
+    rng = np.random.default_rng(14)
+    valuations = rng.integers(0, 10, size=(5, 5))
+    #Everyone wants house 0 most, at equal prices they crowd onto it
+    valuations[:, 0] = 20
+    preferred, outside = preferred_sellers(valuations, np.zeros(5))
+    matching, buyers, houses = constricted_set(preferred, outside)
+    assert len(buyers) > len(houses)
+    assert set(houses.tolist()) == set(preferred[buyers].indices.tolist())
+
+def test_no_constricted_set_at_clearing_prices():
+    rng = np.random.default_rng(15)
+    valuations = rng.integers(0, 30, size=(6, 6))
+    _, _, prices = clear_market(valuations)
+    matching, buyers, houses = constricted_set(*preferred_sellers(valuations, prices))
+    assert len(buyers) == len(houses) == 0
+    assert np.all(matching >= 0)
@@ -0,0 +1,413 @@
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import networkx as nx
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import dijkstra
+from csr_graph import as_networkx
+
+#Keeps the conjugate mix away from 1 so every step still moves toward the newest all-or-nothing flow
+CONJUGATE_MARGIN = 1e-6
+#Extra projection steps over the stored paths between two shortest path searches in gradient projection
+INNER_SWEEPS = 4
+#Paths carrying less than this share of the demand are dropped
+PATH_FLOW_EPSILON = 1e-12
+
+class TrafficNetwork:
+    """
+    Edge arrays of a digraph whose edges have affine travel times a*x+b, the
+    (a, b) weights written by GraphManager.read_digraph.
+    Paths are never enumerated: both solvers only ask a shortest path oracle for the
+    cheapest path under the current costs, once per iteration.
+    """
+
+    def __init__(self, G):
+        """
+        Params:
+            G: directed graph object (or CSRGraph) with (a, b) 'weight' on every edge
+        """
+        G = as_networkx(G)
+        self.graph = G
+        self.nodes = list(G.nodes())
+        self.index = {node: i for i, node in enumerate(self.nodes)}
+        edges = list(G.edges(data='weight'))
+        for u, v, weight in edges:
+            if not isinstance(weight, (list, tuple)) or len(weight) != 2:
+                raise ValueError(f'Edge weight format is incorrect for edge {(u, v)}: {weight}')
+
+        self.edges = [(u, v) for u, v, _ in edges]
+        self.edge_index = {edge: i for i, edge in enumerate(self.edges)}
+        self.tails = np.array([self.index[u] for u, _ in self.edges], dtype=np.int64)
+        self.heads = np.array([self.index[v] for _, v in self.edges], dtype=np.int64)
+        self.a = np.array([weight[0] for _, _, weight in edges], dtype=np.float64)
+        self.b = np.array([weight[1] for _, _, weight in edges], dtype=np.float64)
+
+        #CSR matrix for the shortest path oracle; order maps matrix entries back to edges
+        #so new costs can be written into it without rebuilding
+        n = len(self.nodes)
+        self._order = np.lexsort((self.heads, self.tails))
+        offsets = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(self.tails, minlength=n), out=offsets[1:])
+        self._matrix = csr_matrix((self.b[self._order], self.heads[self._order], offsets), shape=(n, n))
+
+    def travel_times(self, flows):
+        """
+        Params:
+            flows: array of edge flows
+        Returns:
+            array of edge travel times a*x+b
+        """
+        return self.a * flows + self.b
+
+    def marginal_costs(self, flows):
+        """
+        Params:
+            flows: array of edge flows
+        Returns:
+            array of d(x*(a*x+b))/dx = 2*a*x+b, the cost one more driver adds to the system
+        """
+        return 2 * self.a * flows + self.b
+
+    def total_time(self, flows):
+        """
+        Params:
+            flows: array of edge flows
+        Returns:
+            total travel time of all drivers
+        """
+        return float(np.dot(flows, self.travel_times(flows)))
+
+    def shortest_path(self, costs, source, destination):
+        """
+        Shortest path oracle
+        Params:
+            costs: array of edge costs
+            source, destination: nodes
+        Returns:
+            array of edge indices on the path
+        """
+        #Rounding can leave flows a hair below zero, costs must stay non-negative for Dijkstra
+        self._matrix.data = np.maximum(costs[self._order], 0.0)
+        s, t = self.index[source], self.index[destination]
+        _, parents = dijkstra(self._matrix, directed=True, indices=s, return_predecessors=True)
+        if s != t and parents[t] < 0:
+            raise nx.NetworkXNoPath(f"No path between {source} and {destination}")
+        path = []
+        node = t
+        while node != s:
+            parent = int(parents[node])
+            path.append(self.edge_index[(self.nodes[parent], self.nodes[node])])
+            node = parent
+        return np.array(path[::-1], dtype=np.int64)
+
+    def all_or_nothing(self, costs, demand, source, destination):
+        """
+        Params:
+            costs: array of edge costs
+            demand: number of drivers
+            source, destination: nodes
+        Returns:
+            edge flows with every driver on the cheapest path
+        """
+        flows = np.zeros(len(self.edges))
+        flows[self.shortest_path(costs, source, destination)] = demand
+        return flows
+
+    def path_set(self, source, destination, cutoff=None):
+        """
+        Enumerates every simple path between two nodes and compiles them into a PathSet
+        Params:
+            source, destination: nodes
+            cutoff: longest path length (in edges) to enumerate, None for no limit
+        Returns:
+            PathSet
+        """
+        return PathSet(self, nx.all_simple_paths(self.graph, source, destination, cutoff=cutoff))
+
+    def solve(self, demand, source, destination, objective='nash', tol=1e-4, max_iter=1000,
+              method='gradient_projection', start=None):
+        """
+        Computes the Wardrop (Nash) equilibrium or the social optimum.
+        The Nash flow minimizes the Beckmann potential, whose gradient is the travel time; the
+        social optimum minimizes total time, whose gradient is the marginal cost. Both are
+        quadratic for affine latencies, so step lengths have a closed form.
+        Params:
+            demand: number of drivers
+            source, destination: nodes
+            objective: 'nash' or 'social'
+            tol: stop when the relative gap falls below this
+            max_iter: iteration cap
+            method: 'gradient_projection' (path based, paths come from the shortest path oracle)
+                    or 'frank_wolfe' (conjugate Frank-Wolfe on edge flows)
+            start: optional Equilibrium to warm start from, rescaled to this demand
+        Returns:
+            Equilibrium, with converged False when max_iter ran out before the gap fell below tol: its flows
+            are then only the last iterate, not an equilibrium. Frank-Wolfe closes the gap sublinearly and
+            often needs far more iterations than gradient projection for tight tolerances.
+        """
+        if objective == 'nash':
+            gradient, curvature = self.travel_times, 1.0
+        elif objective == 'social':
+            gradient, curvature = self.marginal_costs, 2.0
+        else:
+            raise ValueError(f"Unknown objective: {objective}")
+
+        scale = demand / start.demand if start is not None and start.demand else None
+        if method == 'gradient_projection':
+            paths = {key: (edges, flow * scale) for key, (edges, flow) in start.paths.items()} if scale else None
+            return self._gradient_projection(demand, source, destination, objective, gradient, curvature,
+                                             tol, max_iter, paths)
+        if method == 'frank_wolfe':
+            flows = start.flows * scale if scale else None
+            return self._frank_wolfe(demand, source, destination, objective, gradient, curvature,
+                                     tol, max_iter, flows)
+        raise ValueError(f"Unknown method: {method}")
+
+    def _gradient_projection(self, demand, source, destination, objective, gradient, curvature, tol, max_iter, paths):
+        #Only paths the oracle returned are ever stored, as rows of a path-edge incidence matrix
+        #with their flows in a matching array; keys are the tuples of edge indices
+        if paths is None:
+            edges = self.shortest_path(self.b, source, destination)
+            paths = {tuple(edges.tolist()): (edges, float(demand))}
+        keys = list(paths)
+        edge_paths = [paths[key][0] for key in keys]
+        path_flows = np.array([paths[key][1] for key in keys], dtype=np.float64)
+        rows = {key: i for i, key in enumerate(keys)}
+        incidence = incidence_matrix(edge_paths, len(self.edges))
+        path_a = incidence @ self.a
+        flows = incidence.T @ path_flows
+
+        gaps = []
+        converged = False
+        for iteration in range(1, max_iter + 1):
+            costs = gradient(flows)
+            best = self.shortest_path(costs, source, destination)
+            current = float(np.dot(costs, flows))
+            gap = (current - demand * float(costs[best].sum())) / current if current > 0 else 0.0
+            gaps.append(gap)
+            if gap < tol:
+                converged = True
+                break
+
+            best_key = tuple(best.tolist())
+            if best_key not in rows:
+                rows[best_key] = len(keys)
+                keys.append(best_key)
+                edge_paths.append(best)
+                path_flows = np.append(path_flows, 0.0)
+                incidence = incidence_matrix(edge_paths, len(self.edges))
+                path_a = incidence @ self.a
+            #The new path is the cheapest of the stored ones, more sweeps move flow toward
+            #whichever is cheapest by then before asking the oracle again
+            for _ in range(1 + INNER_SWEEPS):
+                flows = self._shift_to(incidence, path_a, path_flows, flows, curvature)
+
+            #Paths that lost their flow are dropped, what is left of it joins the cheapest path
+            keep = path_flows > PATH_FLOW_EPSILON * demand
+            if not keep.all():
+                path_flows[int(np.argmax(path_flows))] += float(path_flows[~keep].sum())
+                keys = [key for key, kept in zip(keys, keep.tolist()) if kept]
+                edge_paths = [edges for edges, kept in zip(edge_paths, keep.tolist()) if kept]
+                path_flows = path_flows[keep]
+                rows = {key: i for i, key in enumerate(keys)}
+                incidence = incidence_matrix(edge_paths, len(self.edges))
+                path_a = incidence @ self.a
+                flows = incidence.T @ path_flows
+
+        paths = {key: (edges, flow) for key, edges, flow in zip(keys, edge_paths, path_flows.tolist())}
+        return Equilibrium(self, flows, demand, objective, gaps, iteration, converged, paths)
+
+    def _shift_to(self, incidence, path_a, path_flows, flows, curvature):
+        #One projection step over all stored paths at once: a Newton step on the path flows with each
+        #path's own curvature, projected back onto flows >= 0 that keep the demand. Shifts that share
+        #edges would overshoot together, so the step is then scaled by an exact line search.
+        #Path flows are updated in place, the new edge flows are returned
+        marginal = curvature * self.a * flows + self.b
+        path_costs = incidence @ marginal
+        curvatures = np.maximum(curvature * path_a, np.finfo(np.float64).eps * max(float(path_a.max()), 1.0))
+        change = path_flows - _project(path_flows - path_costs / curvatures, curvatures, float(path_flows.sum()))
+        direction = -(incidence.T @ change)
+        slope = float(np.dot(marginal, direction))
+        if slope >= 0:
+            return flows
+        bend = curvature * float(np.dot(self.a, direction * direction))
+        step = min(1.0, -slope / bend) if bend > 0 else 1.0
+        path_flows -= step * change
+        np.maximum(path_flows, 0.0, out=path_flows)
+        return flows + step * direction
+
+    def _frank_wolfe(self, demand, source, destination, objective, gradient, curvature, tol, max_iter, flows):
+        if flows is None:
+            flows = self.all_or_nothing(self.b, demand, source, destination)
+        gaps = []
+        converged = False
+        previous = None
+        for iteration in range(1, max_iter + 1):
+            costs = gradient(flows)
+            target = self.all_or_nothing(costs, demand, source, destination)
+            #Relative gap: how much cheaper the best path is than the current flows, 0 at equilibrium
+            current = float(np.dot(costs, flows))
+            gap = (current - float(np.dot(costs, target))) / current if current > 0 else 0.0
+            gaps.append(gap)
+            if gap < tol:
+                converged = True
+                break
+
+            #Conjugate direction: mix the new all-or-nothing flow y with the previous target s so the
+            #direction is conjugate to the last one under the Hessian H = diag(curvature * a), which stops
+            #the zigzag plain Frank-Wolfe falls into near the equilibrium:
+            #mix = (s-x)'H(y-x) / (s-x)'H(y-s), kept in [0, 1 - CONJUGATE_MARGIN]
+            direction = target - flows
+            if previous is not None:
+                hessian = curvature * self.a
+                numerator = float(np.dot((previous - flows) * hessian, target - flows))
+                denominator = float(np.dot((previous - flows) * hessian, target - previous))
+                mix = min(max(numerator / denominator, 0.0), 1 - CONJUGATE_MARGIN) if denominator != 0 else 0.0
+                conjugate = mix * previous + (1 - mix) * target - flows
+                #The mix is only a descent direction if the last line search was exact, else plain Frank-Wolfe
+                if mix > 0 and float(np.dot(costs, conjugate)) < 0:
+                    target, direction = target + mix * (previous - target), conjugate
+
+            slope = float(np.dot(costs, direction))
+            bend = curvature * float(np.dot(self.a, direction * direction))
+            step = min(1.0, -slope / bend) if bend > 0 else 1.0
+            flows = flows + max(step, 0.0) * direction
+            previous = target
+
+        return Equilibrium(self, flows, demand, objective, gaps, iteration, converged)
+
+class PathSet:
+    """
+    Enumerated paths compiled once into a sparse path-edge incidence matrix.
+    Row p has a 1 for every edge on path p, so the per path coefficient sums are two sparse
+    products. The path flow heuristic (Algos.nash_social method='paths') times every path from
+    them for all paths and driver counts at once.
+    """
+
+    def __init__(self, network, paths):
+        """
+        Params:
+            network: TrafficNetwork the paths run on
+            paths: iterable of node lists
+        """
+        self.network = network
+        self.paths = [tuple(path) for path in paths]
+        edge_index = network.edge_index
+        edge_paths = [np.fromiter((edge_index[edge] for edge in zip(path, path[1:])), dtype=np.int64,
+                                  count=len(path) - 1) for path in self.paths]
+        self.incidence = incidence_matrix(edge_paths, len(network.edges))
+        #Per path sums of the edge coefficients: a path carrying x drivers alone takes a*x+b
+        self.a = self.incidence @ network.a
+        self.b = self.incidence @ network.b
+
+    def __len__(self):
+        return len(self.paths)
+
+def _project(targets, weights, total):
+    #Weighted projection onto {x >= 0, sum(x) = total}: x = max(0, targets + level / weights) for the one
+    #level that keeps the total. Path p carries flow once level passes -targets[p] * weights[p]; with the
+    #breakpoints sorted, the level is solved on each prefix and the longest consistent prefix is the answer
+    breakpoints = -targets * weights
+    order = np.argsort(breakpoints)
+    inverse = np.cumsum(1.0 / weights[order])
+    levels = (total - np.cumsum(targets[order])) / inverse
+    active = int(np.flatnonzero(breakpoints[order] < levels)[-1])
+    return np.maximum(targets + levels[active] / weights, 0.0)
+
+def incidence_matrix(edge_paths, edge_count):
+    """
+    Params:
+        edge_paths: list of edge index arrays, one per path
+        edge_count: number of edges of the network
+    Returns:
+        sparse path-edge incidence matrix, row p has a 1 for every edge on path p
+    """
+    lengths = np.fromiter((len(edges) for edges in edge_paths), dtype=np.int64, count=len(edge_paths))
+    offsets = np.zeros(len(edge_paths) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    columns = np.concatenate(edge_paths) if edge_paths else np.zeros(0, dtype=np.int64)
+    return csr_matrix((np.ones(len(columns)), columns, offsets), shape=(len(edge_paths), edge_count))
+
+class Equilibrium:
+    """
+    Result of TrafficNetwork.solve, an equilibrium (or optimum) only when converged is True
+    """
+
+    def __init__(self, network, flows, demand, objective, gaps, iterations, converged, paths=None):
+        self.network = network
+        #Path flows from gradient projection, tuple of edge indices -> (edge index array, flow)
+        self.paths = paths if paths is not None else {}
+        self.flows = flows
+        self.demand = demand
+        self.objective = objective
+        self.gaps = gaps
+        self.iterations = iterations
+        self.converged = converged
+
+    @property
+    def relative_gap(self):
+        return self.gaps[-1] if self.gaps else 0.0
+
+    @property
+    def total_time(self):
+        return self.network.total_time(self.flows)
+
+    def edge_flows(self):
+        """
+        Returns:
+            dict of edge -> flow
+        """
+        return dict(zip(self.network.edges, self.flows.tolist()))
+
+def sweep(network, demands, source, destination, method='gradient_projection', tol=1e-4, max_iter=1000,
+          workers=None):
+    """
+    Nash equilibrium and social optimum for a series of driver counts on one network.
+    Counts are solved in increasing order and each solve warm starts from the previous count's
+    result, rescaled, so neighbouring counts take only a few iterations. With workers the counts
+    are split into contiguous ranges, one per process, each warm started on its own.
+    Params:
+        network: TrafficNetwork
+        demands: driver counts
+        source, destination: nodes
+        method: 'gradient_projection' or 'frank_wolfe'
+        tol: relative gap tolerance
+        max_iter: iteration cap per solve
+        workers: number of worker processes, None or 1 runs in the calling process
+    Returns:
+        rows: list of dicts in increasing n, with
+            n, nash, social: driver count and the two total times
+            ratio: nash / social, the price of anarchy
+            iterations: solver iterations for both solves together
+            converged: True if both solves reached tol
+            gap: the larger of the two final relative gaps
+            seconds: time spent on this count
+    """
+    demands = sorted(demands)
+    if workers and workers > 1 and len(demands) > 1:
+        chunks = np.array_split(np.arange(len(demands)), min(workers, len(demands)))
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(sweep, network, [demands[i] for i in chunk], source, destination,
+                                   method, tol, max_iter) for chunk in chunks]
+            return [row for future in futures for row in future.result()]
+
+    rows = []
+    nash = social = None
+    for n in demands:
+        start = time.perf_counter()
+        nash = network.solve(n, source, destination, 'nash', tol, max_iter, method, nash)
+        social = network.solve(n, source, destination, 'social', tol, max_iter, method, social)
+        rows.append({'n': n, 'nash': nash.total_time, 'social': social.total_time,
+                     'ratio': price_of_anarchy(nash.total_time, social.total_time),
+                     'iterations': nash.iterations + social.iterations,
+                     'converged': nash.converged and social.converged,
+                     'gap': max(nash.relative_gap, social.relative_gap),
+                     'seconds': time.perf_counter() - start})
+    return rows
+
+def price_of_anarchy(nash, social):
+    """
+    Returns:
+        nash / social, nan when the social optimum costs nothing
+    """
+    return nash / social if social > 0 else float('nan')